@@ -0,0 +1,45 @@
+"""
+Awaitable versions of the helpers in database.py.
+
+Every public helper is exposed here under the same name and signature, but
+runs on a dedicated, bounded thread pool so `async def` handlers never stall
+the event loop while SQLite does I/O. Results come back as plain dicts/lists,
+no LazyRow fields left to load: all of them, or with `fields=` only the lazy
+fields the handler reads (the other lazy fields are left out, never queried).
+
+    p = await async_db.get_project_by_id(project_id)
+    profile = await async_db.get_profile_by_user_id(user_id, fields=("analysis",))
+"""
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+# One worker per pooled connection: queries queue here, not on the pool lock.
+_executor = ThreadPoolExecutor(max_workers=database.POOL_SIZE, thread_name_prefix="db")
+
+# Connection plumbing that only makes sense on the calling thread.
+_SYNC_ONLY = {"transaction", "savepoint", "after_commit", "get_pool", "init_db", "lazy", "materialize"}
+
+def _call(fn, args, kwargs, fields):
+    # Resolve LazyRow fields here, on the DB thread, rather than later on the
+    # event loop when the response gets serialized.
+    return database.materialize(fn(*args, **kwargs), fields)
+
+async def run(fn, *args, fields=None, **kwargs):
+    """Runs any blocking database callable on the DB executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _call, fn, args, kwargs, fields)
+
+def _wrap(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, fields=None, **kwargs):
+        return await run(fn, *args, fields=fields, **kwargs)
+    return wrapper
+
+for _name, _fn in inspect.getmembers(database, inspect.isfunction):
+    if _name.startswith("_") or _name in _SYNC_ONLY or _fn.__module__ != database.__name__:
+        continue
+    globals()[_name] = _wrap(_fn)
@@ -0,0 +1,108 @@
+"""
+Bearer-token -> user cache for `get_current_user`.
+
+A hit is one dict lookup plus a float compare; the database is only consulted
+on a miss. Entries live for at most AUTH_CACHE_TTL seconds and never outlive
+the session's own `expires_at`. The least recently used token is evicted once
+AUTH_CACHE_SIZE is reached.
+
+    user = auth_cache.cache.get(token)
+    auth_cache.cache.invalidate(token)      # logout
+    auth_cache.cache.invalidate_user(uid)   # account changed
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "3600"))
+
+def _timestamp(expires_at):
+    """Session expiry (ISO string as stored in `sessions`) -> epoch seconds."""
+    if isinstance(expires_at, (int, float)):
+        return float(expires_at)
+    try:
+        return datetime.fromisoformat(expires_at).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+class AuthCache:
+    def __init__(self, ttl=AUTH_CACHE_TTL, max_size=AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict() # token -> (deadline, user)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        entry = self._entries.get(token)
+        if entry is not None and entry[0] > time.time():
+            self.hits += 1
+            try:
+                self._entries.move_to_end(token)
+            except KeyError:
+                pass # invalidated concurrently; the caller still gets this answer
+            return entry[1]
+        self.misses += 1
+        if entry is not None:
+            self.invalidate(token)
+        return None
+
+    def put(self, token, user, expires_at):
+        deadline = min(time.time() + self.ttl, _timestamp(expires_at))
+        if deadline <= time.time():
+            return
+        with self._lock:
+            self._entries[token] = (deadline, user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id):
+        """Drops every cached token of one user (profile/password/account changes)."""
+        with self._lock:
+            for token in [t for t, (_, u) in self._entries.items() if u['id'] == user_id]:
+                del self._entries[token]
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for token in [t for t, (deadline, _) in self._entries.items() if deadline <= now]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+cache = AuthCache()
+
+def start_session_sweeper(purge_sessions, interval=SESSION_SWEEP_INTERVAL):
+    """
+    Starts a daemon thread that periodically calls `purge_sessions()` (which
+    deletes expired rows from `sessions`) and drops expired cache entries.
+    """
+    stop = threading.Event()
+
+    def sweep():
+        while not stop.wait(interval):
+            try:
+                removed = purge_sessions()
+                cache.purge_expired()
+                if removed:
+                    print(f"Session sweeper: purged {removed} expired session(s)")
+            except Exception as e:
+                print(f"Session sweeper error: {e}")
+
+    threading.Thread(target=sweep, name="session-sweeper", daemon=True).start()
+    return stop
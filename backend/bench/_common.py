@@ -0,0 +1,67 @@
+"""
+Shared setup for the benchmark scripts in this directory.
+
+Every script runs against a scratch database - a synthetic one
+(query_plans.build_synthetic_db, `--scale` times 10k profiles and projects)
+or a backup copy of `--db` - so the real career_sapling.db is never touched.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import query_plans
+
+def add_arguments(parser, threads=1, requests=20000):
+    parser.add_argument("--db", help="Benchmark a copy of this database instead of a synthetic one")
+    parser.add_argument("--scale", type=int, default=1, help="Synthetic data multiplier")
+    parser.add_argument("--threads", type=int, default=threads)
+    parser.add_argument("--requests", type=int, default=requests)
+
+def scratch_db(args):
+    """Points database.py at a migrated scratch database built from `args`. Returns its path."""
+    path = os.path.join(tempfile.mkdtemp(prefix="sentinel-bench-"), "bench.db")
+    if args.db:
+        source = sqlite3.connect(args.db)
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+    else:
+        query_plans.build_synthetic_db(path, args.scale).close()
+    database.DB_PATH = path
+    database.init_db()
+    return path
+
+def seed_user(email="bench@example.com"):
+    """A user with a live session token, a profile and two projects. Returns (user_id, token)."""
+    user_id = database.create_user(email, "x", "Bench User")
+    token = f"bench-{user_id}"
+    database.create_session(user_id, token)
+    analysis = {"current_skills": ["Python", "SQL"], "skill_gaps": ["Docker"], "growth_stage": "Sprout"}
+    projects = [{"id": f"bench_{user_id}_{i}", "title": f"Project {i}", "difficulty": "Medium"} for i in range(2)]
+    database.save_career_data("Backend Engineer", analysis, projects, "Sprout", user_id)
+    for project in projects:
+        database.save_project_globally({**project, "phases": [{"title": "Setup"}, {"title": "Build"}],
+                                        "current_phase": 0}, user_id)
+    return user_id, token
+
+def throughput(fn, threads, requests):
+    """Calls fn() `requests` times from `threads` threads. Returns calls per second."""
+    started = time.perf_counter()
+    if threads <= 1:
+        for _ in range(requests):
+            fn()
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            for future in [pool.submit(fn) for _ in range(requests)]:
+                future.result()
+    return requests / (time.perf_counter() - started)
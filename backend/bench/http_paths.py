@@ -0,0 +1,104 @@
+"""
+/profile and /chat through uvicorn: the current tree against a baseline.
+
+For each tree, bench/http_server.py serves `main:app` on a copy of its
+database with a stub LLM, and --concurrency clients send --requests requests per
+endpoint over HTTP (each client is one seeded user with its own chat
+session). Prints requests per second and p50/p95 latency.
+
+The baseline (default: the commit before the backlog) is exported with
+`git archive`, so the working tree is never touched.
+
+    python bench/http_paths.py [--baseline de2a32c] [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import io
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+import httpx
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(BENCH)
+
+def export(rev):
+    """The backend/ directory of `rev`, extracted to a temp dir."""
+    target = tempfile.mkdtemp(prefix=f"sentinel-{rev}-")
+    archive = subprocess.run(["git", "archive", rev, "backend"], cwd=os.path.dirname(BACKEND), check=True, capture_output=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target, filter="data")
+    return os.path.join(target, "backend")
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def serve(tree, args):
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="sentinel-bench-http-")
+    process = subprocess.Popen([sys.executable, os.path.join(BENCH, "http_server.py"), "--tree", tree,
+                                "--workdir", workdir, "--port", str(port), "--users", str(args.concurrency),
+                                "--llm-delay-ms", str(args.llm_delay_ms)])
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url + "/docs", timeout=1)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server for {tree} did not start")
+
+async def load(url, method, path, body, args):
+    latencies = []
+    per_client = args.requests // args.concurrency
+
+    async def client(n):
+        headers = {"Authorization": f"Bearer bench-token-{n}"}
+        async with httpx.AsyncClient(base_url=url, headers=headers, timeout=60) as http:
+            for i in range(per_client):
+                started = time.perf_counter()
+                response = await http.request(method, path, json=body(n, i) if body else None)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+def chat_body(n, i):
+    return {"session_id": f"bench-session-{n}", "message": f"Question {i}: what should I learn next?"}
+
+def run(name, tree, args):
+    process, url = serve(tree, args)
+    try:
+        for label, method, path, body in (("/profile", "GET", "/profile", None), ("/chat", "POST", "/chat", chat_body)):
+            rate, p50, p95 = asyncio.run(load(url, method, path, body, args))
+            print(f"{name:9} {label:9} {rate:8,.0f} req/s   p50 {p50 * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", default="de2a32c", help="Git revision to compare against ('' to skip)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-delay-ms", type=float, default=50)
+    args = parser.parse_args()
+    if args.baseline:
+        run("baseline", export(args.baseline), args)
+    run("current", BACKEND, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Serves one checkout of the backend under uvicorn for bench/http_paths.py.
+
+Runs `main:app` from --tree on a copy of that tree's career_sapling.db in
+--workdir (the baseline's schema only works on it), with --users seeded
+users - session token "bench-token-<n>" and a profile with skills and
+project ideas - and the Groq clients replaced by a stub that answers after
+--llm-delay-ms, so /chat measures the server rather than Groq.
+Works on both the current tree and the pre-backlog baseline: it only uses
+helpers the baseline already had.
+
+    python bench/http_server.py --tree . --workdir /tmp/x --port 8765
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import time
+from types import SimpleNamespace
+
+def _reply(messages):
+    text = "Stub reply: keep practising and build one project per skill gap."
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+                           usage=SimpleNamespace(prompt_tokens=len(str(messages)) // 4, completion_tokens=len(text) // 4,
+                                                 total_tokens=(len(str(messages)) + len(text)) // 4))
+
+def stub_clients(delay):
+    def create(messages=(), **kwargs):
+        time.sleep(delay)
+        return _reply(messages)
+
+    async def acreate(messages=(), **kwargs):
+        await asyncio.sleep(delay)
+        return _reply(messages)
+
+    sync = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    async_ = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=acreate)))
+    return sync, async_
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tree", required=True, help="backend/ directory to serve")
+    parser.add_argument("--workdir", required=True)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--llm-delay-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    for key in ("GROQ_API_KEY", "OPENAI_API_KEY", "TAVILY_API_KEY"):
+        os.environ.setdefault(key, "bench")
+    os.environ["PRECOMPUTE_AT"] = "" # no scheduled work during the run
+    # The stub is not rate-limited; keep the limiter from throttling to Groq's free tier
+    os.environ["GROQ_RATE_LIMITS"] = "llama-3.3-70b-versatile=1000000:1000000000,llama-3.1-8b-instant=1000000:1000000000"
+
+    sys.path.insert(0, os.path.abspath(args.tree))
+    os.makedirs(args.workdir, exist_ok=True)
+    shutil.copy(os.path.join(args.tree, "career_sapling.db"), os.path.join(args.workdir, "career_sapling.db"))
+    os.chdir(args.workdir)
+    import uvicorn
+    import database
+    import main as app_module
+
+    for n in range(args.users):
+        user_id = database.create_user(f"bench{n}@bench.invalid", "x", f"Bench User {n}")
+        database.create_session(user_id, f"bench-token-{n}")
+        analysis = {"current_skills": ["Python", "SQL", "Docker"], "skill_gaps": ["Kubernetes"], "growth_stage": "Sprout"}
+        projects = [{"id": f"idea-{n}-{i}", "title": f"Idea {i}", "difficulty": "Medium"} for i in range(3)]
+        database.save_career_data("Backend Engineer", analysis, projects, "Sprout", user_id)
+
+    sync, async_ = stub_clients(args.llm_delay_ms / 1000)
+    for agent in (app_module.mirror, getattr(app_module, "market", None), getattr(app_module, "foundry", None)):
+        if agent is not None:
+            agent.client = sync
+            if hasattr(agent, "async_client"):
+                agent.async_client = async_
+
+    uvicorn.run(app_module.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Reads that lazy rows make cheap: /growth-status and project title listings.
+
+- growth-status: latest profile's growth_stage plus tree stats, for a random
+  user (no analysis, skills, projects or job matches are decoded),
+- project titles: every project of a random user, titles only (phases are
+  never loaded).
+
+The default --scale 10 is 100k profiles and 100k projects over 5k users.
+
+    python bench/lazy_rows.py [--scale 10] [--requests 20000]
+"""
+import argparse
+import random
+
+import _common
+import database
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    _common.add_arguments(parser)
+    parser.set_defaults(scale=10)
+    args = parser.parse_args()
+    _common.scratch_db(args)
+    with database.transaction() as conn:
+        users = [row[0] for row in conn.execute("SELECT id FROM users")]
+    rnd = random.Random(1)
+
+    def growth_status():
+        user_id = rnd.choice(users)
+        profile = database.get_profile_by_user_id(user_id)
+        return profile and profile['growth_stage'], database.get_user_tree_stats(user_id)
+
+    def project_titles():
+        return [p['title'] for p in database.get_all_active_projects(rnd.choice(users))]
+
+    for name, fn in (("growth-status", growth_status), ("project titles", project_titles)):
+        fn()
+        rate = _common.throughput(fn, args.threads, args.requests)
+        print(f"{name}: {rate:,.0f} req/s ({args.threads} thread(s), {args.requests} requests)")
+
+if __name__ == "__main__":
+    main()
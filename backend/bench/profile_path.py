@@ -0,0 +1,35 @@
+"""
+Throughput of the /profile database path under concurrency.
+
+Each request does what GET /profile does in SQLite: the bearer-token lookup
+(database.get_user_by_token, bypassing auth_cache), the latest profile with
+every lazy field read, goals, activity, active projects and tree stats.
+
+    python bench/profile_path.py [--db career_sapling.db] [--threads 40] [--requests 4000]
+"""
+import argparse
+
+import _common
+import database
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    _common.add_arguments(parser, threads=40, requests=4000)
+    args = parser.parse_args()
+    _common.scratch_db(args)
+    _, token = _common.seed_user()
+
+    def request():
+        user = database.get_user_by_token(token)
+        profile = database.materialize(database.get_profile_by_user_id(user['id']))
+        database.get_user_goals(profile['id'])
+        database.get_user_activity(user['id'])
+        database.get_all_active_projects(user['id'])
+        database.get_user_tree_stats(user['id'])
+
+    request() # warm up the pool and the statement caches
+    rate = _common.throughput(request, args.threads, args.requests)
+    print(f"/profile DB path: {rate:,.0f} req/s ({args.threads} threads, {args.requests} requests)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Full-text search over a million messages.
+
+Builds a scratch database with --messages community messages and as many
+chat messages (spread over --users users), with words drawn from a Zipf-like
+vocabulary so some terms match most rows and others a handful. Then times
+database.search_community_messages (no owner filter: the worst case) and
+database.search_chat_messages for a common, a mid-frequency and a rare
+term, with prefix and multi-term queries.
+
+    python bench/search.py [--messages 1000000] [--users 1000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+VOCABULARY = 5000
+BATCH = 50000
+
+def words(rnd, n):
+    # Word k is drawn with weight ~1/k: "w1" is in most messages, "w4000" in a few hundred
+    return " ".join(f"w{int(VOCABULARY ** rnd.random())}" for _ in range(n))
+
+def build(messages, users):
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="sentinel-bench-search-"), "search.db")
+    database.init_db()
+    rnd = random.Random(7)
+    with database.transaction() as conn:
+        conn.executemany("INSERT INTO users (id, email, password_hash, full_name) VALUES (?, ?, 'x', ?)",
+                         [(u, f"search{u}@bench.invalid", f"User {u}") for u in range(1, users + 1)])
+        conn.executemany("INSERT INTO chat_sessions (id, user_id, title) VALUES (?, ?, 'Chat')",
+                         [(f"s{u}", u) for u in range(1, users + 1)])
+        channels = [row[0] for row in conn.execute("SELECT id FROM channels")]
+    for start in range(0, messages, BATCH):
+        n = min(BATCH, messages - start)
+        with database.transaction() as conn:
+            conn.executemany("INSERT INTO community_messages (channel_id, user_id, content) VALUES (?, ?, ?)",
+                             [(rnd.choice(channels), rnd.randint(1, users), words(rnd, 12)) for _ in range(n)])
+            conn.executemany("INSERT INTO chat_messages (session_id, role, content) VALUES (?, 'user', ?)",
+                             [(f"s{rnd.randint(1, users)}", words(rnd, 12)) for _ in range(n)])
+        print(f"  {start + n:,} / {messages:,}", end="\r", flush=True)
+    print()
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return result, times[len(times) // 2], times[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    build(args.messages, args.users)
+    print(f"Built {args.messages:,} community + {args.messages:,} chat messages in {time.perf_counter() - started:.0f}s")
+
+    with database.transaction() as conn:
+        def matches(term):
+            return conn.execute("SELECT count(*) FROM community_fts WHERE community_fts MATCH ?", (term,)).fetchone()[0]
+        counts = {term: matches(term) for term in ("w1", "w40", "w4000")}
+
+    queries = [("common", "w1"), ("mid", "w40"), ("rare", "w4000"), ("prefix", "w40*"), ("two terms", "w1 w40")]
+    print(f"{'query':22} {'community matches':>18} {'community p50/max':>20} {'chat p50/max':>20}")
+    for label, text in queries:
+        _, p50, worst = timed(lambda: database.search_community_messages(text, 20), args.repeat)
+        _, chat_p50, chat_worst = timed(lambda: database.search_chat_messages(1, text, 20), args.repeat)
+        total = f"{counts[text]:,}" if text in counts else "-"
+        print(f"{label + ' (' + text + ')':22} {total:>18} {p50 * 1000:11.1f}/{worst * 1000:.1f} ms "
+              f"{chat_p50 * 1000:13.1f}/{chat_worst * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
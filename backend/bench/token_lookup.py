@@ -0,0 +1,34 @@
+"""
+Per-request cost of bearer-token authentication.
+
+- database: database.get_user_by_token, what every request paid before
+  auth_cache (one indexed JOIN with the expiry check in SQL),
+- cached: auth_cache.cache.get on a warm entry, what get_current_user pays
+  on a hit.
+
+    python bench/token_lookup.py [--db career_sapling.db] [--requests 20000]
+"""
+import argparse
+
+import _common
+import auth_cache
+import database
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    _common.add_arguments(parser)
+    args = parser.parse_args()
+    _common.scratch_db(args)
+    _, token = _common.seed_user()
+
+    user = dict(database.get_user_by_token(token))
+    auth_cache.cache.put(token, user, user.pop('session_expires_at'))
+    assert auth_cache.cache.get(token) is not None
+
+    for name, fn in (("database", lambda: database.get_user_by_token(token)),
+                     ("cached", lambda: auth_cache.cache.get(token))):
+        rate = _common.throughput(fn, args.threads, args.requests)
+        print(f"{name}: {1e6 / rate:.1f} us per lookup ({args.requests} lookups)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Bounded conversation memory for the career chat.
+
+Each turn sends the model the session's running summary plus only its most
+recent messages instead of the whole history. Only those rows are read from
+chat_messages, so prompt size and per-turn latency stay flat however long the
+conversation gets.
+
+- Messages not yet in the summary are sent verbatim, trimmed oldest first to
+  CHAT_MEMORY_TOKENS: at least the newest CHAT_MEMORY_TURNS exchanges.
+- Once CHAT_SUMMARY_BATCH messages beyond those have piled up, a background
+  task folds them into chat_sessions.summary with a small model. It runs
+  after the reply is saved, so it never delays an answer.
+
+    memory = await chat_memory.load(session_id)
+    messages = chat_memory.messages(system_prompt, memory, user_message)
+    ...
+    chat_memory.compact_later(session_id)      # after saving the reply
+"""
+import asyncio
+import os
+
+import async_db
+import llm
+import model_router
+import rate_limiter
+
+CHAT_MEMORY_TURNS = int(os.getenv("CHAT_MEMORY_TURNS", "6"))
+CHAT_MEMORY_TOKENS = int(os.getenv("CHAT_MEMORY_TOKENS", "3000"))
+CHAT_SUMMARY_BATCH = int(os.getenv("CHAT_SUMMARY_BATCH", "8"))         # messages folded per summary update
+CHAT_SUMMARY_INPUT_TOKENS = int(os.getenv("CHAT_SUMMARY_INPUT_TOKENS", "4000"))
+# The model mirror.chat_summary is routed to, so the request matches what is actually sent (and LLM_ROUTING=0 keeps it small)
+SUMMARY_MODEL = model_router.TIERS.get(model_router.tier_for("mirror.chat_summary"), model_router.TIERS["small"])
+
+KEEP = 2 * CHAT_MEMORY_TURNS # verbatim messages
+
+def _tokens(text):
+    return len(text or "") // 4 + 1
+
+async def load(session_id):
+    """The session's summary and verbatim tail (see get_chat_memory), tail trimmed to the token budget."""
+    # Everything not yet summarized: between KEEP and KEEP + CHAT_SUMMARY_BATCH messages
+    memory = await async_db.get_chat_memory(session_id, KEEP + CHAT_SUMMARY_BATCH)
+    recent = list(memory["messages"])
+    # Always keep the last exchange, even if it alone is over budget
+    while len(recent) > 2 and sum(_tokens(m["content"]) for m in recent) > CHAT_MEMORY_TOKENS:
+        recent.pop(0)
+    memory["recent"] = recent
+    memory["is_new"] = not memory["summary"] and not memory["messages"]
+    return memory
+
+def messages(system_prompt, memory, user_message):
+    """Chat messages for the next turn: system prompt, summary, verbatim tail, new message."""
+    result = [{"role": "system", "content": system_prompt}]
+    if memory["summary"]:
+        result.append({"role": "system", "content": f"Summary of the earlier conversation:\n{memory['summary']}"})
+    result.extend({"role": m["role"], "content": m["content"]} for m in memory["recent"])
+    result.append({"role": "user", "content": user_message})
+    return result
+
+def _summary_request(summary, batch):
+    transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in batch)
+    return {
+        "task": "mirror.chat_summary",
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": "You maintain the running memory of a career-coaching chat. Reply with the updated summary only."},
+            {"role": "user", "content": (
+                f"Current summary:\n{summary or '(none yet)'}\n\n"
+                f"New messages to fold in:\n{transcript}\n\n"
+                "Write the updated summary in at most 200 words. Keep the user's goals, background, decisions, "
+                "advice already given, projects suggested and open questions. Drop small talk."
+            )},
+        ],
+        "max_tokens": 400,
+    }
+
+async def compact(session_id):
+    """Folds messages older than the verbatim window into the summary until it is caught up."""
+    with rate_limiter.priority(rate_limiter.BACKGROUND):
+        while True:
+            memory = await async_db.get_chat_memory(session_id, 1)
+            foldable = memory["unsummarized"] - KEEP
+            if foldable < CHAT_SUMMARY_BATCH:
+                return
+            batch = await async_db.get_chat_messages_after(session_id, memory["summarized_through"], foldable)
+            # Bound the summarizer's own prompt; the rest goes in the next round
+            taken, used = [], 0
+            for message in batch:
+                used += _tokens(message["content"])
+                if taken and used > CHAT_SUMMARY_INPUT_TOKENS:
+                    break
+                taken.append(message)
+            summary = (await llm.acomplete(_summary_request(memory["summary"], taken))).strip()
+            stored = await async_db.update_chat_summary(session_id, summary, taken[-1]["id"], memory["summarized_through"])
+            if not stored:
+                return # another compaction got there first
+
+_running = {} # session_id -> task
+
+def compact_later(session_id):
+    """Starts compact() in the background unless one is already running for the session."""
+    if session_id in _running:
+        return
+
+    async def run():
+        try:
+            await compact(session_id)
+        except Exception as e:
+            # The tail still fits the budget; the next reply tries again
+            print(f"Chat summary failed for {session_id}: {e}")
+        finally:
+            _running.pop(session_id, None)
+
+    _running[session_id] = asyncio.create_task(run())
@@ -0,0 +1,239 @@
+"""
+Circuit breakers for the external dependencies (Groq, Tavily).
+
+Each breaker keeps a rolling BREAKER_WINDOW of call outcomes. Once it has at
+least BREAKER_MIN_CALLS, it opens when the share of failed calls reaches
+BREAKER_FAILURE_RATE or the share of slow calls (slower than the
+dependency's `slow_call` seconds) reaches BREAKER_SLOW_RATE. While open every
+call fails at once with CircuitOpenError, so the agents serve their fallback
+immediately instead of waiting out the client timeout. After BREAKER_OPEN_FOR
+seconds it goes half-open and lets BREAKER_PROBES calls through: if they
+succeed it closes again, if one fails it reopens.
+
+    response = circuit_breaker.groq.call(lambda: client.chat.completions.create(...))
+    response = await circuit_breaker.groq.acall(lambda: aclient.chat.completions.create(...))
+
+Requests that got a fallback are reported through track():
+
+    with circuit_breaker.track() as health:
+        result = await agent.do_something_async(...)
+    return health.apply(result)   # adds "degraded": True if a fallback was served
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import openai
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_OPEN_FOR = float(os.getenv("BREAKER_OPEN_FOR", "30"))
+BREAKER_PROBES = int(os.getenv("BREAKER_PROBES", "1"))
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} is unavailable (circuit open, retrying in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+def _any_error(exc):
+    return True
+
+def _groq_outage(exc):
+    # 4xx are our own requests' fault and 429s belong to rate_limiter.py;
+    # only timeouts, connection errors and 5xx say Groq itself is unwell
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code >= 500
+    return True
+
+class Breaker:
+    def __init__(self, name, slow_call, is_failure=_any_error):
+        self.name = name
+        self.slow_call = slow_call
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes = 0           # half-open calls in flight
+        self.window = deque()     # (finished at, failed, latency)
+        self.stats = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "opened": 0}
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self.window and self.window[0][0] <= now - BREAKER_WINDOW:
+            self.window.popleft()
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.stats["opened"] += 1
+        print(f"Circuit breaker: {self.name} OPEN for {BREAKER_OPEN_FOR:.0f}s")
+
+    def before(self):
+        """Admits a call (returns whether it is a half-open probe) or raises CircuitOpenError."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                retry_in = self.opened_at + BREAKER_OPEN_FOR - now
+                if retry_in > 0:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, retry_in)
+                self.state = HALF_OPEN
+                self.probes = 0
+            if self.state == HALF_OPEN:
+                if self.probes >= BREAKER_PROBES:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, 0)
+                self.probes += 1
+                return True
+            return False
+
+    def after(self, probe, latency, exc=None):
+        """Records the outcome of a call admitted by before(); exc=None means it succeeded."""
+        failed = exc is not None and self.is_failure(exc)
+        slow = latency >= self.slow_call
+        with self._lock:
+            now = time.monotonic()
+            self.stats["calls"] += 1
+            self.stats["failures"] += failed
+            self.stats["slow"] += slow
+            if probe:
+                self.probes -= 1
+                if self.state != HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._open(now)
+                elif not self.probes:
+                    self.state = CLOSED
+                    self.window.clear()
+                    print(f"Circuit breaker: {self.name} closed")
+                return
+
+            self.window.append((now, failed, latency))
+            self._trim(now)
+            if self.state != CLOSED or len(self.window) < BREAKER_MIN_CALLS:
+                return
+            failures = sum(1 for _, f, _ in self.window if f)
+            slow_calls = sum(1 for *_, l in self.window if l >= self.slow_call)
+            if failures >= BREAKER_FAILURE_RATE * len(self.window) or slow_calls >= BREAKER_SLOW_RATE * len(self.window):
+                self._open(now)
+
+    def release(self, probe):
+        """For a call that was cancelled before it had an outcome."""
+        if probe:
+            with self._lock:
+                self.probes -= 1
+
+    def check(self):
+        """Raises CircuitOpenError if the breaker is open, without taking a call slot."""
+        with self._lock:
+            if self.state == OPEN:
+                retry_in = self.opened_at + BREAKER_OPEN_FOR - time.monotonic()
+                if retry_in > 0:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, retry_in)
+
+    def call(self, fn):
+        probe = self.before()
+        start = time.monotonic()
+        try:
+            result = fn()
+        except Exception as e:
+            self.after(probe, time.monotonic() - start, e)
+            raise
+        except BaseException:
+            self.release(probe)
+            raise
+        self.after(probe, time.monotonic() - start)
+        return result
+
+    async def acall(self, afn):
+        probe = self.before()
+        start = time.monotonic()
+        try:
+            result = await afn()
+        except Exception as e:
+            self.after(probe, time.monotonic() - start, e)
+            raise
+        except BaseException:
+            self.release(probe)
+            raise
+        self.after(probe, time.monotonic() - start)
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            latencies = sorted(l for *_, l in self.window)
+            state = self.state
+            if state == OPEN and now >= self.opened_at + BREAKER_OPEN_FOR:
+                state = HALF_OPEN # the next call will probe
+            return {
+                "state": state,
+                "open_for": round(max(self.opened_at + BREAKER_OPEN_FOR - now, 0), 1) if state == OPEN else 0,
+                "window_calls": len(latencies),
+                "window_failures": sum(1 for _, f, _ in self.window if f),
+                "p50_latency": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "p95_latency": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+                "slow_call": self.slow_call,
+                **self.stats,
+            }
+
+groq = Breaker("groq", float(os.getenv("BREAKER_SLOW_GROQ", "20")), _groq_outage)
+tavily = Breaker("tavily", float(os.getenv("BREAKER_SLOW_TAVILY", "10")))
+
+breakers = {"groq": groq, "tavily": tavily}
+
+def for_call(name):
+    """The breaker guarding an llm.Call named '<dependency>.<operation>', or None."""
+    return breakers.get(name.split(".")[0])
+
+def stats():
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+# --- degraded responses ---
+
+class Health:
+    def __init__(self):
+        self.failed = set() # dependencies that failed during the block
+
+    @property
+    def degraded(self):
+        return bool(self.failed)
+
+    def apply(self, result):
+        """`result` with "degraded": True added when a fallback was served (dict results only)."""
+        if self.degraded and isinstance(result, dict):
+            return {**result, "degraded": True}
+        return result
+
+_health = contextvars.ContextVar("request_health", default=None)
+
+@contextmanager
+def track():
+    """Collects whether any external call made inside the block failed (see mark_degraded)."""
+    health = Health()
+    token = _health.set(health)
+    try:
+        yield health
+    finally:
+        try:
+            _health.reset(token)
+        except ValueError:
+            pass # an abandoned stream being closed from another context
+
+def mark_degraded(dependency):
+    """Called when an external call failed and the caller falls back."""
+    health = _health.get()
+    if health is not None:
+        health.failed.add(dependency)
@@ -0,0 +1,298 @@
+"""
+Code context for The Architect.
+
+Instead of pasting the student's whole file into every prompt, the file is cut
+into chunks - functions, classes and methods via `ast` for Python, a
+line-based tokenizer for everything else (and for Python that does not parse
+yet) - and each turn sends only:
+
+- chunks the conversation window has not seen yet, most relevant to the
+  question and phase objective first, until ARCHITECT_CODE_TOKENS is used,
+- a unified diff for chunks it has seen that changed since,
+- nothing for chunks it has seen unchanged.
+
+Files that fit in the budget are sent whole on the first turn. An outline
+(every chunk's first line and line range) goes into the system prompt so the
+model knows what it is not seeing.
+
+Each window - one student's project, keyed by the caller (see
+foundry_window_key in main.py) - keeps its last ARCHITECT_WINDOW_TURNS
+exchanges, trimmed oldest first to ARCHITECT_HISTORY_TOKENS; what the window
+holds is what counts as "seen". A turn with key None gets no history and is
+not kept.
+
+    turn = code_context.prepare(project_key, code, question, objective)
+    messages = [system(turn.outline), *turn.history, {"role": "user", "content": turn.prompt}]
+    ...
+    code_context.record(turn, reply)
+"""
+import ast
+import difflib
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+ARCHITECT_CODE_TOKENS = int(os.getenv("ARCHITECT_CODE_TOKENS", "2500"))
+ARCHITECT_HISTORY_TOKENS = int(os.getenv("ARCHITECT_HISTORY_TOKENS", "4000"))
+ARCHITECT_WINDOW_TURNS = int(os.getenv("ARCHITECT_WINDOW_TURNS", "6"))
+ARCHITECT_PROJECTS_MAX = int(os.getenv("ARCHITECT_PROJECTS_MAX", "1000"))
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# --- chunking ---
+
+class Chunk:
+    __slots__ = ("name", "start", "end", "text", "digest")
+
+    def __init__(self, name, start, end, lines):
+        self.name = name
+        self.start = start # 1-based, inclusive
+        self.end = end
+        self.text = "\n".join(lines[start - 1:end])
+        self.digest = hashlib.sha1(self.text.encode()).hexdigest()
+
+    def header(self):
+        first = self.text.strip().splitlines()[0] if self.text.strip() else ""
+        return f"{self.name} (lines {self.start}-{self.end}): {first[:100]}"
+
+def _python_spans(tree):
+    """(name, start, end) of every top-level def and class, with classes split into methods."""
+    spans = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        if isinstance(node, ast.ClassDef):
+            methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            head_end = node.end_lineno
+            if methods:
+                head_end = min([methods[0].lineno] + [d.lineno for d in methods[0].decorator_list]) - 1
+            spans.append((node.name, start, head_end))
+            for method in methods:
+                m_start = min([method.lineno] + [d.lineno for d in method.decorator_list])
+                spans.append((f"{node.name}.{method.name}", m_start, method.end_lineno))
+        else:
+            spans.append((node.name, start, node.end_lineno))
+    return spans
+
+# A line that opens a top-level block in most languages (JS/TS, Java, C#, Go, Rust, C, ...)
+_BLOCK_START = re.compile(
+    r"^(?:export\s+)?(?:default\s+)?(?:async\s+)?"
+    r"(?:(?:function|class|def|interface|struct|impl|enum|trait|fn|func|type)\s+(?P<kw>[\w$.]+)"
+    r"|(?:const|let|var)\s+(?P<var>[\w$]+)\s*=\s*(?:async\s*)?(?:\(|function\b|[\w$]+\s*=>)"
+    r"|(?:(?:public|private|protected|static|final|inline|virtual|unsigned|const)\s+)*[\w<>\[\],*&:]+\s+\**(?P<fn>[\w$]+)\s*\([^;]*$)"
+)
+
+def _generic_spans(lines):
+    starts = []
+    for number, line in enumerate(lines, 1):
+        match = _BLOCK_START.match(line)
+        if match:
+            starts.append((match.group("kw") or match.group("var") or match.group("fn"), number))
+    spans = []
+    for i, (name, start) in enumerate(starts):
+        end = starts[i + 1][1] - 1 if i + 1 < len(starts) else len(lines)
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        spans.append((name, start, end))
+    return spans
+
+def chunks(code):
+    """The file as chunks in line order; top-level code between blocks becomes '<module>' chunks."""
+    lines = code.splitlines()
+    try:
+        spans = _python_spans(ast.parse(code))
+    except (SyntaxError, ValueError):
+        spans = _generic_spans(lines)
+
+    result = []
+    covered = 0
+    for name, start, end in spans:
+        if start > covered + 1:
+            _module_chunk(result, lines, covered + 1, start - 1)
+        covered = max(covered, end)
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        result.append(Chunk(name, start, end, lines))
+    if covered < len(lines):
+        _module_chunk(result, lines, covered + 1, len(lines))
+    return result
+
+def _module_chunk(result, lines, start, end):
+    while start <= end and not lines[start - 1].strip():
+        start += 1
+    while end >= start and not lines[end - 1].strip():
+        end -= 1
+    if start <= end:
+        result.append(Chunk(f"<module:{start}>", start, end, lines))
+
+# --- relevance ---
+
+_STOPWORDS = {"the", "and", "for", "this", "that", "with", "why", "what", "how", "not", "does", "doesnt",
+              "code", "error", "failing", "fails", "work", "working", "can", "you", "please", "help", "def",
+              "self", "return", "import", "from", "function", "class", "const", "let", "var", "print"}
+
+def _terms(text):
+    terms = set()
+    for word in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text or ""):
+        # snake_case and camelCase parts, plus the whole identifier
+        parts = re.findall(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])", word.replace("_", " "))
+        for term in [word] + parts:
+            term = term.lower()
+            if len(term) > 2 and term not in _STOPWORDS:
+                terms.add(term)
+    return terms
+
+def _score(chunk, question_terms, objective_terms, lines_mentioned):
+    name_terms = _terms(chunk.name)
+    body_terms = _terms(chunk.text)
+    score = 3 * len(question_terms & name_terms) + len(question_terms & body_terms)
+    score += 0.5 * len(objective_terms & body_terms)
+    if any(chunk.start <= n <= chunk.end for n in lines_mentioned):
+        score += 10 # "line 42" or a traceback pointing into this chunk
+    return score
+
+# --- per-project window ---
+
+class _Turn:
+    """One exchange: what was asked, the code it showed, and the reply once recorded."""
+    def __init__(self, key, question, prompt, shown, outline, history, stats):
+        self.key = key
+        self.question = question
+        self.prompt = prompt     # the user message actually sent (code context + question)
+        self.shown = shown       # chunk name -> text the model now has for it
+        self.outline = outline   # for the system prompt, "" when the whole file was sent
+        self.history = history   # earlier exchanges still in the window, as chat messages
+        self.stats = stats
+        self.reply = None
+
+    def messages(self):
+        return [{"role": "user", "content": self.prompt}, {"role": "assistant", "content": self.reply}]
+
+    def tokens(self):
+        return estimate_tokens(self.prompt) + estimate_tokens(self.reply or "")
+
+class _Windows:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._projects = OrderedDict() # key -> list of recorded turns, oldest first
+        self.totals = {"turns": 0, "file_tokens": 0, "sent_code_tokens": 0, "history_tokens": 0}
+
+    def window(self, key):
+        if key is None:
+            return []
+        with self._lock:
+            turns = self._projects.get(key)
+            if turns is None:
+                return []
+            self._projects.move_to_end(key)
+            return list(turns)
+
+    def record(self, turn):
+        with self._lock:
+            if turn.key is not None:
+                turns = self._projects.setdefault(turn.key, [])
+                self._projects.move_to_end(turn.key)
+                turns.append(turn)
+                # Oldest exchanges fall out first: by count, then by size
+                del turns[:max(len(turns) - ARCHITECT_WINDOW_TURNS, 0)]
+                while len(turns) > 1 and sum(t.tokens() for t in turns) > ARCHITECT_HISTORY_TOKENS:
+                    turns.pop(0)
+                while len(self._projects) > ARCHITECT_PROJECTS_MAX:
+                    self._projects.popitem(last=False)
+            for name in ("file_tokens", "sent_code_tokens", "history_tokens"):
+                self.totals[name] += turn.stats[name]
+            self.totals["turns"] += 1
+
+    def forget(self, key):
+        with self._lock:
+            self._projects.pop(key, None)
+
+windows = _Windows()
+
+def _seen(turns):
+    """What the model has for each chunk, from the exchanges still in the window."""
+    seen = {}
+    for turn in turns:
+        seen.update(turn.shown)
+    return seen
+
+def prepare(key, code, question, objective=""):
+    """Builds this turn's code context for window `key` (None: no window). See the module docstring."""
+    turns = windows.window(key)
+    seen = _seen(turns)
+    file_tokens = estimate_tokens(code)
+    parts = []
+    shown = {}
+    outline = ""
+
+    if not turns and file_tokens <= ARCHITECT_CODE_TOKENS:
+        # Small file, new conversation: just send it
+        parts.append(f"Current code:\n```\n{code}\n```")
+        shown = {c.name: c.text for c in chunks(code)}
+    else:
+        all_chunks = chunks(code)
+        outline = "\n".join(c.header() for c in all_chunks)
+        question_terms = _terms(question)
+        objective_terms = _terms(objective)
+        lines_mentioned = {int(n) for n in re.findall(r"\bline\s+(\d+)", question or "", re.IGNORECASE)}
+
+        changed, unseen = [], []
+        for chunk in all_chunks:
+            if chunk.name not in seen:
+                unseen.append(chunk)
+            elif seen[chunk.name] != chunk.text:
+                changed.append(chunk)
+
+        budget = ARCHITECT_CODE_TOKENS
+        # Edits since last turn first - that is usually what the question is about
+        for chunk in changed:
+            diff = "\n".join(difflib.unified_diff(seen[chunk.name].splitlines(), chunk.text.splitlines(),
+                                                  f"{chunk.name} (before)", f"{chunk.name} (now)", lineterm="", n=1))
+            body = f"Changed since your last look, {chunk.name}:\n```diff\n{diff}\n```"
+            if estimate_tokens(diff) > estimate_tokens(chunk.text):
+                body = f"Changed since your last look, {chunk.name} (lines {chunk.start}-{chunk.end}):\n```\n{chunk.text}\n```"
+            if estimate_tokens(body) > budget:
+                continue
+            budget -= estimate_tokens(body)
+            parts.append(body)
+            shown[chunk.name] = chunk.text
+
+        # Then the unseen chunks that matter most for this question
+        ranked = sorted(unseen, key=lambda c: _score(c, question_terms, objective_terms, lines_mentioned), reverse=True)
+        for chunk in ranked:
+            if _score(chunk, question_terms, objective_terms, lines_mentioned) <= 0 and (seen or parts):
+                break # nothing relevant left; the outline covers the rest
+            body = f"{chunk.name} (lines {chunk.start}-{chunk.end}):\n```\n{chunk.text}\n```"
+            if estimate_tokens(body) > budget:
+                continue
+            budget -= estimate_tokens(body)
+            parts.append(body)
+            shown[chunk.name] = chunk.text
+
+        if not parts:
+            parts.append("(The code you have already seen is unchanged.)")
+
+    prompt = "\n\n".join(parts + [f"Question: {question}"])
+    history = [message for turn in turns for message in turn.messages()]
+    stats = {
+        "file_tokens": file_tokens,
+        "sent_code_tokens": estimate_tokens(prompt) - estimate_tokens(question or ""),
+        "history_tokens": sum(t.tokens() for t in turns),
+    }
+    return _Turn(key, question, prompt, shown, outline, history, stats)
+
+def record(turn, reply):
+    """Adds a finished exchange to its project's window."""
+    turn.reply = reply
+    windows.record(turn)
+
+def stats():
+    with windows._lock:
+        totals = dict(windows.totals)
+        projects = len(windows._projects)
+    saved = totals["file_tokens"] - totals["sent_code_tokens"]
+    return {"projects": projects, **totals, "code_tokens_saved": saved}
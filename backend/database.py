@@ -1,322 +1,363 @@
 import sqlite3
 import json
 import os
+import re
+import threading
+import traceback
+from collections.abc import MutableMapping
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+import migrations
+
 DB_PATH = 'career_sapling.db'
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS profiles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            role TEXT,
-            analysis_json TEXT,
-            projects_json TEXT,
-            job_matches_json TEXT,
-            job_matches_updated_at DATETIME, -- New column for cache tracking
-            active_projects_json TEXT, -- New column for active projects
-            current_phase INTEGER DEFAULT 0,
-            growth_stage TEXT DEFAULT 'Seed',
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Simple migration checks
-    try:
-        cursor.execute("ALTER TABLE profiles ADD COLUMN job_matches_json TEXT")
-    except sqlite3.OperationalError:
-        pass 
-        
-    try:
-        cursor.execute("ALTER TABLE profiles ADD COLUMN job_matches_updated_at DATETIME")
-    except sqlite3.OperationalError:
-        pass
+# --- CONNECTION MANAGER ---
+# Connections are opened once and handed out from a bounded pool instead of
+# paying connect + pragma setup on every helper call.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+STATEMENT_CACHE_SIZE = 256
 
-    try:
-        cursor.execute("ALTER TABLE profiles ADD COLUMN active_projects_json TEXT")
-    except sqlite3.OperationalError:
-        pass
-        
-    # NEW: Users Table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            full_name TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # NEW: Sessions Table for Auth
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            token TEXT PRIMARY KEY,
-            user_id INTEGER,
-            expires_at DATETIME,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # NEW: Global Projects Table for persistence
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS projects (
-            id TEXT PRIMARY KEY,
-            user_id INTEGER, -- Link to user
-            title TEXT,
-            data_json TEXT,
-            code_content TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # Try adding user_id to existing tables if missing
-    try:
-        cursor.execute("ALTER TABLE profiles ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE projects ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_goals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            text TEXT,
-            tag TEXT,
-            color TEXT,
-            is_done BOOLEAN DEFAULT 0,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_activity (
-             id INTEGER PRIMARY KEY AUTOINCREMENT,
-             user_id INTEGER,
-             date TEXT,
-             hours REAL,
-             level INTEGER,
-             UNIQUE(user_id, date)
-        )
-    ''')
+PRAGMAS = [
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA journal_mode = WAL",       # readers never block the writer
+    "PRAGMA synchronous = NORMAL",     # fsync on checkpoint only (safe with WAL)
+    "PRAGMA cache_size = -16000",      # ~16MB page cache per connection
+    "PRAGMA mmap_size = 268435456",    # 256MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+]
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = []
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        with self._cond:
+            while not self._idle and self._opened >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._opened += 1
 
-    try:
-        cursor.execute("ALTER TABLE user_goals ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass
-        
-    try:
-        cursor.execute("ALTER TABLE user_activity ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS channels (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            category TEXT NOT NULL
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS community_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            channel_id INTEGER,
-            user_id INTEGER,
-            content TEXT,
-            type TEXT DEFAULT 'text',
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(channel_id) REFERENCES channels(id),
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # Seed Default Channels
-    default_channels = [
-        ("general", "Community"),
-        ("frontend-devs", "Community"),
-        ("data-science", "Community"),
-        ("job-postings", "Career"),
-        ("code-review", "Dev")
-    ]
-    for name, cat in default_channels:
         try:
-            cursor.execute("INSERT INTO channels (name, category) VALUES (?, ?)", (name, cat))
-        except sqlite3.IntegrityError:
-            pass # Already exists
-
-    # NEW: Users Table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            full_name TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Try adding user_id to existing tables if missing
-    try:
-        cursor.execute("ALTER TABLE profiles ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass
-    
-    try:
-        cursor.execute("ALTER TABLE projects ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass
+            return self._open()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
 
-    try:
-        cursor.execute("ALTER TABLE user_goals ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass
-        
-    try:
-        cursor.execute("ALTER TABLE user_activity ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass
-    # Migration for code_content
-    try:
-        cursor.execute("ALTER TABLE projects ADD COLUMN code_content TEXT")
-    except sqlite3.OperationalError:
-        pass
-        
-    # NEW: Chat History Tables
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chat_sessions (
-            id TEXT PRIMARY KEY,
-            user_id INTEGER, -- Link to user
-            title TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-             FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''') 
-    
-    # Migration for chat_sessions
-    try:
-        cursor.execute("ALTER TABLE chat_sessions ADD COLUMN user_id INTEGER REFERENCES users(id)")
-    except sqlite3.OperationalError:
-        pass 
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chat_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            role TEXT,
-            content TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_goals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            profile_id INTEGER,
-            text TEXT,
-            tag TEXT,
-            color TEXT,
-            is_done BOOLEAN DEFAULT 0,
-            FOREIGN KEY(profile_id) REFERENCES profiles(id)
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_activity (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            profile_id INTEGER,
-            date TEXT, -- YYYY-MM-DD
-            hours REAL,
-            level INTEGER,
-            FOREIGN KEY(profile_id) REFERENCES profiles(id)
-        )
-    ''')
-    
-    # Migrations for Profile Details
-    columns = [
-        ("full_name", "TEXT DEFAULT 'Cadet X'"),
-        ("email", "TEXT DEFAULT 'cadet.x@careerai.com'"),
-        ("location", "TEXT DEFAULT 'New York, USA'"),
-        ("avatar", "TEXT"),
-        ("bio", "TEXT DEFAULT 'Software Engineer'")
-    ]
-    
-    for col, dtype in columns:
+    def release(self, conn):
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yields a pooled connection and commits on success / rolls back on error.
+        Nested calls on the same thread join the outer transaction.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self.acquire()
+        self._local.conn = conn
+        self._local.after_commit = callbacks = []
         try:
-            cursor.execute(f"ALTER TABLE profiles ADD COLUMN {col} {dtype}")
-        except sqlite3.OperationalError:
-            pass
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.after_commit = None
+            self.release(conn)
+
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                # The data is committed; report the callback with its traceback and run the rest
+                print(f"after_commit callback {fn!r} failed:")
+                traceback.print_exc()
+
+    def pending_callbacks(self):
+        """after_commit callbacks of this thread's open transaction (None outside one)."""
+        return getattr(self._local, "after_commit", None)
+
+    def close(self):
+        with self._cond:
+            for conn in self._idle:
+                conn.close()
+            self._opened -= len(self._idle)
+            self._idle = []
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    pool = _pool
+    if pool is not None and pool.path == DB_PATH:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+def transaction():
+    """Context-managed unit of work shared by every helper in this module."""
+    return get_pool().transaction()
+
+def after_commit(fn):
+    """
+    Runs `fn` once the enclosing transaction commits (dropped on rollback).
+    Outside a transaction it runs immediately.
+    """
+    callbacks = get_pool().pending_callbacks()
+    if callbacks is None:
+        fn()
+    else:
+        callbacks.append(fn)
+
+@contextmanager
+def savepoint(name="sp"):
+    """
+    Nested unit inside an open transaction: on error only this part (and the
+    after_commit callbacks it registered) is undone, then the error re-raised.
+    """
+    with transaction() as conn:
+        callbacks = get_pool().pending_callbacks()
+        mark = len(callbacks)
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            del callbacks[mark:]
+            raise
+        conn.execute(f"RELEASE {name}")
+
+def init_db():
+    """Brings the schema up to date. Cheap when nothing is pending."""
+    with transaction() as conn:
+        return migrations.migrate(conn)
+
+# --- LAZY ROWS ---
+# Profiles and projects are spread over several tables (skills, project ideas,
+# job matches, phases). Readers get a LazyRow: scalar columns are filled in
+# directly, child tables and JSON columns are queried/decoded on first access.
+
+class _Lazy:
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+
+def lazy(fn, *args):
+    """Marks a LazyRow field that is computed by fn(*args) when first read."""
+    return _Lazy(fn, args)
+
+class LazyRow(MutableMapping):
+    def __init__(self, fields):
+        self._fields = dict(fields)
+
+    def __getitem__(self, key):
+        value = self._fields[key]
+        if isinstance(value, _Lazy):
+            value = self._fields[key] = value.fn(*value.args)
+        return value
+
+    def __setitem__(self, key, value):
+        self._fields[key] = value
 
-    conn.commit()
-    conn.close()
+    def __delitem__(self, key):
+        del self._fields[key]
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        shown = {k: ("<lazy>" if isinstance(v, _Lazy) else v) for k, v in self._fields.items()}
+        return f"LazyRow({shown})"
+
+def materialize(value, fields=None):
+    """
+    Resolves lazy fields (recursively) into plain dicts/lists. With `fields`,
+    only those lazy fields are loaded and the other lazy ones are left out.
+    """
+    if isinstance(value, LazyRow):
+        keys = [k for k in value if fields is None or k in fields or not isinstance(value._fields[k], _Lazy)]
+        return {k: materialize(value[k]) for k in keys}
+    if isinstance(value, list):
+        return [materialize(v, fields) for v in value]
+    return value
+
+PROFILE_SELECT = "id, role, full_name, email, location, avatar, bio, analysis_json, job_matches_updated_at, growth_stage"
+ANALYSIS_SKILL_KINDS = (("current_skills", "current"), ("skill_gaps", "gap"))
+
+def _profile_row(row):
+    return LazyRow({
+        "id": row["id"],
+        "role": row["role"],
+        "full_name": row["full_name"],
+        "email": row["email"],
+        "location": row["location"],
+        "avatar": row["avatar"],
+        "bio": row["bio"],
+        "analysis": lazy(_load_analysis, row["id"], row["analysis_json"]),
+        "projects": lazy(_load_profile_projects, row["id"]),
+        "job_matches": lazy(_load_job_matches, row["id"]),
+        "job_matches_updated_at": row["job_matches_updated_at"],
+        "active_projects": [],
+        "growth_stage": row["growth_stage"]
+    })
+
+def _load_analysis(profile_id, analysis_json):
+    analysis = json.loads(analysis_json) if analysis_json else {}
+    with transaction() as conn:
+        rows = conn.execute('SELECT kind, skill FROM profile_skills WHERE profile_id = ? ORDER BY kind, position', (profile_id,)).fetchall()
+    for key, kind in ANALYSIS_SKILL_KINDS:
+        # Lists that weren't plain strings stayed inside analysis_json
+        if key not in analysis:
+            analysis[key] = [r["skill"] for r in rows if r["kind"] == kind]
+    return analysis
+
+def _replace_analysis(conn, profile_id, analysis):
+    analysis = dict(analysis)
+    conn.execute('DELETE FROM profile_skills WHERE profile_id = ?', (profile_id,))
+    for key, kind in ANALYSIS_SKILL_KINDS:
+        skills = analysis.get(key)
+        if isinstance(skills, list) and all(isinstance(s, str) for s in skills):
+            conn.executemany('INSERT INTO profile_skills (profile_id, kind, position, skill) VALUES (?, ?, ?, ?)',
+                             [(profile_id, kind, i, s) for i, s in enumerate(skills)])
+            del analysis[key]
+    conn.execute('UPDATE profiles SET analysis_json = ? WHERE id = ?', (json.dumps(analysis), profile_id))
+
+def _load_profile_projects(profile_id):
+    with transaction() as conn:
+        rows = conn.execute('SELECT data_json FROM profile_projects WHERE profile_id = ? ORDER BY position', (profile_id,)).fetchall()
+    return [json.loads(r["data_json"]) for r in rows]
+
+def _replace_profile_projects(conn, profile_id, projects):
+    conn.execute('DELETE FROM profile_projects WHERE profile_id = ?', (profile_id,))
+    conn.executemany('INSERT INTO profile_projects (profile_id, position, project_key, title, difficulty, data_json) VALUES (?, ?, ?, ?, ?, ?)',
+                     [(profile_id, i, p.get('id'), p.get('title'), p.get('difficulty'), json.dumps(p)) for i, p in enumerate(projects)])
+
+def _load_job_matches(profile_id):
+    with transaction() as conn:
+        rows = conn.execute('SELECT data_json FROM job_matches WHERE profile_id = ? ORDER BY position', (profile_id,)).fetchall()
+    return [json.loads(r["data_json"]) for r in rows]
+
+def _replace_job_matches(conn, profile_id, jobs):
+    conn.execute('DELETE FROM job_matches WHERE profile_id = ?', (profile_id,))
+    conn.executemany('INSERT INTO job_matches (profile_id, position, title, company, link, match_score, data_json) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     [(profile_id, i, j.get('title'), j.get('company'), j.get('link'), j.get('match_score'), json.dumps(j))
+                      for i, j in enumerate(jobs)])
+
+# Project keys stored as real columns / child rows; anything else lives in data_json
+PROJECT_COLUMNS = ("id", "title", "tech_stack", "description", "current_phase", "total_phases", "phases", "started_at")
+PROJECT_SELECT = "id, title, tech_stack, description, current_phase, total_phases, started_at, data_json"
+
+def _project_row(row, phases=None):
+    data = LazyRow({
+        "id": row["id"],
+        "title": row["title"],
+        "tech_stack": row["tech_stack"],
+        "description": row["description"],
+        "current_phase": row["current_phase"],
+        "total_phases": row["total_phases"],
+        "phases": phases or lazy(_load_project_phases, row["id"]),
+        "started_at": row["started_at"]
+    })
+    if row["data_json"] and row["data_json"] != '{}':
+        data.update(json.loads(row["data_json"]))
+    return data
+
+def _phase(r):
+    phase = {"id": r["phase_id"], "title": r["title"], "description": r["description"], "tasks": json.loads(r["tasks_json"])}
+    if r["resources_json"] is not None:
+        phase["resources"] = json.loads(r["resources_json"])
+    return phase
+
+def _load_project_phases(project_id):
+    with transaction() as conn:
+        rows = conn.execute('''
+            SELECT phase_id, title, description, tasks_json, resources_json
+            FROM project_phases WHERE project_id = ? ORDER BY position
+        ''', (project_id,)).fetchall()
+    return [_phase(r) for r in rows]
+
+class _PhaseBatch:
+    """Phases of every project in one listing, loaded with a single query when the first one is read."""
+    def __init__(self, project_ids):
+        self.project_ids = project_ids
+        self.phases = None
+
+    def load(self, project_id):
+        if self.phases is None:
+            self.phases = {pid: [] for pid in self.project_ids}
+            with transaction() as conn:
+                rows = conn.execute('''
+                    SELECT project_id, phase_id, title, description, tasks_json, resources_json
+                    FROM project_phases WHERE project_id IN (SELECT value FROM json_each(?)) ORDER BY project_id, position
+                ''', (json.dumps(self.project_ids),)).fetchall()
+            for r in rows:
+                self.phases[r["project_id"]].append(_phase(r))
+        return self.phases.get(project_id, [])
+
+def _replace_project_phases(conn, project_id, phases):
+    conn.execute('DELETE FROM project_phases WHERE project_id = ?', (project_id,))
+    conn.executemany('''
+        INSERT INTO project_phases (project_id, position, phase_id, title, description, tasks_json, resources_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(project_id, i, ph.get('id'), ph.get('title'), ph.get('description'), json.dumps(ph.get('tasks', [])),
+           json.dumps(ph['resources']) if 'resources' in ph else None) for i, ph in enumerate(phases)])
 
 # --- GOALS API ---
 def get_user_goals(profile_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM user_goals WHERE profile_id = ?', (profile_id,))
-    rows = cursor.fetchall()
-    conn.close()
+    with transaction() as conn:
+        rows = conn.execute('SELECT * FROM user_goals WHERE profile_id = ?', (profile_id,)).fetchall()
     return [dict(r) for r in rows]
 
 def add_user_goal(profile_id, goal_data):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO user_goals (profile_id, text, tag, color, is_done) VALUES (?, ?, ?, ?, ?)',
-                  (profile_id, goal_data['text'], goal_data['tag'], goal_data['color'], goal_data.get('is_done', False)))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('INSERT INTO user_goals (profile_id, text, tag, color, is_done) VALUES (?, ?, ?, ?, ?)',
+                     (profile_id, goal_data['text'], goal_data['tag'], goal_data['color'], goal_data.get('is_done', False)))
 
 def update_goal_status(goal_id, is_done):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE user_goals SET is_done = ? WHERE id = ?', (is_done, goal_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('UPDATE user_goals SET is_done = ? WHERE id = ?', (is_done, goal_id))
     
 def delete_goal(goal_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM user_goals WHERE id = ?', (goal_id,))
-    conn.commit()
-    conn.close()
-
-# --- ACTIVITY API ---
-def get_user_activity(profile_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    # Get last 365 days
-    cursor.execute('SELECT * FROM user_activity WHERE profile_id = ? ORDER BY date DESC LIMIT 365', (profile_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
-
-def log_user_activity(profile_id, date, hours, level):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Upsert logic (replace if same day exists)
-    cursor.execute('DELETE FROM user_activity WHERE profile_id = ? AND date = ?', (profile_id, date))
-    cursor.execute('INSERT INTO user_activity (profile_id, date, hours, level) VALUES (?, ?, ?, ?)',
-                  (profile_id, date, hours, level))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('DELETE FROM user_goals WHERE id = ?', (goal_id,))
 
 # --- PROFILE UPDATE ---
 def update_profile_details(profile_id, updates):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     fields = []
     values = []
     for k, v in updates.items():
@@ -326,94 +367,101 @@ def update_profile_details(profile_id, updates):
             
     if fields:
         values.append(profile_id)
-        cursor.execute(f"UPDATE profiles SET {', '.join(fields)} WHERE id = ?", tuple(values))
-        conn.commit()
-        
-    conn.close()
+        with transaction() as conn:
+            conn.execute(f"UPDATE profiles SET {', '.join(fields)} WHERE id = ?", tuple(values))
 
 def create_chat_session(session_id, user_id, title="New Chat"):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('INSERT OR IGNORE INTO chat_sessions (id, user_id, title) VALUES (?, ?, ?)', (session_id, user_id, title))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('INSERT OR IGNORE INTO chat_sessions (id, user_id, title) VALUES (?, ?, ?)', (session_id, user_id, title))
 
 def save_chat_message(session_id, role, content):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO chat_messages (session_id, role, content) VALUES (?, ?, ?)', (session_id, role, content))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('INSERT INTO chat_messages (session_id, role, content) VALUES (?, ?, ?)', (session_id, role, content))
 
 def get_chat_history(session_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT role, content FROM chat_messages WHERE session_id = ? ORDER BY id ASC', (session_id,))
-    rows = cursor.fetchall()
-    conn.close()
+    with transaction() as conn:
+        rows = conn.execute('SELECT role, content FROM chat_messages WHERE session_id = ? ORDER BY id ASC', (session_id,)).fetchall()
     return [{"role": r["role"], "content": r["content"]} for r in rows]
 
+def get_chat_memory(session_id, tail):
+    """
+    The session's running summary plus its newest `tail` messages not yet
+    folded into it (oldest first), and how many such messages there are.
+    Reads only the tail, however long the conversation is.
+    """
+    with transaction() as conn:
+        session = conn.execute('SELECT summary, summarized_through FROM chat_sessions WHERE id = ?', (session_id,)).fetchone()
+        through = session["summarized_through"] if session else 0
+        rows = conn.execute('''
+            SELECT id, role, content FROM chat_messages
+            WHERE session_id = ? AND id > ? ORDER BY id DESC LIMIT ?
+        ''', (session_id, through, tail)).fetchall()
+        unsummarized = len(rows)
+        if unsummarized == tail:
+            unsummarized = conn.execute('SELECT COUNT(*) FROM chat_messages WHERE session_id = ? AND id > ?',
+                                        (session_id, through)).fetchone()[0]
+    return {
+        "summary": session["summary"] if session else None,
+        "summarized_through": through,
+        "messages": [{"id": r["id"], "role": r["role"], "content": r["content"]} for r in reversed(rows)],
+        "unsummarized": unsummarized,
+    }
+
+def get_chat_messages_after(session_id, after_id, limit):
+    """Oldest-first messages of a session with id > after_id."""
+    with transaction() as conn:
+        rows = conn.execute('''
+            SELECT id, role, content FROM chat_messages
+            WHERE session_id = ? AND id > ? ORDER BY id ASC LIMIT ?
+        ''', (session_id, after_id, limit)).fetchall()
+    return [{"id": r["id"], "role": r["role"], "content": r["content"]} for r in rows]
+
+def update_chat_summary(session_id, summary, through_id, expected_through):
+    """Stores a new summary unless another writer moved summarized_through first. Returns True if stored."""
+    with transaction() as conn:
+        cursor = conn.execute('''
+            UPDATE chat_sessions SET summary = ?, summarized_through = ?
+            WHERE id = ? AND summarized_through = ?
+        ''', (summary, through_id, session_id, expected_through))
+    return cursor.rowcount > 0
+
 def get_all_chat_sessions(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM chat_sessions WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
-    rows = cursor.fetchall()
-    conn.close()
+    with transaction() as conn:
+        rows = conn.execute('SELECT * FROM chat_sessions WHERE user_id = ? ORDER BY created_at DESC', (user_id,)).fetchall()
     return [{"id": r["id"], "title": r["title"], "created_at": r["created_at"]} for r in rows]
 
 def rename_chat_session(session_id, new_title):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE chat_sessions SET title = ? WHERE id = ?', (new_title, session_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('UPDATE chat_sessions SET title = ? WHERE id = ?', (new_title, session_id))
 
 def delete_chat_session(session_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Delete messages first (if no cascade)
-    cursor.execute('DELETE FROM chat_messages WHERE session_id = ?', (session_id,))
-    # Delete session
-    cursor.execute('DELETE FROM chat_sessions WHERE id = ?', (session_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # Delete messages first (if no cascade)
+        conn.execute('DELETE FROM chat_messages WHERE session_id = ?', (session_id,))
+        # Delete session
+        conn.execute('DELETE FROM chat_sessions WHERE id = ?', (session_id,))
 
 def update_phase_progress(project_id, phase_index):
-    """Updates progress for a specific project in the global table."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Get current project data
-    cursor.execute('SELECT data_json FROM projects WHERE id = ?', (project_id,))
-    row = cursor.fetchone()
-    
-    if row:
-        project_data = json.loads(row['data_json'])
-        project_data['current_phase'] = phase_index
-        
-        cursor.execute('UPDATE projects SET data_json = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', 
-                      (json.dumps(project_data), project_id))
-        conn.commit()
-        
-    conn.close()
+    """
+    Updates progress for a specific project in the global table.
+    Returns the owning user_id (None if the project doesn't exist or has no owner).
+    """
+    with transaction() as conn:
+        row = conn.execute('SELECT user_id, current_phase, phase_count FROM projects WHERE id = ?', (project_id,)).fetchone()
+        if not row:
+            return None
 
-def update_project_code(project_id, code):
-    """Syncs the latest code content to the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE projects SET code_content = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', (code, project_id))
-    conn.commit()
-    conn.close()
+        conn.execute('UPDATE projects SET current_phase = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                     (phase_index, project_id))
+        old_done, old_phases = _project_progress(row['current_phase'], row['phase_count'])
+        new_done, new_phases = _project_progress(phase_index, row['phase_count'])
+        _bump_user_progress(conn, row['user_id'], 0, new_done - old_done, new_phases - old_phases)
+        return row['user_id']
 
 def update_job_matches(profile_id, job_matches):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE profiles SET job_matches_json = ?, job_matches_updated_at = CURRENT_TIMESTAMP WHERE id = ?', (json.dumps(job_matches), profile_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        _replace_job_matches(conn, profile_id, job_matches)
+        conn.execute('UPDATE profiles SET job_matches_updated_at = CURRENT_TIMESTAMP WHERE id = ?', (profile_id,))
 
 def save_active_projects(profile_id, active_projects):
     """
@@ -425,272 +473,187 @@ def save_active_projects(profile_id, active_projects):
 
 def save_project_globally(project_data, user_id=None):
     """Saves or updates a project in the global projects table."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     project_id = project_data['id']
     title = project_data['title']
+    phases = project_data.get('phases') or []
+    current_phase = project_data.get('current_phase', 1)
+    extras = {k: v for k, v in project_data.items() if k not in PROJECT_COLUMNS}
+    values = (project_data.get('tech_stack'), project_data.get('description'), current_phase,
+              project_data.get('total_phases'), project_data.get('started_at'), len(phases), json.dumps(extras))
+    new_done, new_phases = _project_progress(current_phase, len(phases))
     
-    # Check if exists
-    cursor.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
-    exists = cursor.fetchone()
-    
-    if exists:
-        cursor.execute('UPDATE projects SET data_json = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                      (json.dumps(project_data), project_id))
-    else:
-        cursor.execute('INSERT INTO projects (id, title, data_json, user_id) VALUES (?, ?, ?, ?)',
-                      (project_id, title, json.dumps(project_data), user_id))
-                      
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # Check if exists
+        existing = conn.execute('SELECT user_id, current_phase, phase_count FROM projects WHERE id = ?', (project_id,)).fetchone()
+        
+        if existing:
+            conn.execute('''
+                UPDATE projects SET tech_stack = ?, description = ?, current_phase = ?, total_phases = ?, started_at = ?,
+                       phase_count = ?, data_json = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', values + (project_id,))
+            old_done, old_phases = _project_progress(existing['current_phase'], existing['phase_count'])
+            _bump_user_progress(conn, existing['user_id'], 0, new_done - old_done, new_phases - old_phases)
+        else:
+            conn.execute('''
+                INSERT INTO projects (tech_stack, description, current_phase, total_phases, started_at, phase_count, data_json, id, title, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values + (project_id, title, user_id))
+            _bump_user_progress(conn, user_id, 1, new_done, new_phases)
+
+        _replace_project_phases(conn, project_id, phases)
 
 def get_all_active_projects(user_id=None):
-    """Retrieves all projects from the global table."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    if user_id:
-        cursor.execute('SELECT data_json FROM projects WHERE user_id = ? ORDER BY updated_at DESC', (user_id,))
-    else:
-        cursor.execute('SELECT data_json FROM projects ORDER BY updated_at DESC')
-    rows = cursor.fetchall()
-    conn.close()
+    """Retrieves all projects from the global table. Phases load on first access, for the whole list at once."""
+    with transaction() as conn:
+        if user_id:
+            rows = conn.execute(f'SELECT {PROJECT_SELECT} FROM projects WHERE user_id = ? ORDER BY updated_at DESC', (user_id,)).fetchall()
+        else:
+            rows = conn.execute(f'SELECT {PROJECT_SELECT} FROM projects ORDER BY updated_at DESC').fetchall()
     
-    return [json.loads(row['data_json']) for row in rows]
+    batch = _PhaseBatch([row["id"] for row in rows])
+    return [_project_row(row, lazy(batch.load, row["id"])) for row in rows]
+
+def get_project_owner(project_id):
+    """The project's user_id (None if the project doesn't exist or has no owner)."""
+    with transaction() as conn:
+        row = conn.execute('SELECT user_id FROM projects WHERE id = ?', (project_id,)).fetchone()
+    return row['user_id'] if row else None
 
 def get_project_by_id(project_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT data_json, code_content FROM projects WHERE id = ?', (project_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with transaction() as conn:
+        row = conn.execute(f'SELECT {PROJECT_SELECT}, code_content FROM projects WHERE id = ?', (project_id,)).fetchone()
     
     if row:
-        data = json.loads(row['data_json'])
-        # Inject code_content if exists and not in json
-        if 'code_content' in row.keys() and row['code_content']:
+        data = _project_row(row)
+        # Inject code_content if exists
+        if row['code_content']:
              data['code'] = row['code_content']
         return data
     return None
 
 def save_career_data(role, analysis, projects, stage, user_id=None):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     # Convert Pydantic objects to dicts
     projects_list = [p.model_dump() if hasattr(p, 'model_dump') else p for p in projects]
     analysis_dict = analysis.model_dump() if hasattr(analysis, 'model_dump') else analysis
     
-    cursor.execute('''
-        INSERT INTO profiles (role, analysis_json, projects_json, growth_stage, user_id)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (role, json.dumps(analysis_dict), json.dumps(projects_list), stage, user_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.execute('''
+            INSERT INTO profiles (role, analysis_json, growth_stage, user_id)
+            VALUES (?, ?, ?, ?)
+        ''', (role, '{}', stage, user_id))
+        profile_id = cursor.lastrowid
+        _replace_analysis(conn, profile_id, analysis_dict)
+        _replace_profile_projects(conn, profile_id, projects_list)
 
 def get_profile_by_user_id(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM profiles WHERE user_id = ? ORDER BY timestamp DESC LIMIT 1', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with transaction() as conn:
+        row = conn.execute(f'SELECT {PROFILE_SELECT} FROM profiles WHERE user_id = ? ORDER BY timestamp DESC LIMIT 1', (user_id,)).fetchone()
     
     if row:
-        job_matches = []
-        if row["job_matches_json"]:
-            job_matches = json.loads(row["job_matches_json"])
-            
-        active_projects = [] 
-
-        updated_at = row["job_matches_updated_at"] if "job_matches_updated_at" in row.keys() else None
-            
-        return {
-            "id": row["id"],
-            "role": row["role"],
-            "full_name": row["full_name"],
-            "email": row["email"],
-            "location": row["location"],
-            "avatar": row["avatar"],
-            "bio": row["bio"],
-            "analysis": json.loads(row["analysis_json"]),
-            "projects": json.loads(row["projects_json"]),
-            "job_matches": job_matches,
-            "job_matches_updated_at": updated_at,
-            "active_projects": active_projects,
-            "growth_stage": row["growth_stage"]
-        }
+        return _profile_row(row)
     return None
 
 def get_latest_profile():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM profiles ORDER BY timestamp DESC LIMIT 1')
-    row = cursor.fetchone()
-    conn.close()
+    with transaction() as conn:
+        row = conn.execute(f'SELECT {PROFILE_SELECT} FROM profiles ORDER BY timestamp DESC LIMIT 1').fetchone()
     
     if row:
-        job_matches = []
-        if row["job_matches_json"]:
-            job_matches = json.loads(row["job_matches_json"])
-            
-        # For active_projects, we now prefer the global table, 
-        # but we return empty here to avoid confusion or legacy data.
-        active_projects = [] 
-
-        # Handle missing column gracefully during transition
-        updated_at = row["job_matches_updated_at"] if "job_matches_updated_at" in row.keys() else None
-            
-        return {
-            "id": row["id"],
-            "role": row["role"],
-            "full_name": row["full_name"], # New
-            "email": row["email"],         # New
-            "location": row["location"],   # New
-            "avatar": row["avatar"],       # New
-            "bio": row["bio"],             # New
-            "analysis": json.loads(row["analysis_json"]),
-            "projects": json.loads(row["projects_json"]),
-            "job_matches": job_matches,
-            "job_matches_updated_at": updated_at,
-            "active_projects": active_projects,
-            "growth_stage": row["growth_stage"]
-        }
+        return _profile_row(row)
     return None
 
 def get_all_profiles():
     """Retrieves all past uploads for the history sidebar."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    # Fetch all records, newest first
-    cursor.execute('SELECT id, role, timestamp FROM profiles ORDER BY timestamp DESC')
-    rows = cursor.fetchall()
-    conn.close()
+    with transaction() as conn:
+        # Fetch all records, newest first
+        rows = conn.execute('SELECT id, role, timestamp FROM profiles ORDER BY timestamp DESC').fetchall()
     
     return [{"id": r["id"], "role": r["role"], "date": r["timestamp"]} for r in rows]
 
 def get_profile_by_id(profile_id):
     """Retrieves a specific profile when clicked in the sidebar."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM profiles WHERE id = ?', (profile_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with transaction() as conn:
+        row = conn.execute('SELECT id, role, analysis_json, growth_stage FROM profiles WHERE id = ?', (profile_id,)).fetchone()
     
     if row:
-        job_matches = []
-        if row["job_matches_json"]:
-            job_matches = json.loads(row["job_matches_json"])
-            
-        active_projects = []
-
-        return {
+        return LazyRow({
             "role": row["role"],
-            "analysis": json.loads(row["analysis_json"]),
-            "projects": json.loads(row["projects_json"]),
-            "job_matches": job_matches,
-            "active_projects": active_projects,
+            "analysis": lazy(_load_analysis, row["id"], row["analysis_json"]),
+            "projects": lazy(_load_profile_projects, row["id"]),
+            "job_matches": lazy(_load_job_matches, row["id"]),
+            "active_projects": [],
             "growth_stage": row["growth_stage"]
-        }
+        })
     return None
 
 def delete_profile(profile_id):
     """Permanently removes a profile session from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM profiles WHERE id = ?', (profile_id,))
-    conn.commit() # Save the deletion to disk
-    conn.close()
+    with transaction() as conn:
+        for table in ('profile_skills', 'profile_projects', 'job_matches'):
+            conn.execute(f'DELETE FROM {table} WHERE profile_id = ?', (profile_id,))
+        conn.execute('DELETE FROM profiles WHERE id = ?', (profile_id,))
     return True
 
 def delete_project(project_id):
     """Deletes a project from the global projects table."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        row = conn.execute('SELECT user_id, current_phase, phase_count FROM projects WHERE id = ?', (project_id,)).fetchone()
+        conn.execute('DELETE FROM project_phases WHERE project_id = ?', (project_id,))
+        conn.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+        if row:
+            done, phases = _project_progress(row['current_phase'], row['phase_count'])
+            _bump_user_progress(conn, row['user_id'], -1, -done, -phases)
     return True
 
 def update_latest_profile_projects(projects):
-    """Updates the projects_json for the most recent profile."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Get latest ID
-    cursor.execute('SELECT id FROM profiles ORDER BY timestamp DESC LIMIT 1')
-    row = cursor.fetchone()
-    
-    if row:
-        profile_id = row[0]
-        # Convert Pydantic objects if needed, or raw dicts
-        projects_list = [p if isinstance(p, dict) else p.model_dump() for p in projects]
+    """Updates the project ideas for the most recent profile."""
+    with transaction() as conn:
+        # Get latest ID
+        row = conn.execute('SELECT id FROM profiles ORDER BY timestamp DESC LIMIT 1').fetchone()
         
-        cursor.execute('UPDATE profiles SET projects_json = ? WHERE id = ?', 
-                      (json.dumps(projects_list), profile_id))
-        conn.commit()
-        conn.close()
-        return True
+        if row:
+            profile_id = row[0]
+            # Convert Pydantic objects if needed, or raw dicts
+            projects_list = [p if isinstance(p, dict) else p.model_dump() for p in projects]
+            _replace_profile_projects(conn, profile_id, projects_list)
+            return True
     
-    conn.close()
     return False
 
-def recalculate_user_growth(profile_id):
-    """Dynamically updates the user's growth stage based on project progress."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Get all projects from global table
-    # In a multi-user app, we'd filter by user_id. Here we assume single-user session or global context.
-    cursor.execute('SELECT data_json FROM projects')
-    rows = cursor.fetchall()
-    
-    total_phases_count = 0
-    completed_phases_count = 0
-    projects_started = 0
-    projects_completed = 0
-    
-    for row in rows:
-        p = json.loads(row['data_json'])
-        
-        # Determine progress for this project
-        # current_phase starts at 1. If 1, 0 completed. If 2, 1 completed.
-        c_phase = p.get('current_phase', 1)
-        phases = p.get('phases', [])
-        total_p = len(phases) if phases else 6
-        
-        projects_started += 1
-        
-        # Calculate actual completed phases
-        # If current_phase is 7 (and total is 6), user completed all 6.
-        if c_phase > total_p:
-            projects_completed += 1
-            completed_phases_count += total_p
-        else:
-            completed_phases_count += (c_phase - 1)
-            
-        total_phases_count += total_p
+# --- PROGRESS COUNTERS ---
+# user_progress holds per-user totals that are adjusted in the same transaction
+# as every project write, so growth/tree stats are O(1) instead of a scan of
+# every project on the platform.
 
+def _project_progress(current_phase, phase_count):
+    """(completed_projects, completed_phases) contributed by one project."""
+    # current_phase starts at 1. If 1, 0 completed. If 2, 1 completed.
+    c_phase = current_phase or 1
+    total_p = phase_count or 6
+    # If current_phase is 7 (and total is 6), user completed all 6.
+    if c_phase > total_p:
+        return 1, total_p
+    return 0, c_phase - 1
+
+def _bump_user_progress(conn, user_id, started, completed, phases):
+    if not (started or completed or phases):
+        return
+    conn.execute('''
+        INSERT INTO user_progress (user_id, projects_started, projects_completed, completed_phases)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            projects_started = projects_started + excluded.projects_started,
+            projects_completed = projects_completed + excluded.projects_completed,
+            completed_phases = completed_phases + excluded.completed_phases
+    ''', (user_id or 0, started, completed, phases))
+
+def _growth_stage(total_trees):
     # Define Stage Rules Logic (Forest Scale)
     # 1. Sprout: 0-4 Trees
     # 2. Grove Guardian: 5-14 Trees
     # 3. Forest Ranger: 15-29 Trees
     # 4. Terraformer: 30-49 Trees
     # 5. Gaia's Legacy: 50+ Trees
-    
-    # We count "Trees" as completed projects OR significant progress (e.g. 6 phases = 1 tree equivalent)
-    # Total Trees = Projects Completed + (Completed Phases / 6)
-    
-    total_trees = projects_completed + (completed_phases_count // 6)
-    
     new_stage = "Sprout"
     
     if total_trees >= 5:
@@ -704,218 +667,768 @@ def recalculate_user_growth(profile_id):
         
     if total_trees >= 50:
         new_stage = "Gaia's Legacy"
+    return new_stage
 
-    # Update the profile
-    # Get latest profile ID if not provided specific match logic?
-    # For now update the specific profile_id passed
-    if profile_id:
-        cursor.execute('UPDATE profiles SET growth_stage = ? WHERE id = ?', (new_stage, profile_id))
-    else:
-        # Update latest
-        cursor.execute('UPDATE profiles SET growth_stage = ? WHERE id = (SELECT id FROM profiles ORDER BY timestamp DESC LIMIT 1)', (new_stage,))
+def get_user_progress(user_id):
+    with transaction() as conn:
+        row = conn.execute('''
+            SELECT projects_started, projects_completed, completed_phases, trees FROM user_progress WHERE user_id = ?
+        ''', (user_id or 0,)).fetchone()
+    if row:
+        return dict(row)
+    return {"projects_started": 0, "projects_completed": 0, "completed_phases": 0, "trees": 0}
+
+def recalculate_user_growth(profile_id, user_id=None):
+    """
+    Updates the growth stage from the materialized progress counters.
+    With user_id, only that user's progress counts and their latest profile is
+    updated; without it the platform-wide totals are used (legacy behaviour).
+    """
+    with transaction() as conn:
+        if user_id is not None:
+            # We count "Trees" as completed projects OR significant progress (e.g. 6 phases = 1 tree equivalent)
+            total_trees = get_user_progress(user_id)["trees"]
+        else:
+            total_trees = get_global_tree_stats()
+        
+        new_stage = _growth_stage(total_trees)
+
+        # Update the profile
+        if profile_id:
+            conn.execute('UPDATE profiles SET growth_stage = ? WHERE id = ?', (new_stage, profile_id))
+        elif user_id is not None:
+            conn.execute('''
+                UPDATE profiles SET growth_stage = ?
+                WHERE id = (SELECT id FROM profiles WHERE user_id = ? ORDER BY timestamp DESC LIMIT 1)
+            ''', (new_stage, user_id))
+        else:
+            # Update latest
+            conn.execute('UPDATE profiles SET growth_stage = ? WHERE id = (SELECT id FROM profiles ORDER BY timestamp DESC LIMIT 1)', (new_stage,))
 
-    conn.commit()
-    conn.close()
     return new_stage
 
 def get_global_tree_stats():
     """Calculates total trees (completed projects + partial phases)"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT data_json FROM projects')
-    rows = cursor.fetchall()
-    
-    total_phases = 0
-    full_projects = 0
-    
-    for row in rows:
-        p = json.loads(row['data_json'])
-        c_phase = p.get('current_phase', 1)
-        phases = p.get('phases', [])
-        total_p = len(phases) if phases else 6
-        
-        if c_phase > total_p:
-            full_projects += 1
-            total_phases += total_p
-        else:
-            total_phases += (c_phase - 1)
-            
-    conn.close()
+    with transaction() as conn:
+        row = conn.execute('SELECT SUM(projects_completed), SUM(completed_phases) FROM user_progress').fetchone()
     
     # Formula: Trees = Projects + (Phases / 6)
-    trees_count = full_projects + (total_phases // 6)
-    return trees_count
+    full_projects, total_phases = row[0] or 0, row[1] or 0
+    return full_projects + (total_phases // 6)
+
+def verify_user_progress(repair=False):
+    """
+    Recomputes every user's counters from the projects table and returns the
+    rows that disagree as [(user_id, stored, expected)]. With repair=True the
+    stored counters are replaced by the recomputed ones.
+    """
+    fields = ("projects_started", "projects_completed", "completed_phases")
+    with transaction() as conn:
+        expected = {r["user_id"]: tuple(r[f] for f in fields) for r in conn.execute(migrations.PROGRESS_SQL)}
+        stored = {r["user_id"]: tuple(r[f] for f in fields) for r in conn.execute('SELECT * FROM user_progress')}
+
+        mismatches = []
+        for uid in sorted(set(expected) | set(stored)):
+            want = expected.get(uid, (0, 0, 0))
+            have = stored.get(uid, (0, 0, 0))
+            if want != have:
+                mismatches.append((uid, dict(zip(fields, have)), dict(zip(fields, want))))
+
+        if repair and mismatches:
+            conn.execute('DELETE FROM user_progress')
+            conn.execute(f'INSERT INTO user_progress (user_id, {", ".join(fields)}) {migrations.PROGRESS_SQL}')
+    return mismatches
 
 def create_user(email, password_hash, full_name):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO users (email, password_hash, full_name) VALUES (?, ?, ?)", 
-                      (email, password_hash, full_name))
-        user_id = cursor.lastrowid
-        conn.commit()
-        return user_id
+        with transaction() as conn:
+            cursor = conn.execute("INSERT INTO users (email, password_hash, full_name) VALUES (?, ?, ?)", 
+                                  (email, password_hash, full_name))
+            return cursor.lastrowid
     except sqlite3.IntegrityError:
         return None
-    finally:
-        conn.close()
 
 def get_user_by_email(email):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    with transaction() as conn:
+        return conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
 
 def get_user_by_id(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    with transaction() as conn:
+        return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
 
 # NEW: Session Management
 def create_session(user_id, token):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
     # Expire in 30 days
     expires_at = (datetime.now() + timedelta(days=30)).isoformat()
-    cursor.execute("INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)", 
-                  (token, user_id, expires_at))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)", 
+                     (token, user_id, expires_at))
 
 def get_user_by_token(token):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id, expires_at FROM sessions WHERE token = ?", (token,))
-    session = cursor.fetchone()
-    
-    if not session:
-        conn.close()
-        return None
-        
-    if session['expires_at'] < datetime.now().isoformat():
-        conn.close()
-        return None
-        
-    user = get_user_by_id(session['user_id'])
-    conn.close()
-    return user
+    """
+    Returns the user row for a live session token (None if unknown/expired).
+    The row also carries `session_expires_at` so callers can cache it.
+    """
+    with transaction() as conn:
+        return conn.execute('''
+            SELECT u.*, s.expires_at AS session_expires_at
+            FROM sessions s JOIN users u ON u.id = s.user_id
+            WHERE s.token = ? AND s.expires_at >= ?
+        ''', (token, datetime.now().isoformat())).fetchone()
+
+def delete_session(token):
+    with transaction() as conn:
+        conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+
+def purge_expired_sessions():
+    """Deletes expired session rows. Returns how many were removed."""
+    with transaction() as conn:
+        cursor = conn.execute("DELETE FROM sessions WHERE expires_at < ?", (datetime.now().isoformat(),))
+        return cursor.rowcount
 
 def get_user_tree_stats(user_id):
     """Calculates trees grown for a specific user."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
     # Count of User's Projects * 5
-    cursor.execute('SELECT COUNT(*) FROM projects WHERE user_id = ?', (user_id,))
-    res = cursor.fetchone()
-    count = res[0] if res else 0
-    conn.close()
-    return count * 5
-        
-    user = get_user_by_id(session['user_id'])
-    conn.close()
-    return user
+    return get_user_progress(user_id)["projects_started"] * 5
 
 def get_channels():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, category FROM channels")
-    rows = cursor.fetchall()
-    conn.close()
+    with transaction() as conn:
+        rows = conn.execute("SELECT id, name, category FROM channels").fetchall()
     return [{"id": r[0], "name": r[1], "category": r[2]} for r in rows]
 
-def get_channel_messages(channel_name):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Join with users to get name and avatar (we'll just use initial as avatar if missing)
-    query = '''
-        SELECT m.id, u.full_name, u.email, m.content, m.type, m.timestamp
-        FROM community_messages m
-        JOIN channels c ON m.channel_id = c.id
-        JOIN users u ON m.user_id = u.id
-        WHERE c.name = ?
-        ORDER BY m.timestamp ASC
-        LIMIT 50
-    '''
-    cursor.execute(query, (channel_name,))
-    rows = cursor.fetchall()
-    conn.close()
-    
-    messages = []
-    for r in rows:
-        messages.append({
-            "id": r[0],
-            "user": r[1] or "Anonymous",
-            "avatar": "", # Frontend can generate avatar from name
-            "role": "Member", # Hardcoded for now, or fetch from profile
-            "content": r[3],
-            "type": r[4],
-            "time": r[5] # Raw timestamp, frontend formats it
-        })
-    return messages
+# --- COMMUNITY FEED ---
+# The newest COMMUNITY_BUFFER_SIZE messages of each channel are kept in memory,
+# written through by add_community_message, so the 3s chat polls and "load
+# newer" calls never hit SQLite. Older pages use a (channel_id, id) range scan.
+
+COMMUNITY_BUFFER_SIZE = int(os.getenv("COMMUNITY_BUFFER_SIZE", "200"))
+MESSAGE_PAGE_LIMIT = 100
+
+MESSAGE_SELECT = '''
+    SELECT m.id, u.full_name, m.content, m.type, m.timestamp
+    FROM community_messages m
+    LEFT JOIN users u ON m.user_id = u.id
+'''
+
+class _ChannelFeed:
+    """Newest messages of one channel, ascending by id."""
+    def __init__(self, messages, floor):
+        self.messages = messages
+        # Every message of the channel with id > floor is in `messages`
+        self.floor = floor
+
+    def add(self, msg):
+        if self.messages and self.messages[-1]["id"] >= msg["id"]:
+            # Concurrent writers can commit out of order, and a message may
+            # already be here if the feed was loaded after it committed
+            if msg["id"] <= self.floor or any(m["id"] == msg["id"] for m in self.messages):
+                return
+            self.messages.append(msg)
+            self.messages.sort(key=lambda m: m["id"])
+        else:
+            self.messages.append(msg)
+        while len(self.messages) > COMMUNITY_BUFFER_SIZE:
+            self.floor = self.messages.pop(0)["id"]
+
+    def page(self, before, after, limit):
+        """Returns the page, or None if it reaches past what is buffered."""
+        if after is not None:
+            if after < self.floor:
+                return None
+            return [m for m in self.messages if m["id"] > after][:limit]
+        window = [m for m in self.messages if before is None or m["id"] < before]
+        if len(window) < limit and self.floor > 0:
+            return None
+        return window[-limit:]
+
+_channel_feeds = {}
+_channel_feeds_lock = threading.Lock()
+
+def _message_dict(r):
+    return {
+        "id": r[0],
+        "user": r[1] or "Anonymous",
+        "avatar": "", # Frontend can generate avatar from name
+        "role": "Member", # Hardcoded for now, or fetch from profile
+        "content": r[2],
+        "type": r[3],
+        "time": r[4] # Raw timestamp, frontend formats it
+    }
+
+def _channel_id(conn, channel_name):
+    row = conn.execute("SELECT id FROM channels WHERE name = ?", (channel_name,)).fetchone()
+    return row[0] if row else None
+
+def _channel_feed(channel_name):
+    feed = _channel_feeds.get(channel_name)
+    if feed is not None:
+        return feed
+
+    with transaction() as conn:
+        channel_id = _channel_id(conn, channel_name)
+        if channel_id is None:
+            return None
+        with _channel_feeds_lock:
+            # Loaded under the lock so a concurrent write can't slip in between
+            if channel_name not in _channel_feeds:
+                rows = conn.execute(MESSAGE_SELECT + '''
+                    WHERE m.channel_id = ? ORDER BY m.id DESC LIMIT ?
+                ''', (channel_id, COMMUNITY_BUFFER_SIZE)).fetchall()
+                messages = [_message_dict(r) for r in reversed(rows)]
+                floor = messages[0]["id"] - 1 if len(rows) == COMMUNITY_BUFFER_SIZE else 0
+                _channel_feeds[channel_name] = _ChannelFeed(messages, floor)
+            return _channel_feeds[channel_name]
+
+def get_channel_messages(channel_name, before=None, after=None, limit=50):
+    """
+    One page of a channel's history, oldest first.
+    Default: the newest `limit` messages. `after=<id>`: messages newer than id
+    (polling). `before=<id>`: the `limit` messages preceding id (load older).
+    """
+    limit = max(1, min(limit, MESSAGE_PAGE_LIMIT))
+    feed = _channel_feed(channel_name)
+    if feed is None:
+        return []
+
+    with _channel_feeds_lock:
+        page = feed.page(before, after, limit)
+    if page is not None:
+        return page
+
+    with transaction() as conn:
+        channel_id = _channel_id(conn, channel_name)
+        if after is not None:
+            rows = conn.execute(MESSAGE_SELECT + '''
+                WHERE m.channel_id = ? AND m.id > ? ORDER BY m.id ASC LIMIT ?
+            ''', (channel_id, after, limit)).fetchall()
+            return [_message_dict(r) for r in rows]
+
+        rows = conn.execute(MESSAGE_SELECT + '''
+            WHERE m.channel_id = ? AND m.id < ? ORDER BY m.id DESC LIMIT ?
+        ''', (channel_id, before if before is not None else 2**63 - 1, limit)).fetchall()
+    return [_message_dict(r) for r in reversed(rows)]
 
 def add_community_message(user_id, channel_name, content, msg_type="text"):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Get channel ID
-    cursor.execute("SELECT id FROM channels WHERE name = ?", (channel_name,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return False
-    channel_id = row[0]
-    
-    cursor.execute("INSERT INTO community_messages (channel_id, user_id, content, type) VALUES (?, ?, ?, ?)", 
-                   (channel_id, user_id, content, msg_type))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # Get channel ID
+        channel_id = _channel_id(conn, channel_name)
+        if channel_id is None:
+            return False
+        
+        cursor = conn.execute("INSERT INTO community_messages (channel_id, user_id, content, type) VALUES (?, ?, ?, ?)", 
+                              (channel_id, user_id, content, msg_type))
+        row = conn.execute(MESSAGE_SELECT + "WHERE m.id = ?", (cursor.lastrowid,)).fetchone()
+
+        def write_through():
+            # Channels not loaded yet fill lazily
+            with _channel_feeds_lock:
+                feed = _channel_feeds.get(channel_name)
+                if feed is not None:
+                    feed.add(_message_dict(row))
+
+        # Only once committed (this may be part of a larger batch)
+        after_commit(write_through)
     return True
 
 def update_project_code(project_id, code):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE projects SET code_content = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', (code, project_id))
-    conn.commit()
-    conn.close()
+    """Syncs the latest code content to the database."""
+    with transaction() as conn:
+        conn.execute('UPDATE projects SET code_content = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', (code, project_id))
 
 def log_user_activity(user_id, date_str, hours, level):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Check current hours
-    cursor.execute("SELECT hours FROM user_activity WHERE user_id = ? AND date = ?", (user_id, date_str))
-    row = cursor.fetchone()
-    
-    if row:
-        new_hours = row[0] + hours
-        # Keep level max of existing or new
-        cursor.execute("UPDATE user_activity SET hours = ?, level = MAX(level, ?) WHERE user_id = ? AND date = ?", 
-                      (new_hours, level, user_id, date_str))
-    else:
-        cursor.execute("INSERT INTO user_activity (user_id, date, hours, level) VALUES (?, ?, ?, ?)", 
-                      (user_id, date_str, hours, level))
-                      
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # Check current hours
+        row = conn.execute("SELECT hours FROM user_activity WHERE user_id = ? AND date = ?", (user_id, date_str)).fetchone()
+        
+        if row:
+            new_hours = row[0] + hours
+            # Keep level max of existing or new
+            conn.execute("UPDATE user_activity SET hours = ?, level = MAX(level, ?) WHERE user_id = ? AND date = ?", 
+                         (new_hours, level, user_id, date_str))
+        else:
+            conn.execute("INSERT INTO user_activity (user_id, date, hours, level) VALUES (?, ?, ?, ?)", 
+                         (user_id, date_str, hours, level))
     
 def get_user_activity(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT date, hours, level FROM user_activity WHERE user_id = ? ORDER BY date DESC LIMIT 365", (user_id,))
-    rows = cursor.fetchall()
-    conn.close()
+    with transaction() as conn:
+        rows = conn.execute("SELECT date, hours, level FROM user_activity WHERE user_id = ? ORDER BY date DESC LIMIT 365", (user_id,)).fetchall()
     return [dict(r) for r in rows]
 
-# Initialize DB
-init_db()
+# --- SEARCH ---
+# FTS5 indexes from migration 006, kept in sync by triggers. Every match is
+# ranked by the index's configured bm25 weights (`rank`); FTS5 keeps only the
+# best `limit` while it scans, so a common word costs one pass over its
+# posting list (see bench/search.py).
+
+SEARCH_SNIPPET_TOKENS = 12
+SEARCH_MAX_TERMS = 8
+SEARCH_STOPWORDS = frozenset("a an and are as at be but by for from how i in is it of on or that the this to was what with you".split())
+
+# name -> (fts table, content table/view, content rowid column, indexed columns)
+SEARCH_INDEXES = {
+    "chat": ("chat_fts", "chat_search_source", "id", ("content", "owner")),
+    "community": ("community_fts", "community_messages", "id", ("content",)),
+    "projects": ("project_fts", "project_search_source", "rid", ("title", "description", "tech_stack", "phases", "owner")),
+}
+
+def _fts_query(text):
+    """
+    User input -> FTS5 query where every word must match. Words are quoted so
+    operators in the input are inert; stopwords are dropped unless that would
+    leave nothing; a trailing '*' keeps prefix matching for the last word.
+    """
+    terms = [t.lower() for t in re.findall(r"\w+", text or "")][:SEARCH_MAX_TERMS]
+    terms = [t for t in terms if t not in SEARCH_STOPWORDS] or terms
+    if not terms:
+        return None
+    query = " ".join(f'"{t}"' for t in terms)
+    return query + "*" if text.rstrip().endswith("*") else query
+
+def _ranked_hits(conn, fts, match, limit):
+    """[(rowid, rank)] of the best `limit` matches."""
+    return conn.execute(f"SELECT rowid, rank FROM {fts} WHERE {fts} MATCH ? ORDER BY rank LIMIT ?", (match, limit)).fetchall()
+
+def search_chat_messages(user_id, text, limit=20):
+    query = _fts_query(text)
+    if not query:
+        return []
+    match = f'owner : "u{user_id}" AND content : ({query})'
+    results = []
+    with transaction() as conn:
+        for rowid, rank in _ranked_hits(conn, "chat_fts", match, limit):
+            # snippet() per hit, so highlighting never runs over the whole candidate window
+            r = conn.execute('''
+                SELECT m.id, m.session_id, s.title, m.role, m.timestamp,
+                       snippet(chat_fts, 0, '<mark>', '</mark>', '…', ?) AS snippet
+                FROM chat_fts
+                JOIN chat_messages m ON m.id = chat_fts.rowid
+                JOIN chat_sessions s ON s.id = m.session_id
+                WHERE chat_fts MATCH ? AND chat_fts.rowid = ?
+            ''', (SEARCH_SNIPPET_TOKENS, match, rowid)).fetchone()
+            if r:
+                results.append({"message_id": r["id"], "session_id": r["session_id"], "session_title": r["title"],
+                                "role": r["role"], "time": r["timestamp"], "snippet": r["snippet"], "score": -rank})
+    return results
+
+def search_community_messages(text, limit=20):
+    query = _fts_query(text)
+    if not query:
+        return []
+    results = []
+    with transaction() as conn:
+        for rowid, rank in _ranked_hits(conn, "community_fts", query, limit):
+            r = conn.execute('''
+                SELECT m.id, c.name, u.full_name, m.timestamp,
+                       snippet(community_fts, 0, '<mark>', '</mark>', '…', ?) AS snippet
+                FROM community_fts
+                JOIN community_messages m ON m.id = community_fts.rowid
+                JOIN channels c ON c.id = m.channel_id
+                LEFT JOIN users u ON u.id = m.user_id
+                WHERE community_fts MATCH ? AND community_fts.rowid = ?
+            ''', (SEARCH_SNIPPET_TOKENS, query, rowid)).fetchone()
+            if r:
+                results.append({"message_id": r["id"], "channel": r["name"], "user": r["full_name"] or "Anonymous",
+                                "time": r["timestamp"], "snippet": r["snippet"], "score": -rank})
+    return results
+
+def search_projects(user_id, text, limit=20):
+    query = _fts_query(text)
+    if not query:
+        return []
+    match = f'owner : "u{user_id}" AND {{title description tech_stack phases}} : ({query})'
+    results = []
+    with transaction() as conn:
+        for rowid, rank in _ranked_hits(conn, "project_fts", match, limit):
+            r = conn.execute('''
+                SELECT p.id, p.title, p.current_phase, p.total_phases,
+                       snippet(project_fts, -1, '<mark>', '</mark>', '…', ?) AS snippet
+                FROM project_fts
+                JOIN projects p ON p.rowid = project_fts.rowid
+                WHERE project_fts MATCH ? AND project_fts.rowid = ?
+            ''', (SEARCH_SNIPPET_TOKENS, match, rowid)).fetchone()
+            if r:
+                results.append({"project_id": r["id"], "title": r["title"], "current_phase": r["current_phase"],
+                                "total_phases": r["total_phases"], "snippet": r["snippet"], "score": -rank})
+    return results
+
+def search(user_id, text, scopes=None, limit=20):
+    """Searches the requested scopes ("chat", "community", "projects"); results grouped per scope."""
+    scopes = scopes or list(SEARCH_INDEXES)
+    results = {}
+    if "chat" in scopes:
+        results["chat"] = search_chat_messages(user_id, text, limit)
+    if "community" in scopes:
+        results["community"] = search_community_messages(text, limit)
+    if "projects" in scopes:
+        results["projects"] = search_projects(user_id, text, limit)
+    return results
+
+def rebuild_search_index(names=None, full=False, batch_size=5000):
+    """
+    Incremental by default: indexes content rows the FTS table doesn't know
+    about yet (e.g. rows bulk-loaded with triggers bypassed), in batches of
+    `batch_size` per transaction. full=True re-tokenizes everything and
+    merges the index b-trees. Returns {name: rows indexed}.
+    """
+    indexed = {}
+    for name in names or SEARCH_INDEXES:
+        fts, source, key, columns = SEARCH_INDEXES[name]
+        if full:
+            with transaction() as conn:
+                conn.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+                conn.execute(f"INSERT INTO {fts}({fts}) VALUES('optimize')")
+                indexed[name] = conn.execute(f"SELECT COUNT(*) FROM {fts}_docsize").fetchone()[0]
+            continue
+
+        cols = ", ".join(columns)
+        total, last = 0, None
+        while True:
+            with transaction() as conn:
+                # Walk the content keys in order so each batch is a range scan
+                rows = conn.execute(f'''
+                    SELECT {key}, {cols} FROM {source}
+                    WHERE {key} > ? AND NOT EXISTS (SELECT 1 FROM {fts}_docsize d WHERE d.id = {key})
+                    ORDER BY {key} LIMIT ?
+                ''', (last if last is not None else -1, batch_size)).fetchall()
+                conn.executemany(f"INSERT INTO {fts}(rowid, {cols}) VALUES ({', '.join('?' * (len(columns) + 1))})",
+                                 [tuple(r) for r in rows])
+            total += len(rows)
+            if len(rows) < batch_size:
+                break
+            last = rows[-1][0]
+        indexed[name] = total
+    return indexed
+
+def check_search_index(names=None):
+    """Runs FTS5's integrity-check against the content tables. Returns the names that failed."""
+    broken = []
+    for name in names or SEARCH_INDEXES:
+        fts = SEARCH_INDEXES[name][0]
+        try:
+            with transaction() as conn:
+                conn.execute(f"INSERT INTO {fts}({fts}, rank) VALUES('integrity-check', 1)")
+        except sqlite3.DatabaseError as e:
+            print(f"Search index {name}: {e}")
+            broken.append(name)
+    return broken
+
+# --- LLM RESPONSE CACHE ---
+# Storage for llm_cache.py. Keys are request hashes; times are epoch seconds.
+
+def get_llm_cache_entry(key, now):
+    """Cached response for `key` if it has not expired, else None."""
+    with transaction() as conn:
+        row = conn.execute("SELECT response FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+    return row[0] if row else None
+
+def put_llm_cache_entry(key, task, model, response, now, ttl):
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO llm_cache (key, task, model, response, created_at, expires_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                response = excluded.response, created_at = excluded.created_at,
+                expires_at = excluded.expires_at, last_used_at = excluded.last_used_at
+        ''', (key, task, model, response, now, now + ttl, now))
+
+def touch_llm_cache_entry(key, now, hits=1):
+    """Records cache hits (recency for LRU eviction plus the per-entry hit count)."""
+    with transaction() as conn:
+        conn.execute("UPDATE llm_cache SET last_used_at = MAX(last_used_at, ?), hits = hits + ? WHERE key = ?",
+                     (now, hits, key))
+
+def evict_llm_cache(max_entries, now):
+    """Drops expired entries, then the least recently used beyond `max_entries`. Returns how many went."""
+    with transaction() as conn:
+        removed = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+        removed += conn.execute('''
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,)).rowcount
+    return removed
+
+def clear_llm_cache(task=None):
+    """Deletes cached responses (of one task, or all). Returns how many were removed."""
+    with transaction() as conn:
+        if task:
+            return conn.execute("DELETE FROM llm_cache WHERE task = ?", (task,)).rowcount
+        return conn.execute("DELETE FROM llm_cache").rowcount
+
+def get_llm_cache_stats():
+    """Entries, stored bytes and lifetime hits per task."""
+    with transaction() as conn:
+        rows = conn.execute('''
+            SELECT task, COUNT(*), SUM(LENGTH(response)), SUM(hits) FROM llm_cache GROUP BY task
+        ''').fetchall()
+    return {r[0]: {"entries": r[1], "bytes": r[2], "hits": r[3]} for r in rows}
+
+# --- MARKET CACHE ---
+# Storage for market_cache.py: synthesized market results and raw Tavily
+# searches as JSON, keyed by canonical strings; times are epoch seconds.
+
+def get_market_cache_entry(key, now):
+    """
+    The entry for `key` unless past its hard expiry: {"data" (parsed JSON),
+    "fresh" (still within its TTL), "created_at"}. None if missing or expired.
+    """
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT data, fresh_until, created_at FROM market_cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+    if not row:
+        return None
+    return {"data": json.loads(row[0]), "fresh": row[1] > now, "created_at": row[2]}
+
+def put_market_cache_entry(key, tier, kind, data, now, ttl, max_stale=0):
+    """Stores `data`: fresh for `ttl` seconds, then servable as stale for `max_stale` more."""
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO market_cache (key, tier, kind, data, created_at, fresh_until, expires_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                data = excluded.data, created_at = excluded.created_at, fresh_until = excluded.fresh_until,
+                expires_at = excluded.expires_at, last_used_at = excluded.last_used_at
+        ''', (key, tier, kind, json.dumps(data), now, now + ttl, now + ttl + max_stale, now))
+
+def touch_market_cache_entry(key, now):
+    with transaction() as conn:
+        conn.execute("UPDATE market_cache SET last_used_at = MAX(last_used_at, ?) WHERE key = ?", (now, key))
+
+def evict_market_cache(max_entries, now):
+    """Drops expired entries, then the least recently used beyond `max_entries`. Returns how many went."""
+    with transaction() as conn:
+        removed = conn.execute("DELETE FROM market_cache WHERE expires_at <= ?", (now,)).rowcount
+        removed += conn.execute('''
+            DELETE FROM market_cache WHERE key IN (
+                SELECT key FROM market_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,)).rowcount
+    return removed
+
+def clear_market_cache(tier=None):
+    """Deletes cached market data (of one tier, or all). Returns how many were removed."""
+    with transaction() as conn:
+        if tier:
+            return conn.execute("DELETE FROM market_cache WHERE tier = ?", (tier,)).rowcount
+        return conn.execute("DELETE FROM market_cache").rowcount
+
+def get_market_cache_stats():
+    """Entries and stored bytes per tier and kind."""
+    with transaction() as conn:
+        rows = conn.execute('''
+            SELECT tier, kind, COUNT(*), SUM(LENGTH(data)) FROM market_cache GROUP BY tier, kind
+        ''').fetchall()
+    return {f"{r[0]}.{r[1]}": {"entries": r[2], "bytes": r[3]} for r in rows}
+
+# --- PRECOMPUTE RUNS ---
+# Storage for precompute.py: the cohorts it precomputes and its run log.
+
+def get_precompute_profiles():
+    """(role, current skills) of each user's latest profile - what /job-matches and /live-feeds look up."""
+    with transaction() as conn:
+        rows = conn.execute('''
+            SELECT latest.id, latest.role, s.skill
+            FROM (SELECT id, role, MAX(timestamp) FROM profiles WHERE user_id IS NOT NULL GROUP BY user_id) latest
+            LEFT JOIN profile_skills s ON s.profile_id = latest.id AND s.kind = 'current'
+        ''').fetchall()
+    profiles = {}
+    for profile_id, role, skill in rows:
+        entry = profiles.setdefault(profile_id, (role, []))
+        if skill is not None:
+            entry[1].append(skill)
+    return list(profiles.values())
+
+def claim_precompute_run(slot, trigger, now):
+    """Starts the run for `slot` and returns its id, or None if some process already claimed the slot."""
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO precompute_runs (slot, trigger, started_at) VALUES (?, ?, ?) ON CONFLICT(slot) DO NOTHING",
+            (slot, trigger, now)
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+def record_precompute_cohort(run_id, role, skills, profiles, status, seconds, error=None):
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO precompute_cohorts (run_id, role, skills, profiles, status, seconds, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (run_id, role, skills, profiles, status, seconds, error))
+
+def finish_precompute_run(run_id, status, counts, now, seconds, error=None):
+    """`counts`: cohorts, computed, degraded, failed, skipped."""
+    with transaction() as conn:
+        conn.execute('''
+            UPDATE precompute_runs SET status = ?, finished_at = ?, seconds = ?, error = ?,
+                cohorts = ?, computed = ?, degraded = ?, failed = ?, skipped = ?
+            WHERE id = ?
+        ''', (status, now, seconds, error, counts["cohorts"], counts["computed"], counts["degraded"],
+              counts["failed"], counts["skipped"], run_id))
+
+PRECOMPUTE_RUN_COLUMNS = ("id", "slot", "trigger", "status", "started_at", "finished_at", "cohorts", "computed",
+                          "degraded", "failed", "skipped", "seconds", "error")
+
+def get_precompute_runs(limit=20):
+    """The latest runs, newest first."""
+    with transaction() as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(PRECOMPUTE_RUN_COLUMNS)} FROM precompute_runs ORDER BY started_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [dict(zip(PRECOMPUTE_RUN_COLUMNS, r)) for r in rows]
+
+def get_precompute_cohorts(run_id):
+    """Per-cohort results of one run, slowest first."""
+    with transaction() as conn:
+        rows = conn.execute('''
+            SELECT role, skills, profiles, status, seconds, error FROM precompute_cohorts WHERE run_id = ?
+        ''', (run_id,)).fetchall()
+    cohorts = [dict(zip(("role", "skills", "profiles", "status", "seconds", "error"), r)) for r in rows]
+    return sorted(cohorts, key=lambda c: c["seconds"] or 0, reverse=True)
+
+# --- JOB INDEX ---
+# Storage for job_index.py: postings keyed by canonical link, and an inverted
+# index from canonical skill to posting. Lists are passed as JSON arrays.
+
+def upsert_job_postings(postings, now):
+    """
+    Adds or refreshes postings: dicts with link, role, title, company, data
+    and skills. A link seen before keeps its id; its skills are replaced.
+    """
+    with transaction() as conn:
+        for posting in postings:
+            job_id = conn.execute('''
+                INSERT INTO job_postings (link, role, title, company, data_json, first_seen_at, last_seen_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(link) DO UPDATE SET
+                    role = excluded.role, title = excluded.title, company = excluded.company,
+                    data_json = excluded.data_json, last_seen_at = excluded.last_seen_at
+                RETURNING id
+            ''', (posting["link"], posting["role"], posting.get("title"), posting.get("company"),
+                  json.dumps(posting["data"]), now, now)).fetchone()[0]
+            conn.execute("DELETE FROM job_posting_skills WHERE job_id = ?", (job_id,))
+            conn.executemany("INSERT OR IGNORE INTO job_posting_skills (skill, job_id) VALUES (?, ?)",
+                             [(skill, job_id) for skill in posting["skills"]])
+
+def count_job_postings(role, since):
+    """Postings found for `role` (canonical) and seen after `since`."""
+    with transaction() as conn:
+        return conn.execute("SELECT COUNT(*) FROM job_postings WHERE role = ? AND last_seen_at > ?",
+                            (role, since)).fetchone()[0]
+
+def get_job_candidates(role, skills, since, limit):
+    """
+    The `limit` most recently seen postings (seen after `since`) that share a
+    skill with `skills` or were found for `role`: [{"id", "role", "data", "skills"}].
+    """
+    with transaction() as conn:
+        seen = conn.execute('''
+            SELECT id, last_seen_at FROM job_postings WHERE role = ? AND last_seen_at > ?
+            UNION
+            SELECT p.id, p.last_seen_at FROM job_posting_skills s JOIN job_postings p ON p.id = s.job_id
+            WHERE s.skill IN (SELECT value FROM json_each(?)) AND p.last_seen_at > ?
+        ''', (role, since, json.dumps(list(skills)), since)).fetchall()
+        ids = [job_id for job_id, _ in sorted(seen, key=lambda r: r[1], reverse=True)[:limit]]
+        rows = conn.execute(
+            "SELECT id, role, data_json FROM job_postings WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+        ).fetchall()
+        pairs = conn.execute(
+            "SELECT job_id, skill FROM job_posting_skills WHERE job_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(ids),)
+        ).fetchall()
+    skills_by_job = {}
+    for job_id, skill in pairs:
+        skills_by_job.setdefault(job_id, []).append(skill)
+    order = {job_id: i for i, job_id in enumerate(ids)}
+    rows = sorted(rows, key=lambda r: order[r[0]])
+    return [{"id": r[0], "role": r[1], "data": json.loads(r[2]), "skills": skills_by_job.get(r[0], [])} for r in rows]
+
+def get_skill_frequencies(skills, since):
+    """(postings seen after `since`, {skill: how many of them list it}) for the IDF weights."""
+    with transaction() as conn:
+        total = conn.execute("SELECT COUNT(*) FROM job_postings WHERE last_seen_at > ?", (since,)).fetchone()[0]
+        rows = conn.execute('''
+            SELECT s.skill, COUNT(*) FROM job_posting_skills s JOIN job_postings p ON p.id = s.job_id
+            WHERE s.skill IN (SELECT value FROM json_each(?)) AND p.last_seen_at > ?
+            GROUP BY s.skill
+        ''', (json.dumps(list(skills)), since)).fetchall()
+    return total, dict(rows)
+
+def purge_job_postings(before):
+    """Deletes postings not seen since `before`. Returns how many were removed."""
+    with transaction() as conn:
+        conn.execute('''
+            DELETE FROM job_posting_skills WHERE job_id IN (SELECT id FROM job_postings WHERE last_seen_at < ?)
+        ''', (before,))
+        return conn.execute("DELETE FROM job_postings WHERE last_seen_at < ?", (before,)).rowcount
+
+def get_job_index_stats(since):
+    with transaction() as conn:
+        postings = conn.execute("SELECT COUNT(*) FROM job_postings").fetchone()[0]
+        recent = conn.execute("SELECT COUNT(*) FROM job_postings WHERE last_seen_at > ?", (since,)).fetchone()[0]
+        skills = conn.execute("SELECT COUNT(*) FROM (SELECT skill FROM job_posting_skills GROUP BY skill)").fetchone()[0]
+    return {"postings": postings, "recent": recent, "skills": skills}
+
+# --- BACKGROUND JOBS ---
+# Storage for jobs.py. Payloads and results are JSON; times are epoch seconds.
+JOB_COLUMNS = ("id", "user_id", "kind", "priority", "status", "payload", "result", "error", "attempts",
+               "created_at", "started_at", "finished_at")
+JOB_SELECT = "id, user_id, kind, priority, status, payload, result, error, attempts, created_at, started_at, finished_at"
+
+def _job_row(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    job["payload"] = json.loads(job["payload"]) if job["payload"] else None
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def create_job(job_id, user_id, kind, priority, payload, now, idempotency_key=None):
+    """
+    Inserts a queued job and returns its id. A job with the same
+    (user_id, idempotency_key) is not duplicated: its id is returned instead.
+    """
+    with transaction() as conn:
+        cursor = conn.execute('''
+            INSERT INTO jobs (id, user_id, kind, priority, payload, idempotency_key, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+        ''', (job_id, user_id, kind, priority, json.dumps(payload), idempotency_key, now))
+        if cursor.rowcount:
+            return job_id
+        return conn.execute("SELECT id FROM jobs WHERE user_id IS ? AND idempotency_key = ?",
+                            (user_id, idempotency_key)).fetchone()[0]
+
+def mark_job_running(job_id, now):
+    with transaction() as conn:
+        conn.execute("UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                     (now, job_id))
+
+def finish_job(job_id, status, result, error, now):
+    """Records a terminal state ('done' or 'failed'); the payload is no longer needed."""
+    with transaction() as conn:
+        conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, payload = NULL WHERE id = ?",
+                     (status, json.dumps(result) if result is not None else None, error, now, job_id))
+
+def requeue_job(job_id):
+    with transaction() as conn:
+        conn.execute("UPDATE jobs SET status = 'queued' WHERE id = ?", (job_id,))
+
+def get_job(job_id):
+    with transaction() as conn:
+        row = conn.execute(f"SELECT {JOB_SELECT} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job_row(row) if row else None
+
+def get_user_jobs(user_id, limit=20):
+    with transaction() as conn:
+        rows = conn.execute(f"SELECT {JOB_SELECT} FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                            (user_id, limit)).fetchall()
+    return [_job_row(r) for r in rows]
+
+def get_unfinished_jobs():
+    """Queued and running jobs, oldest first (a running one was interrupted by a restart)."""
+    with transaction() as conn:
+        rows = conn.execute(f"SELECT {JOB_SELECT} FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+    return sorted((_job_row(r) for r in rows), key=lambda job: job["created_at"])
+
+def purge_finished_jobs(before):
+    """Deletes jobs that finished before `before`. Returns how many were removed."""
+    with transaction() as conn:
+        return conn.execute("DELETE FROM jobs WHERE finished_at < ?", (before,)).rowcount
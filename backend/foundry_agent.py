@@ -1,15 +1,74 @@
-from openai import OpenAI
 import json
+from contextlib import aclosing
+import llm
+import code_context
 
 class FoundryAgent:
-    def __init__(self, openai_client):
+    def __init__(self, openai_client, async_client=None):
         self.client = openai_client
+        self.async_client = async_client or llm.get_async_client()
         self.model_id = "llama-3.3-70b-versatile" # Using the fast Groq model
 
-    def chat_architect(self, user_message, current_code, project_context, language="english"):
+    def chat_architect(self, user_message, current_code, project_context, language="english", window_key=None):
+        return llm.run(self._chat_architect(user_message, current_code, project_context, language, window_key), self.client)
+
+    async def chat_architect_async(self, user_message, current_code, project_context, language="english", window_key=None):
+        return await llm.arun(self._chat_architect(user_message, current_code, project_context, language, window_key), self.async_client)
+
+    async def chat_architect_stream(self, user_message, current_code, project_context, language="english", window_key=None):
+        """
+        Same as chat_architect, but yields the reply as text deltas while it is generated.
+        Errors are raised for the caller to report; whatever was produced is still recorded.
+        """
+        request, turn = self._architect_request(user_message, current_code, project_context, language, window_key)
+        parts = []
+        try:
+            async with aclosing(llm.astream(request, self.async_client)) as deltas:
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            if parts:
+                code_context.record(turn, "".join(parts))
+
+    @staticmethod
+    def offline_reply(error):
+        return f"The Architect is offline temporarily. ({str(error)})"
+
+    def validate_code(self, user_code, phase_objective):
+        return llm.run(self._validate_code(user_code, phase_objective), self.client)
+
+    async def validate_code_async(self, user_code, phase_objective):
+        return await llm.arun(self._validate_code(user_code, phase_objective), self.async_client)
+
+    def verify_screenshot(self, image_url, phase_objective):
+        return llm.run(self._verify_screenshot(image_url, phase_objective), self.client)
+
+    async def verify_screenshot_async(self, image_url, phase_objective):
+        return await llm.arun(self._verify_screenshot(image_url, phase_objective), self.async_client)
+
+    def _chat_architect(self, user_message, current_code, project_context, language="english", window_key=None):
+        request, turn = self._architect_request(user_message, current_code, project_context, language, window_key)
+        try:
+            reply = yield request
+        except Exception as e:
+            return self.offline_reply(e)
+        code_context.record(turn, reply)
+        return reply
+
+    def _architect_request(self, user_message, current_code, project_context, language="english", window_key=None):
         """
         The Architect: A helpful Senior Mentor.
+        Returns (request, turn); pass the reply to code_context.record(turn, reply).
+        `window_key` names the conversation window (set by the server, never by the client); None means no history.
         """
+        # Only the relevant/changed parts of the code, plus this window's recent exchanges
+        turn = code_context.prepare(window_key, current_code, user_message, project_context.get('phase_description') or "")
+        code_overview = "The student's code is in their messages below."
+        if turn.outline:
+            code_overview = ("You are shown only the parts of their file that matter for each question, and diffs of parts "
+                             "you have already seen. Outline of the whole file:\n" + turn.outline)
+
         base_prompt = f"""
         You are "The Architect", a helpful and encouraging Senior Tech Lead. 
         The student is working on:
@@ -17,10 +76,7 @@ class FoundryAgent:
         Phase: {project_context.get('phase_title')}
         Objective: {project_context.get('phase_description')}
         
-        Current Code:
-        ```
-        {current_code}
-        ```
+        {code_overview}
 
         GUIDELINES:
         1. Be a helpful mentor. If they are stuck, PROVIDE THE CODE SOLUTION.
@@ -44,19 +100,17 @@ class FoundryAgent:
             Be helpful, encouraging, and clear.
             """
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model_id,
-                messages=[
-                    {"role": "system", "content": base_prompt},
-                    {"role": "user", "content": user_message}
-                ]
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"The Architect is offline temporarily. ({str(e)})"
+        return {
+            "task": "foundry.chat_architect",
+            "model": self.model_id,
+            "messages": [
+                {"role": "system", "content": base_prompt},
+                *turn.history,
+                {"role": "user", "content": turn.prompt}
+            ]
+        }, turn
 
-    def validate_code(self, user_code, phase_objective):
+    def _validate_code(self, user_code, phase_objective):
         """
         The Interpreter: Simulates code execution and provides feedback.
         Returns JSON: { 'output': '...', 'review': '...' }
@@ -83,15 +137,15 @@ class FoundryAgent:
         """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_id,
-                messages=[
+            content = yield {
+                "task": "foundry.validate_code",
+                "model": self.model_id,
+                "messages": [
                     {"role": "system", "content": "You are a code simulator. Return JSON only."},
                     {"role": "user", "content": system_prompt}
                 ],
-                response_format={"type": "json_object"} 
-            )
-            content = response.choices[0].message.content
+                "response_format": {"type": "json_object"}
+            }
             return json.loads(content)
         except Exception as e:
             print(f"Interpreter Error: {e}")
@@ -100,17 +154,18 @@ class FoundryAgent:
                 "review": "Could not verify code at this time."
             }
 
-    def verify_screenshot(self, image_url, phase_objective):
+    def _verify_screenshot(self, image_url, phase_objective):
         """
         The Auditor: Verifies visual proof of work using Vision model.
         Returns JSON: { 'approved': bool, 'feedback': 'string' }
         """
         try:
             print("Auditing Screenshot with Vision Model...")
-            response = self.client.chat.completions.create(
+            content = yield {
+                "task": "foundry.verify_screenshot",
                 # Use Llama 4 Maverick (Multimodal)
-                model="meta-llama/llama-4-maverick-17b-128e-instruct", 
-                messages=[
+                "model": "meta-llama/llama-4-maverick-17b-128e-instruct",
+                "messages": [
                     {
                         "role": "user",
                         "content": [
@@ -140,9 +195,9 @@ class FoundryAgent:
                         ],
                     }
                 ],
-                response_format={"type": "json_object"}
-            )
-            return json.loads(response.choices[0].message.content)
+                "response_format": {"type": "json_object"}
+            }
+            return json.loads(content)
         except Exception as e:
             print(f"Auditor Verification Failed: {e}")
             # STRICT Fallback: Deny if we can't verify
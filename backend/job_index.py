@@ -0,0 +1,152 @@
+"""
+Shared local index of scraped job postings.
+
+Every job the market agent structures from a Tavily search is ingested here,
+deduplicated by canonical link, with an inverted index from canonical skill
+to posting. Postings found for one user serve every other user whose role or
+skills overlap.
+
+/job-matches ranks from the index when it holds at least
+JOB_INDEX_MIN_COVERAGE recent postings for the user's role, and scrapes only
+when coverage is thin. Ranking is local: skills are sparse vectors weighted
+by BM25-style IDF over the recent postings, scored by cosine similarity
+against the profile's current skills (computed with NumPy over the candidate
+postings), plus ROLE_WEIGHT for postings found for the same role. The
+resulting match_score (0-100) replaces the one the LLM used to invent.
+
+    job_index.ingest(jobs, role)                    # queued write
+    jobs = await job_index.amatches(role, skills)   # None when coverage is thin
+"""
+import os
+import time
+import urllib.parse
+
+import numpy as np
+
+import async_db
+import database
+import market_cache
+import write_queue
+
+DAY = 86400
+
+JOB_INDEX_MIN_COVERAGE = int(os.getenv("JOB_INDEX_MIN_COVERAGE", "12"))
+JOB_INDEX_MAX_AGE = float(os.getenv("JOB_INDEX_MAX_AGE_DAYS", "14")) * DAY # postings older than this are not served
+JOB_INDEX_RETENTION = float(os.getenv("JOB_INDEX_RETENTION_DAYS", "30")) * DAY
+JOB_INDEX_CANDIDATES = int(os.getenv("JOB_INDEX_CANDIDATES", "500"))
+JOB_INDEX_RESULTS = int(os.getenv("JOB_INDEX_RESULTS", "6"))
+ROLE_WEIGHT = 0.25
+
+def canonical_link(link):
+    """Scheme and host lower-cased, fragment and trailing slash dropped; None if not an http(s) URL."""
+    try:
+        parts = urllib.parse.urlsplit((link or "").strip())
+    except ValueError:
+        return None
+    if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+        return None
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+def _postings(jobs, role):
+    postings = {}
+    for job in jobs if isinstance(jobs, list) else []:
+        link = canonical_link(job.get("link")) if isinstance(job, dict) else None
+        if not link:
+            continue # nothing to deduplicate on
+        data = {k: v for k, v in job.items() if k != "match_score"}
+        postings[link] = {"link": link, "role": market_cache.canonical_role(role), "title": job.get("title"),
+                          "company": job.get("company"), "data": data,
+                          "skills": market_cache.canonical_skills(job.get("skills") or [])}
+    return list(postings.values())
+
+def ingest(jobs, role):
+    """Queues the structured jobs found for `role` for the index. Returns the write's future, or None."""
+    postings = _postings(jobs, role)
+    if not postings:
+        return None
+    return write_queue.queue.submit(database.upsert_job_postings, postings, time.time())
+
+# --- ranking ---
+
+def _idf(total, frequencies, skills):
+    """BM25 IDF per skill; skills no recent posting lists get the rarest weight."""
+    df = np.array([frequencies.get(s, 0) for s in skills], dtype=float)
+    return np.log1p((total - df + 0.5) / (df + 0.5))
+
+def score(candidates, role, skills, total, frequencies):
+    """
+    Adds match_score to each candidate's data and returns them best first.
+    `candidates`: [{"role", "data", "skills"}]; `frequencies`: skill -> postings listing it.
+    """
+    if not candidates:
+        return []
+    user_skills = market_cache.canonical_skills(skills)
+    vocabulary = sorted(set(user_skills).union(*(c["skills"] for c in candidates)))
+    column = {skill: i for i, skill in enumerate(vocabulary)}
+    idf = _idf(max(total, len(candidates)), frequencies, vocabulary)
+
+    # Sparse (posting, skill) pairs; the user's vector is idf on their own skills, 0 elsewhere
+    rows = np.array([i for i, c in enumerate(candidates) for _ in c["skills"]], dtype=np.intp)
+    cols = np.array([column[s] for c in candidates for s in c["skills"]], dtype=np.intp)
+    mine = np.array([column[s] for s in user_skills], dtype=np.intp)
+    user = np.zeros(len(vocabulary))
+    user[mine] = idf[mine]
+
+    weights = idf[cols]
+    dot = np.bincount(rows, weights=weights * user[cols], minlength=len(candidates))
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(candidates)))
+    denominator = norms * np.linalg.norm(user)
+    cosine = np.divide(dot, denominator, out=np.zeros(len(candidates)), where=denominator > 0)
+
+    same_role = np.array([c["role"] == market_cache.canonical_role(role) for c in candidates], dtype=float)
+    total_score = (1 - ROLE_WEIGHT) * cosine + ROLE_WEIGHT * same_role
+
+    # Stable sort keeps the newest first among equal scores
+    ranked = []
+    for i in np.argsort(-total_score, kind="stable"):
+        job = dict(candidates[i]["data"])
+        job["match_score"] = int(round(100 * total_score[i]))
+        ranked.append(job)
+    return ranked
+
+def coverage(role):
+    """Recent postings found for `role`."""
+    return database.count_job_postings(market_cache.canonical_role(role), time.time() - JOB_INDEX_MAX_AGE)
+
+def matches(role, skills, limit=JOB_INDEX_RESULTS):
+    """Best `limit` postings for the profile, or None when coverage for the role is thin (scrape instead)."""
+    if not role or coverage(role) < JOB_INDEX_MIN_COVERAGE:
+        return None
+    since = time.time() - JOB_INDEX_MAX_AGE
+    canonical = market_cache.canonical_skills(skills)
+    candidates = database.get_job_candidates(market_cache.canonical_role(role), canonical, since, JOB_INDEX_CANDIDATES)
+    vocabulary = sorted(set(canonical).union(*(c["skills"] for c in candidates)))
+    total, frequencies = database.get_skill_frequencies(vocabulary, since)
+    return score(candidates, role, skills, total, frequencies)[:limit]
+
+async def amatches(role, skills, limit=JOB_INDEX_RESULTS):
+    """matches() on the DB executor."""
+    return await async_db.run(matches, role, skills, limit)
+
+def rescore(jobs, role, skills):
+    """Local match_score for freshly scraped jobs (not yet in the index), best first; jobs without a link go last."""
+    postings = _postings(jobs, role)
+    if not postings:
+        return jobs
+    since = time.time() - JOB_INDEX_MAX_AGE
+    vocabulary = sorted(set(market_cache.canonical_skills(skills)).union(*(p["skills"] for p in postings)))
+    total, frequencies = database.get_skill_frequencies(vocabulary, since)
+    linked = {p["link"] for p in postings}
+    rest = [j for j in jobs if isinstance(j, dict) and canonical_link(j.get("link")) not in linked]
+    return score(postings, role, skills, total, frequencies) + rest
+
+async def arescore(jobs, role, skills):
+    return await async_db.run(rescore, jobs, role, skills)
+
+def purge():
+    """Drops postings not seen for JOB_INDEX_RETENTION. Returns how many went."""
+    return database.purge_job_postings(time.time() - JOB_INDEX_RETENTION)
+
+def stats():
+    return {**database.get_job_index_stats(time.time() - JOB_INDEX_MAX_AGE),
+            "min_coverage": JOB_INDEX_MIN_COVERAGE, "max_age_days": JOB_INDEX_MAX_AGE / DAY}
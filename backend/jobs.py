@@ -0,0 +1,224 @@
+"""
+Background jobs for the long LLM pipelines (/analyze, /resume/build,
+/project/start).
+
+`submit()` stores the job in the `jobs` table and returns its id right away;
+a fixed pool of JOBS_WORKERS workers on the event loop runs them. Higher
+priority runs first. Within a priority the user with the fewest jobs running
+goes next (round-robin among equals), and no user has more than
+JOBS_PER_USER jobs running at once, so one user's burst
+cannot occupy the whole pool. Jobs still queued or running when the process
+stops are picked up again on the next start (up to JOBS_MAX_ATTEMPTS runs).
+
+    @jobs.handler("resume.build")
+    async def build(payload, user_id): ...          # returns a JSON-able result
+
+    job_id = await jobs.submit("resume.build", {...}, user_id)
+    job = await jobs.get(job_id)                    # poll
+    async for job in jobs.watch(job_id): ...        # push: every state change
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+
+import async_db
+
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_PER_USER = int(os.getenv("JOBS_PER_USER", "2"))
+JOBS_TIMEOUT = float(os.getenv("JOBS_TIMEOUT", "300"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETENTION = float(os.getenv("JOBS_RETENTION_DAYS", "7")) * 86400
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 0
+
+TERMINAL = ("done", "failed")
+
+_handlers = {} # kind -> (coroutine function, default priority)
+
+def handler(kind, priority=PRIORITY_NORMAL):
+    """Registers `async fn(payload, user_id) -> result` as the runner for `kind`."""
+    def register(fn):
+        _handlers[kind] = (fn, priority)
+        return fn
+    return register
+
+class _Scheduler:
+    """Queued job ids by priority, then by user in round-robin order."""
+    def __init__(self):
+        self._levels = {}           # priority -> OrderedDict(user_id -> deque of job ids)
+        self.running = Counter()    # user_id -> jobs running now
+
+    def push(self, job_id, user_id, priority):
+        users = self._levels.setdefault(priority, OrderedDict())
+        users.setdefault(user_id, deque()).append(job_id)
+
+    def pop(self):
+        """Next (job_id, user_id) to run, or None if nothing is runnable."""
+        for priority in sorted(self._levels, reverse=True):
+            users = self._levels[priority]
+            # The user with the fewest jobs running goes next; ties in turn order
+            eligible = [u for u in users if self.running[u] < JOBS_PER_USER]
+            if not eligible:
+                continue
+            user_id = min(eligible, key=lambda u: self.running[u])
+            queue = users[user_id]
+            job_id = queue.popleft()
+            if queue:
+                users.move_to_end(user_id) # the others go first next time
+            else:
+                del users[user_id]
+            if not users:
+                del self._levels[priority]
+            self.running[user_id] += 1
+            return job_id, user_id
+        return None
+
+    def done(self, user_id):
+        self.running[user_id] -= 1
+        if not self.running[user_id]:
+            del self.running[user_id]
+
+    def __len__(self):
+        return sum(len(q) for users in self._levels.values() for q in users.values())
+
+_scheduler = _Scheduler()
+_wakeup = None          # asyncio.Condition, created by start()
+_watchers = {}          # job_id -> set of asyncio.Queue
+_workers = []
+_stats = Counter()
+
+def _publish(job):
+    for queue in _watchers.get(job["id"], ()):
+        queue.put_nowait(job)
+
+async def submit(kind, payload, user_id=None, priority=None, idempotency_key=None):
+    """Queues a job and returns its id (an existing id for a repeated idempotency key)."""
+    if kind not in _handlers:
+        raise ValueError(f"No job handler for '{kind}'")
+    if priority is None:
+        priority = _handlers[kind][1]
+    job_id = uuid.uuid4().hex
+    stored_id = await async_db.create_job(job_id, user_id, kind, priority, payload, time.time(), idempotency_key)
+    if stored_id != job_id:
+        _stats["deduplicated"] += 1
+        return stored_id
+
+    _stats["submitted"] += 1
+    async with _wakeup:
+        _scheduler.push(job_id, user_id, priority)
+        _wakeup.notify()
+    return job_id
+
+async def get(job_id):
+    """The job as stored (status, result, error, timestamps), or None."""
+    return await async_db.get_job(job_id)
+
+async def watch(job_id, heartbeat=None):
+    """
+    Yields the job now and after every state change until it finishes.
+    With `heartbeat` seconds, yields None when nothing happened for that long.
+    """
+    queue = asyncio.Queue()
+    _watchers.setdefault(job_id, set()).add(queue)
+    try:
+        job = await get(job_id)
+        if job is None:
+            return
+        yield job
+        while job["status"] not in TERMINAL:
+            try:
+                job = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield job
+    finally:
+        watchers = _watchers.get(job_id)
+        watchers.discard(queue)
+        if not watchers:
+            del _watchers[job_id]
+
+async def wait(job_id):
+    """Waits for the job to finish and returns it (None for an unknown id)."""
+    last = None
+    async for job in watch(job_id):
+        last = job
+    return last
+
+async def _run(job_id, user_id):
+    job = await async_db.get_job(job_id)
+    if job is None or job["status"] in TERMINAL:
+        return
+
+    if job["attempts"] >= JOBS_MAX_ATTEMPTS:
+        # Killed mid-run this many times already: don't try again
+        await _finish(job, "failed", None, "Interrupted too many times")
+        return
+
+    now = time.time()
+    await async_db.mark_job_running(job_id, now)
+    job = {**job, "status": "running", "started_at": now, "attempts": job["attempts"] + 1}
+    _publish(job)
+
+    fn, _ = _handlers.get(job["kind"], (None, None))
+    try:
+        if fn is None:
+            raise ValueError(f"No job handler for '{job['kind']}'")
+        result = await asyncio.wait_for(fn(job["payload"], user_id), JOBS_TIMEOUT)
+    except asyncio.TimeoutError:
+        await _finish(job, "failed", None, f"Timed out after {JOBS_TIMEOUT:.0f}s")
+    except Exception as e:
+        print(f"Job {job_id} ({job['kind']}) failed: {e}")
+        await _finish(job, "failed", None, str(e))
+    else:
+        await _finish(job, "done", result, None)
+
+async def _finish(job, status, result, error):
+    now = time.time()
+    await async_db.finish_job(job["id"], status, result, error, now)
+    _stats[status] += 1
+    _publish({**job, "payload": None, "status": status, "result": result, "error": error, "finished_at": now})
+
+async def _worker():
+    while True:
+        async with _wakeup:
+            while (item := _scheduler.pop()) is None:
+                await _wakeup.wait()
+        job_id, user_id = item
+        try:
+            await _run(job_id, user_id)
+        except Exception as e:
+            # Bookkeeping failed (e.g. the database was locked): leave it for the next start
+            print(f"Job worker error on {job_id}: {e}")
+        finally:
+            async with _wakeup:
+                _scheduler.done(user_id)
+                _wakeup.notify_all()
+
+async def start(workers=JOBS_WORKERS):
+    """Starts the worker pool and requeues jobs left over from the last run. Call once, on startup."""
+    global _wakeup
+    _wakeup = asyncio.Condition()
+
+    purged = await async_db.purge_finished_jobs(time.time() - JOBS_RETENTION)
+    pending = await async_db.get_unfinished_jobs()
+    for job in pending:
+        if job["status"] == "running":
+            await async_db.requeue_job(job["id"])
+        _scheduler.push(job["id"], job["user_id"], job["priority"])
+    if pending or purged:
+        print(f"Jobs: resumed {len(pending)} unfinished job(s), purged {purged} old one(s)")
+
+    _workers.extend(asyncio.create_task(_worker(), name=f"job-worker-{i}") for i in range(workers))
+
+def stats():
+    return {
+        "workers": len(_workers),
+        "queued": len(_scheduler),
+        "running": sum(_scheduler.running.values()),
+        **_stats,
+    }
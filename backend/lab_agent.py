@@ -1,13 +1,21 @@
 from typing import List
 import json
 from models import ProjectList 
+import llm
 
 class LabAgent:
-    def __init__(self, openai_client):
+    def __init__(self, openai_client, async_client=None):
         self.client = openai_client
+        self.async_client = async_client or llm.get_async_client()
         self.model_id = "llama-3.3-70b-versatile"
 
     def generate_projects(self, skill_gaps: List[str]):
+        return llm.run(self._generate_projects(skill_gaps), self.client)
+
+    async def generate_projects_async(self, skill_gaps: List[str]):
+        return await llm.arun(self._generate_projects(skill_gaps), self.async_client)
+
+    def _generate_projects(self, skill_gaps: List[str]):
         prompt = f"""
         Act as a Tech Lead and Mentor. 
         The user has the following technical skill gaps: {skill_gaps}.
@@ -36,15 +44,15 @@ class LabAgent:
         """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_id,
-                messages=[
+            content = yield {
+                "task": "lab.generate_projects",
+                "model": self.model_id,
+                "messages": [
                     {"role": "system", "content": "You are a helpful coding mentor. Return JSON only."},
                     {"role": "user", "content": prompt}
                 ]
-            )
+            }
             
-            content = response.choices[0].message.content
             # Scrub markdown
             raw_data = content.strip().replace("```json", "").replace("```", "")
             data = json.loads(raw_data)
@@ -0,0 +1,276 @@
+"""
+Shared LLM plumbing for the agents.
+
+All agents talk to Groq through two process-wide clients: a blocking
+`OpenAI` one for sync code and an `AsyncOpenAI` one (with a large pooled
+httpx client) so async handlers can keep hundreds of calls in flight
+without tying up the event loop or the threadpool.
+
+Agent methods are written once, as "steps": generators that yield each
+outbound request and receive its result.
+
+    def _summarize(self, text):
+        try:
+            content = yield {"task": "mirror.summarize", "model": MODEL, "messages": [...]}
+            return json.loads(content)
+        except Exception:
+            return FALLBACK
+
+A yielded dict is a chat completion (the reply text is sent back); a yielded
+`Call` is any other outbound call such as a Tavily search. `run()` drives a
+step with the blocking clients, `arun()` with the async ones, so every agent
+method gets a sync and an awaitable variant from the same code:
+
+    def summarize(self, text): return llm.run(self._summarize(text))
+    async def summarize_async(self, text): return await llm.arun(self._summarize(text))
+
+An exception raised by a request is thrown back into the step at its yield,
+and the request is marked degraded (circuit_breaker.track()) since the step
+will serve a fallback.
+
+Completions go through the shared response cache (llm_cache.py) unless the
+task's policy says otherwise; add "cache": False to a request to skip it.
+
+Every Groq request waits for a slot from rate_limiter.py, which keeps each
+model within its rate limits and retries 429s/5xx. Groq calls and Tavily
+Calls go through their circuit breaker (circuit_breaker.py), which fails them
+instantly while the dependency is down.
+
+model_router.py picks the model from the task's tier: cheap extraction tasks
+try a small model first and escalate to the large one if the answer does not
+match the task's schema.
+
+Identical requests that are in flight at the same time share one upstream
+call (singleflight.py): cacheable completions by cache key, Calls by name and
+arguments.
+
+`astream()` is the streaming counterpart of `acomplete()` for endpoints that
+forward tokens to the browser as they are generated.
+"""
+import json
+import os
+import time
+
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
+import httpx
+
+import circuit_breaker
+import llm_cache
+import model_router
+import rate_limiter
+import singleflight
+
+# Request keys that are ours, not create() parameters
+_LOCAL_KEYS = ("task", "cache")
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "256"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "64"))
+
+completions = singleflight.Group("llm.completions")
+calls = singleflight.Group("llm.calls")
+
+_client = None
+_async_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=os.getenv("GROQ_API_KEY"), base_url=GROQ_BASE_URL, timeout=LLM_TIMEOUT, max_retries=0)
+    return _client
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=GROQ_BASE_URL,
+            timeout=LLM_TIMEOUT,
+            max_retries=0, # rate_limiter.py owns retries
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0),
+            ),
+        )
+    return _async_client
+
+class Call:
+    """A non-LLM outbound call a step can yield, with its sync and async forms."""
+    def __init__(self, name, fn, afn, *args, **kwargs):
+        self.name = name
+        self.fn = fn
+        self.afn = afn
+        self.args = args
+        self.kwargs = kwargs
+
+    def key(self):
+        return (self.name, json.dumps([self.args, self.kwargs], sort_keys=True, default=str))
+
+def _create(request, client):
+    kwargs = {k: v for k, v in request.items() if k not in _LOCAL_KEYS}
+    client = client or get_client()
+    circuit_breaker.groq.check() # fail fast instead of queueing for a slot
+    started = time.monotonic()
+    response = rate_limiter.call(request, lambda: circuit_breaker.groq.call(lambda: client.chat.completions.create(**kwargs)))
+    model_router.observe(request, time.monotonic() - started, response.usage)
+    content = response.choices[0].message.content
+    if model_router.accepts(request, content):
+        llm_cache.store(request, content)
+    return content
+
+async def _acreate(request, client):
+    kwargs = {k: v for k, v in request.items() if k not in _LOCAL_KEYS}
+    client = client or get_async_client()
+    circuit_breaker.groq.check()
+    started = time.monotonic()
+    response = await rate_limiter.acall(request, lambda: circuit_breaker.groq.acall(lambda: client.chat.completions.create(**kwargs)))
+    model_router.observe(request, time.monotonic() - started, response.usage)
+    content = response.choices[0].message.content
+    if model_router.accepts(request, content):
+        llm_cache.store(request, content)
+    return content
+
+def complete(request, client=None):
+    """
+    One chat completion (blocking). `request` is create() kwargs plus an
+    optional 'task' label and 'cache' flag. The model is picked by the task's
+    tier (model_router.py).
+    """
+    first, escalation = model_router.plan(request)
+    if escalation is None:
+        return _complete(first, client)
+    try:
+        content = _complete(first, client)
+        if model_router.accepts(first, content):
+            return content
+        model_router.escalated(first, "schema")
+    except circuit_breaker.CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"Small model failed on {first.get('task')}, escalating: {e}")
+        model_router.escalated(first, "error")
+    return _complete(escalation, client)
+
+async def acomplete(request, client=None):
+    """Awaitable complete()."""
+    first, escalation = model_router.plan(request)
+    if escalation is None:
+        return await _acomplete(first, client)
+    try:
+        content = await _acomplete(first, client)
+        if model_router.accepts(first, content):
+            return content
+        model_router.escalated(first, "schema")
+    except circuit_breaker.CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"Small model failed on {first.get('task')}, escalating: {e}")
+        model_router.escalated(first, "error")
+    return await _acomplete(escalation, client)
+
+def _complete(request, client):
+    content = llm_cache.lookup(request)
+    if content is not None:
+        return content
+    key = llm_cache.shared_key(request)
+    if key is None:
+        return _create(request, client)
+    return completions.do_sync(key, lambda: _create(request, client))
+
+async def _acomplete(request, client):
+    content = await llm_cache.alookup(request)
+    if content is not None:
+        return content
+    key = llm_cache.shared_key(request)
+    if key is None:
+        return await _acreate(request, client)
+    return await completions.do(key, lambda: _acreate(request, client))
+
+async def astream(request, client=None):
+    """
+    Streams one chat completion, yielding text deltas as Groq produces them.
+    Closing the generator (e.g. the browser went away) closes the upstream
+    response, which aborts the generation.
+    """
+    request, _ = model_router.plan(request)
+    kwargs = {k: v for k, v in request.items() if k not in _LOCAL_KEYS}
+    client = client or get_async_client()
+    # The stream keeps its scheduler slot until it ends; the breaker times the
+    # call up to the response headers
+    try:
+        circuit_breaker.groq.check()
+        ticket, stream = await rate_limiter.aopen(
+            request, lambda: circuit_breaker.groq.acall(lambda: client.chat.completions.create(stream=True, **kwargs))
+        )
+    except Exception:
+        circuit_breaker.mark_degraded("groq")
+        raise
+    error = None
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        circuit_breaker.mark_degraded("groq")
+        error = e
+        raise
+    finally:
+        # A client that hung up (GeneratorExit/cancel) still frees the slot as a success
+        if error is None:
+            rate_limiter.scheduler.done(ticket)
+        else:
+            rate_limiter.scheduler.failed(ticket, error)
+        await stream.close()
+
+def _guarded(call, fn):
+    # Runs a Call's fn through the breaker of its dependency, if it has one
+    breaker = circuit_breaker.for_call(call.name)
+    if breaker is None:
+        return fn()
+    return breaker.call(fn)
+
+async def _aguarded(call, afn):
+    breaker = circuit_breaker.for_call(call.name)
+    if breaker is None:
+        return await afn()
+    return await breaker.acall(afn)
+
+def _dependency(request):
+    return request.name.split(".")[0] if isinstance(request, Call) else "groq"
+
+def run(step, client=None):
+    """Drives a step to completion with blocking calls. Returns its result."""
+    try:
+        request = next(step)
+        while True:
+            try:
+                if isinstance(request, Call):
+                    result = calls.do_sync(request.key(), lambda: _guarded(request, lambda: request.fn(*request.args, **request.kwargs)))
+                else:
+                    result = complete(request, client)
+            except Exception as e:
+                circuit_breaker.mark_degraded(_dependency(request))
+                request = step.throw(e)
+            else:
+                request = step.send(result)
+    except StopIteration as done:
+        return done.value
+
+async def arun(step, client=None):
+    """Drives a step to completion on the event loop. Returns its result."""
+    try:
+        request = next(step)
+        while True:
+            try:
+                if isinstance(request, Call):
+                    result = await calls.do(request.key(), lambda: _aguarded(request, lambda: request.afn(*request.args, **request.kwargs)))
+                else:
+                    result = await acomplete(request, client)
+            except Exception as e:
+                circuit_breaker.mark_degraded(_dependency(request))
+                request = step.throw(e)
+            else:
+                request = step.send(result)
+    except StopIteration as done:
+        return done.value
@@ -0,0 +1,208 @@
+"""
+Persistent cache for LLM completions, shared by every agent.
+
+`llm.complete()`/`llm.acomplete()` consult it before calling Groq. The key is a
+SHA-256 of the model, the normalized messages and every other decoding
+parameter, so only truly identical requests share an answer. Entries live in
+the `llm_cache` table with a per-task TTL and are evicted least recently used
+once LLM_CACHE_MAX_ENTRIES is exceeded.
+
+Policies are chosen by the request's "task" label ("lab.generate_projects"),
+falling back to the agent ("lab") and then to the default. A TTL of 0 means
+never cache - conversations are not cached. Override with e.g.
+
+    LLM_CACHE_POLICY="foundry.validate_code=3600,market=0"
+
+A request with "cache": False, or any request made inside `with bypass():`,
+skips the lookup and refreshes the stored answer. Hits and stores are written
+through the write queue, so a hit costs one indexed read.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import textwrap
+import threading
+import time
+from contextlib import contextmanager
+
+import async_db
+import database
+import write_queue
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+DEFAULT_POLICIES = {
+    "default": DAY,
+    "lab.generate_projects": 7 * DAY,
+    "mirror.analyze_resume": 7 * DAY,
+    "mirror.analyze_image_resume": 7 * DAY,
+    "mirror.generate_project_phases": 30 * DAY,
+    "mirror.career_chat": 0,
+    "mirror.chat_summary": 0,
+    "foundry.chat_architect": 0,
+    "foundry.validate_code": 7 * DAY,
+    "foundry.verify_screenshot": DAY,
+    "resume": DAY,
+    "market": 6 * HOUR, # the prompts embed live search results anyway
+}
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_TOUCH_DELAY = float(os.getenv("LLM_CACHE_TOUCH_DELAY_MS", "5000")) / 1000
+EVICT_EVERY = 100 # stores between eviction passes
+
+# Request fields that are not part of the answer's identity
+_NOT_KEYED = {"task", "cache", "stream", "timeout", "extra_headers"}
+
+def _parse_policies(spec):
+    policies = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, ttl = item.partition("=")
+        try:
+            policies[name.strip()] = float(ttl)
+        except ValueError:
+            print(f"LLM cache: ignoring bad policy '{item}'")
+    return policies
+
+POLICIES = {**DEFAULT_POLICIES, **_parse_policies(os.getenv("LLM_CACHE_POLICY", ""))}
+
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+@contextmanager
+def bypass():
+    """Every LLM request made inside this block goes to Groq (and refreshes the cache)."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+def ttl_for(task):
+    if not task:
+        return POLICIES["default"]
+    if task in POLICIES:
+        return POLICIES[task]
+    return POLICIES.get(task.split(".")[0], POLICIES["default"])
+
+def _normalize_text(text):
+    # Prompts are indented f-strings: drop the common indent and trailing
+    # spaces but keep relative indentation, which matters for code
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").split("\n")]
+    return textwrap.dedent("\n".join(lines)).strip()
+
+def _normalize_content(content):
+    if isinstance(content, str):
+        return _normalize_text(content)
+    if isinstance(content, list):
+        return [{**part, "text": _normalize_text(part["text"])} if part.get("type") == "text" else part
+                for part in content]
+    return content
+
+def cache_key(request):
+    keyed = {k: v for k, v in request.items() if k not in _NOT_KEYED}
+    keyed["messages"] = [{**m, "content": _normalize_content(m.get("content"))} for m in request.get("messages", [])]
+    blob = json.dumps(keyed, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tasks = {}
+        self.stores = 0
+
+    def count(self, task, outcome):
+        with self._lock:
+            counts = self.tasks.setdefault(task or "untagged", {"hits": 0, "misses": 0, "bypassed": 0})
+            counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {task: dict(counts) for task, counts in self.tasks.items()}
+
+stats_counter = _Stats()
+
+def _plan(request):
+    """(key, ttl, read) for a cacheable request, else None."""
+    if not LLM_CACHE_ENABLED or request.get("stream"):
+        return None
+    ttl = ttl_for(request.get("task"))
+    if ttl <= 0:
+        return None
+    read = request.get("cache", True) and not _bypass.get()
+    return cache_key(request), ttl, read
+
+def shared_key(request):
+    """
+    Key under which identical in-flight requests can share one answer (the
+    cache would hand them the same one anyway), or None for uncached tasks.
+    """
+    plan = _plan(request)
+    return plan[0] if plan else None
+
+def _record_hit(request, key, now):
+    stats_counter.count(request.get("task"), "hits")
+    write_queue.queue.submit(database.touch_llm_cache_entry, key, now, 1,
+                             key=("llm_cache", key), merge=_add_hits, delay=LLM_CACHE_TOUCH_DELAY)
+
+def _add_hits(old, new):
+    return (old[0], max(old[1], new[1]), old[2] + new[2])
+
+def lookup(request):
+    """Cached content for `request`, or None (a miss, a bypass, or an uncached task)."""
+    plan = _plan(request)
+    if plan is None:
+        return None
+    key, _, read = plan
+    if not read:
+        stats_counter.count(request.get("task"), "bypassed")
+        return None
+    now = time.time()
+    content = database.get_llm_cache_entry(key, now)
+    if content is None:
+        stats_counter.count(request.get("task"), "misses")
+        return None
+    _record_hit(request, key, now)
+    return content
+
+async def alookup(request):
+    """lookup() with the read on the DB executor."""
+    plan = _plan(request)
+    if plan is None:
+        return None
+    key, _, read = plan
+    if not read:
+        stats_counter.count(request.get("task"), "bypassed")
+        return None
+    now = time.time()
+    content = await async_db.get_llm_cache_entry(key, now)
+    if content is None:
+        stats_counter.count(request.get("task"), "misses")
+        return None
+    _record_hit(request, key, now)
+    return content
+
+def store(request, content):
+    """Queues `content` as the answer to `request` (no-op for uncached tasks)."""
+    plan = _plan(request)
+    if plan is None or content is None:
+        return
+    if request.get("response_format", {}).get("type") == "json_object":
+        # A malformed JSON answer would otherwise be served until it expires
+        try:
+            json.loads(content)
+        except ValueError:
+            return
+    key, ttl, _ = plan
+    write_queue.queue.submit(database.put_llm_cache_entry, key, request.get("task"), request.get("model"),
+                             content, time.time(), ttl)
+    with stats_counter._lock:
+        stats_counter.stores += 1
+        evict = stats_counter.stores % EVICT_EVERY == 0
+    if evict:
+        write_queue.queue.submit(database.evict_llm_cache, LLM_CACHE_MAX_ENTRIES, time.time(), key=("llm_cache", "evict"))
+
+def stats():
+    """In-process hit/miss/bypass counters per task, plus what is stored."""
+    return {"enabled": LLM_CACHE_ENABLED, "requests": stats_counter.snapshot(), "stored": database.get_llm_cache_stats()}
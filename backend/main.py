@@ -1,18 +1,37 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
+import asyncio
+import time
+from contextlib import aclosing
 import uvicorn
 import json # Essential for /market-match logic
 from dotenv import load_dotenv
 from pydantic import BaseModel
 import database
+import async_db
+import auth_cache
+import write_queue
+import llm
+import llm_cache
+import market_cache
+import job_index
+import skill_taxonomy
+import precompute
+import model_router
+import rate_limiter
+import circuit_breaker
+import code_context
+import chat_memory
+import singleflight
+import jobs
 from mirror_agent import MirrorAgent
 from lab_agent import LabAgent
 from foundry_agent import FoundryAgent
 from market_agent import MarketAnalystAgent
 from resume_agent import ResumeAgent
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 load_dotenv()
 database.init_db()
@@ -22,10 +41,10 @@ app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], all
 
 # Initialize Agents
 mirror = MirrorAgent()
-lab = LabAgent(mirror.client)
-market = MarketAnalystAgent(mirror.client)
-foundry = FoundryAgent(mirror.client)
-resume_bot = ResumeAgent(mirror.client)
+lab = LabAgent(mirror.client, mirror.async_client)
+market = MarketAnalystAgent(mirror.client, mirror.async_client)
+foundry = FoundryAgent(mirror.client, mirror.async_client)
+resume_bot = ResumeAgent(mirror.client, mirror.async_client)
 
 # --- Auth Models & Logic ---
 import secrets
@@ -80,16 +99,101 @@ def login(req: LoginRequest):
     
     return {"token": token, "name": user['full_name'], "email": user['email']}
 
+@app.post("/auth/logout")
+def logout(token: str = Depends(oauth2_scheme)):
+    database.delete_session(token)
+    auth_cache.cache.invalidate(token)
+    return {"status": "logged_out"}
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
-    user = database.get_user_by_token(token)
-    if not user:
+    # Hot path: a cached token costs one dict lookup, no database round trip
+    user = auth_cache.cache.get(token)
+    if user is not None:
+        return user
+
+    row = database.get_user_by_token(token)
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user = dict(row)
+    auth_cache.cache.put(token, user, user.pop('session_expires_at'))
     return user
 
+@app.get("/llm/cache/stats")
+async def llm_cache_stats():
+    # Hit/miss/bypass counters of this process, plus entries stored per task
+    return await asyncio.to_thread(llm_cache.stats)
+
+@app.get("/market/cache/stats")
+async def market_cache_stats():
+    # Hits/misses per tier of this process, plus entries stored per tier and kind
+    return await asyncio.to_thread(market_cache.stats)
+
+@app.get("/skills/taxonomy/stats")
+def skill_taxonomy_stats():
+    # Taxonomy size and the memoized lookups of this process
+    return skill_taxonomy.stats()
+
+@app.get("/job-index/stats")
+async def job_index_stats():
+    # Postings in the shared job index (all / recent enough to serve) and distinct skills
+    return await asyncio.to_thread(job_index.stats)
+
+@app.get("/market/precompute/runs")
+async def market_precompute_runs(limit: int = 10):
+    # Run log of the off-peak precompute, with per-cohort timings of the latest run
+    runs = await async_db.get_precompute_runs(limit)
+    latest = await async_db.get_precompute_cohorts(runs[0]["id"]) if runs else []
+    return {"runs": runs, "latest_cohorts": latest, "next_run_at": str(precompute.next_run_at() or "")}
+
+@app.get("/llm/routing/stats")
+def llm_routing_stats():
+    # Per task and model: calls, latency, tokens, escalations, plus the estimated savings of the small tier
+    return model_router.stats()
+
+@app.get("/llm/scheduler/stats")
+def llm_scheduler_stats():
+    # Per model: concurrency limit, in flight, queued, last-minute usage vs. the rate limits
+    return rate_limiter.stats()
+
+@app.get("/status")
+def dependency_status():
+    # Circuit breaker state per external dependency; "degraded" while any is not closed
+    dependencies = circuit_breaker.stats()
+    healthy = all(d["state"] == circuit_breaker.CLOSED for d in dependencies.values())
+    return {"status": "ok" if healthy else "degraded", "dependencies": dependencies}
+
+@app.get("/singleflight/stats")
+def singleflight_stats():
+    # How many calls per group were collapsed onto one already in flight
+    return singleflight.stats()
+
+@app.on_event("startup")
+def start_session_sweeper():
+    database.purge_expired_sessions()
+    auth_cache.start_session_sweeper(database.purge_expired_sessions)
+    market_cache.evict_now()
+
+# --- Server-Sent Events ---
+# Streaming endpoints send `delta` events ({"text": ...}) as tokens arrive and
+# finish with `done` ({"response": full reply}) or `error`. If the browser
+# disconnects, the response task is cancelled and closing the token stream
+# aborts the upstream Groq request.
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _sse_reply(text):
+    yield _sse("done", {"response": text})
+
+def _sse_response(events):
+    # No proxy buffering, or tokens would arrive in one lump
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # --- Foundry API Models & Endpoints ---
 # --- Foundry API Models & Endpoints ---
 class FoundryChatRequest(BaseModel):
@@ -102,15 +206,53 @@ class FoundryValidateRequest(BaseModel):
     code: str
     phase_objective: str
 
+async def foundry_window_key(user, project_context):
+    """The Architect's conversation window: this user's own project, or None (no history)."""
+    project_id = project_context.get('project_id')
+    if not project_id or await async_db.get_project_owner(project_id) != user['id']:
+        return None
+    return f"{user['id']}:{project_id}"
+
 @app.post("/foundry/chat")
-async def foundry_chat(req: FoundryChatRequest):
-    response = foundry.chat_architect(req.message, req.code, req.project_context, req.language)
-    return {"response": response}
+async def foundry_chat(req: FoundryChatRequest, user: dict = Depends(get_current_user)):
+    window_key = await foundry_window_key(user, req.project_context)
+    with circuit_breaker.track() as health:
+        response = await foundry.chat_architect_async(req.message, req.code, req.project_context, req.language, window_key)
+    return health.apply({"response": response})
+
+@app.post("/foundry/chat/stream")
+async def foundry_chat_stream(req: FoundryChatRequest, user: dict = Depends(get_current_user)):
+    """/foundry/chat as Server-Sent Events (see /chat/stream)."""
+    window_key = await foundry_window_key(user, req.project_context)
+
+    async def events():
+        parts = []
+        try:
+            with circuit_breaker.track() as health:
+                async with aclosing(foundry.chat_architect_stream(req.message, req.code, req.project_context, req.language,
+                                                                   window_key)) as deltas:
+                    async for delta in deltas:
+                        parts.append(delta)
+                        yield _sse("delta", {"text": delta})
+            yield _sse("done", health.apply({"response": "".join(parts)}))
+        except Exception as e:
+            # Breaker open or Groq failed mid-stream: keep what arrived, then the fallback
+            partial = "".join(parts)
+            response = f"{partial}\n\n{foundry.offline_reply(e)}" if partial else foundry.offline_reply(e)
+            yield _sse("error", {"response": response, "degraded": True})
+
+    return _sse_response(events())
+
+@app.get("/foundry/context/stats")
+def foundry_context_stats():
+    # Code tokens The Architect was sent vs. the files' full size, across all turns
+    return code_context.stats()
 
 @app.post("/foundry/validate")
 async def foundry_validate(req: FoundryValidateRequest):
-    result = foundry.validate_code(req.code, req.phase_objective)
-    return result
+    with circuit_breaker.track() as health:
+        result = await foundry.validate_code_async(req.code, req.phase_objective)
+    return health.apply(result)
 
 import base64
 
@@ -122,80 +264,115 @@ async def verify_output(file: UploadFile = File(...), phase_objective: str = For
         encoded_image = base64.b64encode(contents).decode("utf-8")
         image_url = f"data:image/jpeg;base64,{encoded_image}"
         
-        result = foundry.verify_screenshot(image_url, phase_objective)
-        return result
+        with circuit_breaker.track() as health:
+            result = await foundry.verify_screenshot_async(image_url, phase_objective)
+        return health.apply(result)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e), "approved": False})
 
 import io
 from pypdf import PdfReader
 
-@app.post("/analyze")
-def process_career_cycle(file: UploadFile = File(...), target_role: str = Form(...), user: dict = Depends(get_current_user)):
-    try:
-        # Read the file content
-        file_bytes = file.file.read()
-        content = ""
-        
-        # Check for PDF signature or extension
-        if file.filename.lower().endswith(".pdf") or file.content_type == "application/pdf":
-            try:
-                # Parse PDF
-                pdf = PdfReader(io.BytesIO(file_bytes))
-                for page in pdf.pages:
-                    content += page.extract_text() + "\n"
-                
-                # Check for emptiness
-                # Check for emptiness BUT PROCEED ANYWAY (Some PDFs are images)
-                if not content.strip():
-                    print("Text extraction empty. Attempting Vision Extraction (Image-based PDF)...")
-                    try:
-                        # Extract images from first page
-                        page = pdf.pages[0]
-                        if len(page.images) > 0:
-                            # Convert first image to base64
-                            import base64
-                            img_obj = page.images[0]
-                            img_bytes = img_obj.data
-                            base64_img = base64.b64encode(img_bytes).decode('utf-8')
-                            
-                            # Call Vision Agent
-                            profile_data = mirror.analyze_image_resume(base64_img, target_role)
-                            
-                            # Skip normal text flow
-                            skill_gaps = profile_data.get("skill_gaps", [])
-                            projects = lab.generate_projects(skill_gaps)
-                            database.save_career_data(target_role, profile_data, projects, "Sprout", user['id'])
-                            return {"profile": profile_data, "projects": projects}
-                            
-                        else:
-                            content = "[WARNING: EMPTY PDF AND NO IMAGES FOUND]"
-                    except Exception as vision_err:
-                        print(f"Vision Extraction Failed: {vision_err}")
-                        content = "[WARNING: FAILED TO EXTRACT IMAGES]"
-                        
-                else:
-                    # Tag it so agent knows context
-                    content = f"[RESUME PDF CONTENT START]\n{content}\n[RESUME PDF CONTENT END]"
-            except Exception as pdf_err:
-                print(f"PDF Parsing Failed: {pdf_err}")
-                # Don't fail, just pass through (might be text file with pdf extension)
-                content = file_bytes.decode('utf-8', errors='ignore')
-        else:
-            # Fallback to Text
+def _extract_resume_text(file_bytes, filename, content_type):
+    """
+    Blocking PDF/text extraction (run off the event loop).
+    Returns (content, base64_image); base64_image is set for image-only PDFs.
+    """
+    content = ""
+    
+    # Check for PDF signature or extension
+    if filename.lower().endswith(".pdf") or content_type == "application/pdf":
+        try:
+            # Parse PDF
+            pdf = PdfReader(io.BytesIO(file_bytes))
+            for page in pdf.pages:
+                content += page.extract_text() + "\n"
+            
+            # Check for emptiness
+            # Check for emptiness BUT PROCEED ANYWAY (Some PDFs are images)
+            if not content.strip():
+                print("Text extraction empty. Attempting Vision Extraction (Image-based PDF)...")
+                try:
+                    # Extract images from first page
+                    page = pdf.pages[0]
+                    if len(page.images) > 0:
+                        # Convert first image to base64
+                        import base64
+                        img_obj = page.images[0]
+                        img_bytes = img_obj.data
+                        return content, base64.b64encode(img_bytes).decode('utf-8')
+                    else:
+                        content = "[WARNING: EMPTY PDF AND NO IMAGES FOUND]"
+                except Exception as vision_err:
+                    print(f"Vision Extraction Failed: {vision_err}")
+                    content = "[WARNING: FAILED TO EXTRACT IMAGES]"
+                    
+            else:
+                # Tag it so agent knows context
+                content = f"[RESUME PDF CONTENT START]\n{content}\n[RESUME PDF CONTENT END]"
+        except Exception as pdf_err:
+            print(f"PDF Parsing Failed: {pdf_err}")
+            # Don't fail, just pass through (might be text file with pdf extension)
             content = file_bytes.decode('utf-8', errors='ignore')
-        
-        # 1. Mirror Agent call (Returns profile dictionary)
-        profile_data = mirror.analyze_resume(content, target_role)
+    else:
+        # Fallback to Text
+        content = file_bytes.decode('utf-8', errors='ignore')
+    return content, None
+
+async def _career_cycle(file_bytes, filename, content_type, target_role, user_id):
+    content, base64_img = await asyncio.to_thread(_extract_resume_text, file_bytes, filename, content_type)
+    
+    with circuit_breaker.track() as health:
+        if base64_img:
+            # Call Vision Agent (Image-based PDF)
+            profile_data = await mirror.analyze_image_resume_async(base64_img, target_role)
+        else:
+            # 1. Mirror Agent call (Returns profile dictionary)
+            profile_data = await mirror.analyze_resume_async(content, target_role)
         
         # 2. Use the result to trigger the Lab Agent
         skill_gaps = profile_data.get("skill_gaps", [])
-        projects = lab.generate_projects(skill_gaps)
-        
-        # 3. Save to History (User specific)
-        database.save_career_data(target_role, profile_data, projects, "Sprout", user['id'])
-        
-        return {"profile": profile_data, "projects": projects}
+        projects = await lab.generate_projects_async(skill_gaps)
+    
+    # 3. Save to History (User specific)
+    await async_db.save_career_data(target_role, profile_data, projects, "Sprout", user_id)
+    
+    return health.apply({"profile": profile_data, "projects": projects})
+
+@jobs.handler("analyze")
+async def _analyze_job(payload, user_id):
+    file_bytes = base64.b64decode(payload["file"])
+    return await _career_cycle(file_bytes, payload["filename"], payload["content_type"], payload["target_role"], user_id)
+
+def _analyze_payload(file_bytes, file: UploadFile, target_role):
+    return {
+        "file": base64.b64encode(file_bytes).decode("ascii"),
+        "filename": file.filename,
+        "content_type": file.content_type,
+        "target_role": target_role,
+    }
+
+# Double-clicking "Analyze" must not run (and save) the pipeline twice. With an
+# Idempotency-Key header the result is also replayed for retries within
+# ANALYZE_IDEMPOTENCY_TTL; without one, identical uploads only share an
+# in-flight run.
+analyze_flight = singleflight.Group("analyze")
+ANALYZE_IDEMPOTENCY_TTL = float(os.getenv("ANALYZE_IDEMPOTENCY_TTL", "600"))
+
+@app.post("/analyze")
+async def process_career_cycle(file: UploadFile = File(...), target_role: str = Form(...), user: dict = Depends(get_current_user),
+                               idempotency_key: str | None = Header(None)):
+    try:
+        # Read the file content
+        file_bytes = await file.read()
+        if idempotency_key:
+            key, remember = (user['id'], "key", idempotency_key), ANALYZE_IDEMPOTENCY_TTL
+        else:
+            key, remember = (user['id'], hashlib.sha256(file_bytes).hexdigest(), target_role), 0
+        # Runs on the job pool like /jobs/analyze; this endpoint just waits for it
+        payload = _analyze_payload(file_bytes, file, target_role)
+        return await analyze_flight.do(
+            key, lambda: _run_job("analyze", payload, user['id'], idempotency_key=idempotency_key), remember=remember)
     except Exception as e:
         print(f"Analysis Error: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -206,7 +383,7 @@ class UpdateProjectsRequest(BaseModel):
 @app.post("/update-generated-projects")
 async def update_generated_projects(req: UpdateProjectsRequest):
     try:
-        success = database.update_latest_profile_projects(req.projects)
+        success = await async_db.update_latest_profile_projects(req.projects)
         if success:
             return {"status": "updated"}
         return {"status": "no_profile_found"}
@@ -252,70 +429,109 @@ def get_history_by_session(session_id: str, user: dict = Depends(get_current_use
 @app.delete("/chat/sessions/{session_id}")
 async def delete_chat_session(session_id: str, user: dict = Depends(get_current_user)):
     try:
-        database.delete_chat_session(session_id)
+        await async_db.delete_chat_session(session_id)
         return {"status": "deleted"}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
-@app.post("/chat")
-def career_chat(req: ChatRequest, user: dict = Depends(get_current_user)):
-    history = database.get_profile_by_user_id(user['id'])
+CAREER_CHAT_RULES = (
+    "INSTRUCTIONS: Respond in max 3 short paragraphs. Use bullet points. Keep it neat. \n\n"
+    "IMPORTANT PROJECT GENERATION RULES:\n"
+    "1. DEFAULT BEHAVIOR: Output ONLY text. Do NOT generate new projects unless the user explicitly asks to 'create', 'generate', 'give', 'change', or 'update' projects.\n"
+    "2. If the user just says 'hello' or asks a question, ANSWER ONLY IN TEXT. Do not append JSON.\n"
+    "3. ONLY if the user explicitly asks for new projects: Append a single JSON block at the end: ```json { \"projects\": [ { \"id\": \"unique-id\", \"title\": \"Title\", \"description\": \"Desc\", \"tech\": [\"Tag\"], \"difficulty\": \"Easy/Medium/Hard\", \"icon\": \"code\", \"color\": \"from-blue-500 to-cyan-500\" } ] } ```.\n"
+    "4. If the user asks for specific difficulty levels (e.g., 'give me medium projects'), ONLY generate projects for that level.\n"
+    "5. If the user asks for projects by TOPIC but DOES NOT specify a level (e.g., 'give me python projects'), generate valid projects for ALL THREE LEVELS (3 Easy, 3 Medium, 3 Hard) to complete the set."
+)
+
+async def _start_career_chat(req: ChatRequest, user: dict):
+    """
+    Shared by /chat and /chat/stream: loads the profile and the session's
+    memory (summary + recent messages), queues the user's message and builds
+    the completion request.
+    Returns (request, memory, user_msg_saved), or None without a profile.
+    """
+    history = await async_db.get_profile_by_user_id(user['id'], fields=("analysis",))
     if not history:
-        return {"response": "Please upload a resume first."}
-        
+        return None
+
     # Check if session exists, if not create (auto-recovery)
     # Note: get_chat_history returns messages, not session meta. 
     # But create_chat_session is safe (INSERT OR IGNORE)
-    database.create_chat_session(req.session_id, user['id'], f"Chat about {req.message[:20]}...")
+    await async_db.create_chat_session(req.session_id, user['id'], f"Chat about {req.message[:20]}...")
 
-    # Load Past Context
-    past_msgs = database.get_chat_history(req.session_id)
-    chat_context = [{"role": m["role"], "content": m["content"]} for m in past_msgs]
+    # Load Past Context: running summary + recent turns only (chat_memory.py)
+    memory = await chat_memory.load(req.session_id)
     
-    # Save User Msg
-    database.save_chat_message(req.session_id, "user", req.message)
+    # Save User Msg (batched with other writes; committed before the reply is saved)
+    user_msg_saved = write_queue.save_chat_message(req.session_id, "user", req.message)
     
-    context_system = (
-        f"User is a {history['role']} with skills: {history['analysis'].get('current_skills', 'N/A')}. "
-        "INSTRUCTIONS: Respond in max 3 short paragraphs. Use bullet points. Keep it neat. \n\n"
-        "IMPORTANT PROJECT GENERATION RULES:\n"
-        "1. DEFAULT BEHAVIOR: Output ONLY text. Do NOT generate new projects unless the user explicitly asks to 'create', 'generate', 'give', 'change', or 'update' projects.\n"
-        "2. If the user just says 'hello' or asks a question, ANSWER ONLY IN TEXT. Do not append JSON.\n"
-        "3. ONLY if the user explicitly asks for new projects: Append a single JSON block at the end: ```json { \"projects\": [ { \"id\": \"unique-id\", \"title\": \"Title\", \"description\": \"Desc\", \"tech\": [\"Tag\"], \"difficulty\": \"Easy/Medium/Hard\", \"icon\": \"code\", \"color\": \"from-blue-500 to-cyan-500\" } ] } ```.\n"
-        "4. If the user asks for specific difficulty levels (e.g., 'give me medium projects'), ONLY generate projects for that level.\n"
-        "5. If the user asks for projects by TOPIC but DOES NOT specify a level (e.g., 'give me python projects'), generate valid projects for ALL THREE LEVELS (3 Easy, 3 Medium, 3 Hard) to complete the set."
-    )
+    context_system = f"User is a {history['role']} with skills: {history['analysis'].get('current_skills', 'N/A')}. " + CAREER_CHAT_RULES
+    request = {
+        "task": "mirror.career_chat",
+        "model": "llama-3.3-70b-versatile",
+        "messages": chat_memory.messages(context_system, memory, req.message)
+    }
+    return request, memory, user_msg_saved
+
+async def _finish_career_chat(req: ChatRequest, memory, user_msg_saved, reply):
+    # Save Bot Msg
+    await write_queue.wait(user_msg_saved)
+    await write_queue.wait(write_queue.save_chat_message(req.session_id, "assistant", reply))
+    # Fold older turns into the summary in the background
+    chat_memory.compact_later(req.session_id)
     
-    try:
-        # Build Messages
-        messages = [{"role": "system", "content": context_system}] + chat_context + [{"role": "user", "content": req.message}]
+    # Auto-Rename if first message
+    if memory["is_new"]:
+         # Simple rename logic (could use AI)
+         new_title = req.message.split('\n')[0][:30]
+         await async_db.rename_chat_session(req.session_id, new_title)
 
-        response = mirror.client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages
-        )
-        reply = response.choices[0].message.content
-        
-        # Save Bot Msg
-        database.save_chat_message(req.session_id, "assistant", reply)
-        
-        # Auto-Rename if first message
-        if len(past_msgs) == 0:
-             # Simple rename logic (could use AI)
-             new_title = req.message.split('\n')[0][:30]
-             database.rename_chat_session(req.session_id, new_title)
+@app.post("/chat")
+async def career_chat(req: ChatRequest, user: dict = Depends(get_current_user)):
+    started = await _start_career_chat(req, user)
+    if not started:
+        return {"response": "Please upload a resume first."}
+    request, memory, user_msg_saved = started
 
+    try:
+        reply = await llm.acomplete(request, mirror.async_client)
+        await asyncio.shield(_finish_career_chat(req, memory, user_msg_saved, reply))
         return {"response": reply}
     except Exception as e:
-        return {"response": f"I'm having trouble thinking right now. ({str(e)})"}
+        return {"response": f"I'm having trouble thinking right now. ({str(e)})", "degraded": True}
+
+@app.post("/chat/stream")
+async def career_chat_stream(req: ChatRequest, user: dict = Depends(get_current_user)):
+    """/chat as Server-Sent Events: `delta` events while the reply is generated, then `done` with the full reply."""
+    started = await _start_career_chat(req, user)
+    if not started:
+        return _sse_response(_sse_reply("Please upload a resume first."))
+    request, memory, user_msg_saved = started
+
+    async def events():
+        parts = []
+        try:
+            async with aclosing(llm.astream(request, mirror.async_client)) as deltas:
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield _sse("delta", {"text": delta})
+            reply = "".join(parts)
+            # A client that disconnects now must not cut the save short
+            await asyncio.shield(_finish_career_chat(req, memory, user_msg_saved, reply))
+            yield _sse("done", {"response": reply})
+        except Exception as e:
+            yield _sse("error", {"response": f"I'm having trouble thinking right now. ({str(e)})", "degraded": True})
+
+    return _sse_response(events())
 
 @app.get("/history")
 async def get_history():
-    return database.get_all_profiles()
+    return await async_db.get_all_profiles()
 
 @app.get("/history/{profile_id}")
 async def load_history_item(profile_id: int):
-    data = database.get_profile_by_id(profile_id)
+    data = await async_db.get_profile_by_id(profile_id)
     if not data:
         return JSONResponse(status_code=404, content={"error": "Not found"})
     return data
@@ -323,7 +539,7 @@ async def load_history_item(profile_id: int):
 @app.delete("/history/{profile_id}")
 async def delete_history_item(profile_id: int):
     try:
-        database.delete_profile(profile_id)
+        await async_db.delete_profile(profile_id)
         return {"message": "Deleted successfully"}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -334,75 +550,105 @@ async def delete_history_item(profile_id: int):
 class ResumeBuildRequest(BaseModel):
     job_description: str
 
+@jobs.handler("resume.build")
+async def _resume_build_job(payload, user_id):
+    # Gather Context
+    profile = (user_id and await async_db.get_profile_by_user_id(user_id)) or await async_db.get_latest_profile() or {}
+    # Get projects user actually WORKED on (from 'My Lab')
+    active_projects = await async_db.get_all_active_projects(user_id)
+    
+    with circuit_breaker.track() as health:
+        result = await resume_bot.generate_resume_content_async(profile, active_projects, payload["job_description"])
+    return health.apply(result)
+
 @app.post("/resume/build")
 async def build_resume(req: ResumeBuildRequest):
     try:
-        # Gather Context
-        profile = database.get_latest_profile() or {}
-        # Get projects user actually WORKED on (from 'My Lab')
-        active_projects = database.get_all_active_projects() 
-        
-        result = resume_bot.generate_resume_content(profile, active_projects, req.job_description)
-        return result
+        return await _run_job("resume.build", {"job_description": req.job_description})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 # --- New Endpoints for Frontend Alignment ---
 
 @app.get("/live-feeds")
-def get_live_feeds(user: dict = Depends(get_current_user)):
-    profile = database.get_profile_by_user_id(user['id'])
-    if profile:
-        skills = profile['analysis'].get('current_skills', [])
-        return market.get_live_feeds(profile['role'], skills)
-        
-    # Fallback if no profile
-    return market.get_live_feeds(None, None)
+async def get_live_feeds(user: dict = Depends(get_current_user)):
+    profile = await async_db.get_profile_by_user_id(user['id'], fields=("analysis",))
+    with circuit_breaker.track() as health, market_cache.track() as served:
+        if profile:
+            skills = profile['analysis'].get('current_skills', [])
+            return served.apply(health.apply(await market.get_live_feeds_async(profile['role'], skills)))
+            
+        # Fallback if no profile
+        return served.apply(health.apply(await market.get_live_feeds_async(None, None)))
 
 @app.get("/market/ticker")
-def get_market_ticker():
-    return market.get_stock_ticker()
+async def get_market_ticker():
+    with circuit_breaker.track() as health, market_cache.track() as served:
+        return served.apply(health.apply(await market.get_stock_ticker_async()))
+
+def _job_matches_updated_at(profile):
+    """When the profile's saved job matches were generated, as epoch seconds (None if unknown)."""
+    last_updated = profile.get('job_matches_updated_at')
+    if not last_updated:
+        return None
+    try:
+        # Handle potential format variations
+        if isinstance(last_updated, str):
+            # SQLite often returns "YYYY-MM-DD HH:MM:SS"
+            last_dt = datetime.fromisoformat(last_updated) if 'T' in last_updated else datetime.strptime(last_updated, "%Y-%m-%d %H:%M:%S")
+        else:
+            last_dt = last_updated # Already datetime object
+        if last_dt.tzinfo is None:
+            last_dt = last_dt.replace(tzinfo=timezone.utc) # CURRENT_TIMESTAMP is UTC
+        return last_dt.timestamp()
+    except Exception as e:
+        print(f"Date parse error: {e}, forcing refresh")
+        return None
+
+async def _generate_job_matches(profile, allow_stale=True):
+    skills = profile['analysis'].get('current_skills', [])
+    with circuit_breaker.track() as health:
+        matches = await market.find_job_matches_async(profile['role'], skills, allow_stale=allow_stale)
+    if not health.degraded:
+        matches = await job_index.arescore(matches, profile['role'], skills)
+    
+    # Save to DB (updates timestamp) - but not placeholder listings, so the
+    # next request tries again once the dependencies are back
+    if not health.degraded:
+        await async_db.update_job_matches(profile['id'], matches)
+    return matches, health
 
 @app.get("/job-matches")
-def get_job_matches(user: dict = Depends(get_current_user)):
-    profile = database.get_profile_by_user_id(user['id'])
+async def get_job_matches(user: dict = Depends(get_current_user)):
+    profile = await async_db.get_profile_by_user_id(user['id'], fields=("analysis", "job_matches"))
     if not profile:
         return {"jobs": []}
     
-    # Check Staleness (24h)
-    should_refresh = True
-    last_updated = profile.get('job_matches_updated_at')
-    
-    if last_updated:
-        try:
-            # Handle potential format variations
-            if isinstance(last_updated, str):
-                # SQLite often returns "YYYY-MM-DD HH:MM:SS"
-                last_dt = datetime.fromisoformat(last_updated) if 'T' in last_updated else datetime.strptime(last_updated, "%Y-%m-%d %H:%M:%S")
-            else:
-                last_dt = last_updated # Already datetime object
-                
-            if datetime.now() - last_dt < timedelta(hours=24):
-                should_refresh = False
-        except Exception as e:
-            print(f"Date parse error: {e}, forcing refresh")
-            should_refresh = True
-            
-    # Return cached matches if valid and exist
-    if not should_refresh and profile.get('job_matches') and len(profile['job_matches']) > 0:
-        return {"jobs": profile['job_matches']}
+    updated_at = _job_matches_updated_at(profile)
+    with market_cache.track() as served:
+        # Ranked from the shared job index when it covers the role well enough
+        indexed = await job_index.amatches(profile['role'], profile['analysis'].get('current_skills', []))
+        if indexed is not None:
+            return served.apply({"jobs": indexed, "source": "index"})
+
+        # Saved matches: fresh for a day, then served as stale (max MARKET_CACHE_MAX_STALE)
+        # while a background task regenerates them
+        if updated_at and profile.get('job_matches'):
+            age = time.time() - updated_at
+            if age < market_cache.TTLS["jobs"] + market_cache.MAX_STALE["jobs"]:
+                fresh = age < market_cache.TTLS["jobs"]
+                served.saw({"fresh": fresh, "created_at": updated_at})
+                if not fresh:
+                    async def refresh():
+                        await _generate_job_matches(profile, allow_stale=False)
+                    market_cache.refresh_later(f"profile-jobs|{profile['id']}", refresh)
+                return served.apply({"jobs": profile['job_matches']})
         
-    # Otherwise generate new ones (Daily Scrape)
-    skills = profile['analysis'].get('current_skills', [])
-    jobs = market.find_job_matches(profile['role'], skills)
-    
-    # Save to DB (updates timestamp)
-    database.update_job_matches(profile['id'], jobs)
-    
-    return {"jobs": jobs}
+        # Otherwise generate new ones (Daily Scrape)
+        matches, health = await _generate_job_matches(profile)
+        return served.apply(health.apply({"jobs": matches}))
 
 # --- Active Projects API ---
-import time
 
 
 class StartProjectRequest(BaseModel):
@@ -414,41 +660,46 @@ class UpdatePhaseRequest(BaseModel):
     project_id: str
     phase_id: int # The phase just completed
 
-@app.post("/project/start")
-def start_project(req: StartProjectRequest, user: dict = Depends(get_current_user)):
+@jobs.handler("project.start", priority=jobs.PRIORITY_HIGH)
+async def _start_project_job(payload, user_id):
     # Check if already active
     # CHECK USER PROJECTS ONLY
-    active_projects = database.get_all_active_projects(user['id'])
+    active_projects = await async_db.get_all_active_projects(user_id)
     for p in active_projects:
-        if p['title'] == req.title:
+        if p['title'] == payload['title']:
             return {"project": p, "status": "job_already_started"}
             
     # Generate Phases
-    phases = mirror.generate_project_phases(req.title, req.tech_stack)
+    with circuit_breaker.track() as health:
+        phases = await mirror.generate_project_phases_async(payload['title'], payload['tech_stack'])
     
     new_project = {
         "id": f"proj_{int(time.time())}",
-        "title": req.title,
-        "tech_stack": req.tech_stack,
-        "description": req.description,
+        "title": payload['title'],
+        "tech_stack": payload['tech_stack'],
+        "description": payload['description'],
         "current_phase": 1, 
         "total_phases": 6,
         "phases": phases, 
         "started_at": datetime.now().isoformat()
     }
     
-    database.save_project_globally(new_project, user['id'])
+    await async_db.save_project_globally(new_project, user_id)
     
-    return {"project": new_project, "status": "started"}
+    return health.apply({"project": new_project, "status": "started"})
+
+@app.post("/project/start")
+async def start_project(req: StartProjectRequest, user: dict = Depends(get_current_user)):
+    return await _run_job("project.start", req.dict(), user['id'])
 
 @app.get("/workspace")
 async def get_workspace(user: dict = Depends(get_current_user)):
-    projects = database.get_all_active_projects(user['id'])
+    projects = await async_db.get_all_active_projects(user['id'])
     return {"projects": projects}
 
 @app.get("/project/{project_id}")
 async def get_project(project_id: str):
-    p = database.get_project_by_id(project_id)
+    p = await async_db.get_project_by_id(project_id)
     if p:
         return p
     
@@ -459,15 +710,15 @@ async def unlock_phase(req: UpdatePhaseRequest):
     # Simpler global update
     try:
         # Check current phase first to ensure we are incrementing correctly
-        p = database.get_project_by_id(req.project_id)
+        p = await async_db.get_project_by_id(req.project_id)
         if not p:
             raise HTTPException(status_code=404)
             
         if p['current_phase'] == req.phase_id:
-             database.update_phase_progress(req.project_id, req.phase_id + 1)
+             owner_id = await async_db.update_phase_progress(req.project_id, req.phase_id + 1)
              
-             # Dynamic Growth Update
-             new_stage = database.recalculate_user_growth(None)
+             # Dynamic Growth Update (owner's counters; unowned projects fall back to global)
+             new_stage = await async_db.recalculate_user_growth(None, owner_id)
              print(f"User Growth Updated: {new_stage}")
              
              return {"status": "updated", "new_stage": new_stage}
@@ -480,7 +731,7 @@ async def unlock_phase(req: UpdatePhaseRequest):
 @app.delete("/project/{project_id}")
 async def delete_project(project_id: str):
     try:
-        database.delete_project(project_id)
+        await async_db.delete_project(project_id)
         return {"status": "deleted"}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -519,12 +770,13 @@ async def join_session(req: JoinSessionRequest):
 
 @app.post("/project/sync")
 async def sync_code(req: SyncCodeRequest):
-    database.update_project_code(req.project_id, req.code)
+    # Coalesced per project: only the newest code of a burst gets written
+    write_queue.update_project_code(req.project_id, req.code)
     return {"status": "synced"}
 
 @app.get("/project/{project_id}/sync")
 async def get_latest_code(project_id: str):
-    p = database.get_project_by_id(project_id)
+    p = await async_db.get_project_by_id(project_id)
     if not p: return {"code": ""}
     return {"code": p.get('code', "")}
 
@@ -632,69 +884,38 @@ def get_profile_full(user: dict = Depends(get_current_user)):
 
 @app.post("/profile/update")
 async def update_profile(req: ProfileUpdateRequest):
-    p = database.get_latest_profile()
+    p = await async_db.get_latest_profile(fields=())
     if not p: raise HTTPException(status_code=404)
     
-    database.update_profile_details(p['id'], req.dict())
+    await async_db.update_profile_details(p['id'], req.dict())
     return {"status": "updated"}
 
 @app.post("/profile/goals")
 async def add_goal(req: GoalRequest):
-    p = database.get_latest_profile()
+    p = await async_db.get_latest_profile(fields=())
     if not p: raise HTTPException(status_code=404)
     
-    database.add_user_goal(p['id'], req.dict())
+    await async_db.add_user_goal(p['id'], req.dict())
     return {"status": "added"}
 
 @app.delete("/profile/goals/{goal_id}")
 async def delete_goal(goal_id: int):
-    database.delete_goal(goal_id)
+    await async_db.delete_goal(goal_id)
     return {"status": "deleted"}
 
 @app.put("/profile/goals/{goal_id}")
 async def update_goal(goal_id: int, req: GoalStatusRequest):
-    database.update_goal_status(goal_id, req.is_done)
+    await async_db.update_goal_status(goal_id, req.is_done)
     return {"status": "updated"}
 
 @app.post("/profile/activity")
 async def log_activity(req: ActivityRequest):
-    p = database.get_latest_profile()
+    p = await async_db.get_latest_profile(fields=())
     if not p: raise HTTPException(status_code=404)
     
-    database.log_user_activity(p['id'], req.date, req.hours, req.level)
+    # Heartbeats for the same day are summed in memory before they're written
+    write_queue.log_user_activity(p['id'], req.date, req.hours, req.level)
     return {"status": "logged"}
-    # Cap progress to the next tier
-    tiers = [
-        ("Sprout", 5),
-        ("Grove Guardian", 15),
-        ("Forest Ranger", 30),
-        ("Terraformer", 50),
-        ("Gaia's Legacy", 1000)
-    ]
-    
-    current_tier_max = 5
-    for tier_name, limit in tiers:
-        if trees_count < limit:
-            current_tier_max = limit
-            break
-            
-    # Calculate percentage to next badge
-    # e.g. 2 trees. Target 5. Progress = 40%
-    # e.g. 12 trees. Target 15. Progress = 80% (relative to total? or just raw scale?)
-    # Let's do raw scale relative to next badge
-    if current_tier_max > 0:
-        progress = min(100, int((trees_count / current_tier_max) * 100))
-    else:
-        progress = 100
-    
-    stage = profile['growth_stage'] if profile else "Sprout"
-    
-    return {
-        "progress": progress, 
-        "stage": stage, 
-        "trees": trees_count, 
-        "next_goal": current_tier_max
-    }
 
 # --- Community Chat Endpoints ---
 
@@ -708,21 +929,113 @@ def list_channels(auth_user=Depends(get_current_user)):
     return database.get_channels()
 
 @app.get("/community/messages/{channel_name}")
-def get_messages(channel_name: str, auth_user=Depends(get_current_user)):
-    return database.get_channel_messages(channel_name)
+def get_messages(channel_name: str, before: int | None = None, after: int | None = None, limit: int = 50,
+                 auth_user=Depends(get_current_user)):
+    # Cursors are message ids: ?after=<last seen id> to poll, ?before=<oldest id> to load older
+    return database.get_channel_messages(channel_name, before=before, after=after, limit=limit)
 
 @app.post("/community/messages")
 def post_message(req: ChatMessageRequest, auth_user=Depends(get_current_user)):
-    success = database.add_community_message(auth_user['id'], req.channel, req.content, req.type)
+    success = write_queue.add_community_message(auth_user['id'], req.channel, req.content, req.type).result()
     if not success:
         raise HTTPException(status_code=400, detail="Invalid channel")
     return {"status": "sent"}
 
 # --- End Community Chat Endpoints ---
 
+# --- Search ---
+
+@app.get("/search")
+async def search(q: str, scope: str = "chat,community,projects", limit: int = 20, user: dict = Depends(get_current_user)):
+    # scope: comma-separated subset of chat, community, projects
+    scopes = [s for s in scope.split(",") if s in database.SEARCH_INDEXES]
+    if not scopes:
+        raise HTTPException(status_code=400, detail="Unknown search scope")
+    results = await async_db.search(user['id'], q, scopes, max(1, min(limit, 50)))
+    return {"query": q, "results": results}
+
+# --- Background Jobs API ---
+# The long pipelines run on the job pool (jobs.py). The /jobs/* endpoints
+# return a job id at once; follow it with GET /jobs/{id} (poll) or
+# GET /jobs/{id}/events (Server-Sent Events: `status` on every state change,
+# then `done` with the result or `error`). The older endpoints above submit
+# the same jobs and wait for them.
+
+JOB_HEARTBEAT = 15 # seconds between keep-alive comments on idle event streams
+
+async def _run_job(kind, payload, user_id=None, idempotency_key=None):
+    """Submits a job and waits for it; returns its result or raises with its error."""
+    job = await jobs.wait(await jobs.submit(kind, payload, user_id, idempotency_key=idempotency_key))
+    if job["status"] != "done":
+        raise RuntimeError(job["error"] or "Job failed")
+    return job["result"]
+
+def _job_view(job):
+    return {k: v for k, v in job.items() if k != "payload"}
+
+async def _own_job(job_id, user):
+    job = await jobs.get(job_id)
+    if not job or job["user_id"] != user['id']:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs/analyze")
+async def submit_analyze_job(file: UploadFile = File(...), target_role: str = Form(...), user: dict = Depends(get_current_user),
+                             idempotency_key: str | None = Header(None)):
+    file_bytes = await file.read()
+    job_id = await jobs.submit("analyze", _analyze_payload(file_bytes, file, target_role), user['id'],
+                               idempotency_key=idempotency_key)
+    return {"job_id": job_id}
+
+@app.post("/jobs/resume-build")
+async def submit_resume_job(req: ResumeBuildRequest, user: dict = Depends(get_current_user)):
+    return {"job_id": await jobs.submit("resume.build", {"job_description": req.job_description}, user['id'])}
+
+@app.post("/jobs/project-start")
+async def submit_project_job(req: StartProjectRequest, user: dict = Depends(get_current_user)):
+    return {"job_id": await jobs.submit("project.start", req.dict(), user['id'])}
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 20, user: dict = Depends(get_current_user)):
+    return [_job_view(j) for j in await async_db.get_user_jobs(user['id'], min(limit, 100))]
+
+@app.get("/jobs/stats")
+def job_stats():
+    return jobs.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, user: dict = Depends(get_current_user)):
+    return _job_view(await _own_job(job_id, user))
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, user: dict = Depends(get_current_user)):
+    await _own_job(job_id, user)
+
+    async def events():
+        async for job in jobs.watch(job_id, heartbeat=JOB_HEARTBEAT):
+            if job is None:
+                yield ": keep-alive\n\n"
+            elif job["status"] == "done":
+                yield _sse("done", {"result": job["result"]})
+            elif job["status"] == "failed":
+                yield _sse("error", {"error": job["error"]})
+            else:
+                yield _sse("status", _job_view(job))
+
+    return _sse_response(events())
+
+@app.on_event("startup")
+async def start_job_workers():
+    await jobs.start()
+
+@app.on_event("startup")
+async def start_market_precompute():
+    precompute.start(market)
+
 @app.on_event("shutdown")
 def shutdown_event():
     import os
+    write_queue.queue.flush(timeout=5)
     print("Forcefully shutting down...")
     os._exit(0)
 
@@ -732,6 +1045,7 @@ if __name__ == "__main__":
 
     def signal_handler(sig, frame):
         print("\nCtrl+C detected! Exiting immediately...")
+        write_queue.queue.flush(timeout=5)
         import os
         os._exit(0)
 
@@ -0,0 +1,156 @@
+"""
+Maintenance commands for the Sentinel backend.
+
+    python manage.py migrate
+    python manage.py check-plans [--verbose]
+    python manage.py check-progress [--repair]
+    python manage.py rebuild-search [--full] [--index chat|community|projects]
+    python manage.py llm-cache [--clear] [--task TASK]
+    python manage.py market-cache [--clear] [--tier result|search]
+    python manage.py precompute [--stub] [--limit N] [--concurrency N] [--minutes M]
+"""
+import argparse
+import sys
+
+import database
+
+def cmd_migrate(args):
+    version = database.init_db()
+    print(f"Schema at version {version}")
+
+def cmd_check_plans(args):
+    import query_plans
+
+    failures = query_plans.check(scale=args.scale, verbose=args.verbose)
+    for func_name, sql, problems in failures:
+        print(f"\n[{func_name}] {sql}")
+        for p in problems:
+            print(f"    -> {p}")
+    if failures:
+        print(f"\n{len(failures)} query plan regression(s)")
+        return 1
+    print("All query plans use indexes")
+    return 0
+
+def cmd_check_progress(args):
+    database.init_db()
+    mismatches = database.verify_user_progress(repair=args.repair)
+    for user_id, stored, expected in mismatches:
+        print(f"user {user_id}: stored {stored}, expected {expected}")
+    if not mismatches:
+        print("Progress counters match the projects table")
+        return 0
+    if args.repair:
+        print(f"Repaired counters for {len(mismatches)} user(s)")
+        return 0
+    print(f"\n{len(mismatches)} user(s) with drifted counters (rerun with --repair)")
+    return 1
+
+def cmd_rebuild_search(args):
+    database.init_db()
+    names = [args.index] if args.index else None
+    for name, count in database.rebuild_search_index(names, full=args.full).items():
+        print(f"{name}: {'rebuilt' if args.full else 'indexed'} {count} row(s)")
+    broken = database.check_search_index(names)
+    if broken:
+        print(f"Integrity check failed for {', '.join(broken)} (rerun with --full)")
+        return 1
+    print("Search indexes consistent")
+    return 0
+
+def cmd_llm_cache(args):
+    database.init_db()
+    if args.clear:
+        removed = database.clear_llm_cache(args.task)
+        print(f"Removed {removed} cached response(s)")
+        return 0
+    stored = database.get_llm_cache_stats()
+    for task, s in sorted(stored.items(), key=lambda item: str(item[0])):
+        if args.task and task != args.task:
+            continue
+        print(f"{task}: {s['entries']} entries, {s['bytes'] / 1024:.0f} KiB, {s['hits']} hit(s)")
+    if not stored:
+        print("LLM cache is empty")
+    return 0
+
+def cmd_market_cache(args):
+    database.init_db()
+    if args.clear:
+        removed = database.clear_market_cache(args.tier)
+        print(f"Removed {removed} cached entr{'y' if removed == 1 else 'ies'}")
+        return 0
+    stored = database.get_market_cache_stats()
+    for name, s in sorted(stored.items()):
+        if args.tier and not name.startswith(args.tier + "."):
+            continue
+        print(f"{name}: {s['entries']} entries, {s['bytes'] / 1024:.0f} KiB")
+    if not stored:
+        print("Market cache is empty")
+    return 0
+
+def cmd_precompute(args):
+    import asyncio
+
+    import precompute
+    import write_queue
+
+    database.init_db()
+    if args.stub:
+        print(f"Stubbed Tavily/Groq, working on a copy: {precompute.scratch_copy()}")
+        market = precompute.stub_market()
+    else:
+        import llm
+        from market_agent import MarketAnalystAgent
+        market = MarketAnalystAgent(llm.get_client(), llm.get_async_client())
+
+    budget = {"limit": args.limit, "concurrency": args.concurrency, "max_minutes": args.minutes}
+    run = asyncio.run(precompute.run(market, **{k: v for k, v in budget.items() if v is not None}))
+    write_queue.queue.flush(timeout=30)
+    for cohort in database.get_precompute_cohorts(run["id"]):
+        seconds = f"{cohort['seconds']:.1f}s" if cohort["seconds"] is not None else "-"
+        print(f"{cohort['status']:>9} {seconds:>7}  {cohort['role']} [{cohort['skills']}]"
+              f"{' - ' + cohort['error'] if cohort['error'] else ''}")
+    return 0 if run["status"] == "done" else 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sentinel backend maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("migrate", help="Apply pending schema migrations").set_defaults(func=cmd_migrate)
+
+    plans = sub.add_parser("check-plans", help="EXPLAIN every database.py query on a synthetic DB")
+    plans.add_argument("--scale", type=int, default=1, help="Synthetic data multiplier")
+    plans.add_argument("--verbose", action="store_true")
+    plans.set_defaults(func=cmd_check_plans)
+
+    progress = sub.add_parser("check-progress", help="Compare user_progress counters with the projects table")
+    progress.add_argument("--repair", action="store_true", help="Rebuild drifted counters")
+    progress.set_defaults(func=cmd_check_progress)
+
+    search = sub.add_parser("rebuild-search", help="Index rows missing from the FTS5 search indexes")
+    search.add_argument("--full", action="store_true", help="Re-tokenize everything and optimize")
+    search.add_argument("--index", choices=sorted(database.SEARCH_INDEXES))
+    search.set_defaults(func=cmd_rebuild_search)
+
+    cache = sub.add_parser("llm-cache", help="Show (or clear) the persistent LLM response cache")
+    cache.add_argument("--clear", action="store_true", help="Delete cached responses")
+    cache.add_argument("--task", help="Only this task, e.g. foundry.validate_code")
+    cache.set_defaults(func=cmd_llm_cache)
+
+    market = sub.add_parser("market-cache", help="Show (or clear) the market agent's cache")
+    market.add_argument("--clear", action="store_true", help="Delete cached entries")
+    market.add_argument("--tier", choices=["result", "search"])
+    market.set_defaults(func=cmd_market_cache)
+
+    pre = sub.add_parser("precompute", help="Run the off-peak market precompute now")
+    pre.add_argument("--stub", action="store_true", help="Stub Tavily and Groq; work on a copy of the database")
+    pre.add_argument("--limit", type=int, default=None, help="At most this many cohorts")
+    pre.add_argument("--concurrency", type=int, default=None)
+    pre.add_argument("--minutes", type=float, default=None, help="Time budget")
+    pre.set_defaults(func=cmd_precompute)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
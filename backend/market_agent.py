@@ -2,68 +2,109 @@ import os
 import json
 import urllib.parse
 import random
-from tavily import TavilyClient
+from tavily import TavilyClient, AsyncTavilyClient
 
-import datetime
+import job_index
+import llm
+import market_cache
+import singleflight
+
+# A cohort with the same role/skills missing the cache together runs one
+# search + synthesis; the others wait for it (see singleflight.py)
+_feeds_flight = singleflight.Group("market.live_feeds")
+_ticker_flight = singleflight.Group("market.stock_ticker")
+_jobs_flight = singleflight.Group("market.job_matches")
 
 class MarketAnalystAgent:
-    def __init__(self, grok_client):
+    def __init__(self, grok_client, async_client=None):
         self.grok = grok_client
+        self.async_grok = async_client or llm.get_async_client()
         self.tavily = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+        self.tavily_async = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
         self.model_id = "llama-3.3-70b-versatile"
-        # File-Based Persistent Cache
-        self.CACHE_FILE = "market_cache.json"
-        self.CACHE_DURATION = {
-            "feeds": 86400,   # 24 Hours
-            "ticker": 86400,  # 24 Hours
-            "jobs": 86400     # 24 Hours
-        }
-        self._load_cache()
-
-    def _load_cache(self):
-        if os.path.exists(self.CACHE_FILE):
-            try:
-                with open(self.CACHE_FILE, "r") as f:
-                    self.cache = json.load(f)
-            except:
-                self.cache = {}
-        else:
-            self.cache = {}
-
-    def _save_cache_to_disk(self):
-        try:
-            with open(self.CACHE_FILE, "w") as f:
-                json.dump(self.cache, f)
-        except Exception as e:
-            print(f"Failed to save cache: {e}")
 
     def _clean_json(self, text):
         return text.strip().replace("```json", "").replace("```", "")
 
-    def _get_from_cache(self, key, duration_type="feeds"):
-        if key in self.cache:
-            entry = self.cache[key]
-            # Handle string timestamps from JSON load
-            ts = entry["timestamp"]
-            if isinstance(ts, str):
-                last_update = datetime.datetime.fromisoformat(ts)
-            else:
-                last_update = ts
-            
-            elapsed = (datetime.datetime.now() - last_update).total_seconds()
-            if elapsed < self.CACHE_DURATION.get(duration_type, 86400):
-                print(f"[{key}] Serving from DISK cache (Age: {int(elapsed/3600)}h)")
-                return entry["data"]
-        return None
-
-    def _save_to_cache(self, key, data):
-        self.cache[key] = {
-            "data": data,
-            "timestamp": datetime.datetime.now().isoformat()
-        }
-        self._save_cache_to_disk()
-
-    def get_live_feeds(self, role, skills):
+    def _from_cache(self, key):
+        # Cache read as a step request, so async callers read on the DB executor
+        return llm.Call("market_cache.get", market_cache.get, market_cache.aget, key)
+
+    def _search(self, **kwargs):
+        # Tavily search as a step request (blocking or async depending on the driver)
+        return llm.Call("tavily.search", self.tavily.search, self.tavily_async.search, **kwargs)
+
+    def _cached_search(self, use_cache=True, **kwargs):
+        # Raw results are cached separately, so a failed synthesis retries without a new search
+        key = market_cache.search_key(**kwargs)
+        result = (yield self._from_cache(key)) if use_cache else None
+        if result is None:
+            result = yield self._search(**kwargs)
+            market_cache.put(key, "search", result)
+        return result
+
+    # Public methods serve a stale cache entry at once and refresh it in the
+    # background (see market_cache.py); allow_stale=False waits for fresh data.
+
+    def _serve(self, flight, key, step, allow_stale):
+        def compute():
+            return flight.do_sync(key, lambda: llm.run(step(), self.grok))
+
+        if allow_stale:
+            found = market_cache.entry(key)
+            if found:
+                market_cache.report(found)
+                if not found["fresh"]:
+                    market_cache.refresh_later(key, compute)
+                return found["data"]
+        return compute()
+
+    async def _aserve(self, flight, key, step, allow_stale):
+        async def compute():
+            return await flight.do(key, lambda: llm.arun(step(), self.async_grok))
+
+        if allow_stale:
+            found = await market_cache.aentry(key)
+            if found:
+                market_cache.report(found)
+                if not found["fresh"]:
+                    market_cache.refresh_later(key, compute)
+                return found["data"]
+        return await compute()
+
+    def get_live_feeds(self, role, skills, allow_stale=True):
+        key = market_cache.result_key("feeds", role, skills)
+        return self._serve(_feeds_flight, key, lambda: self._get_live_feeds(role, skills), allow_stale)
+
+    async def get_live_feeds_async(self, role, skills, allow_stale=True):
+        key = market_cache.result_key("feeds", role, skills)
+        return await self._aserve(_feeds_flight, key, lambda: self._get_live_feeds(role, skills), allow_stale)
+
+    def get_stock_ticker(self, allow_stale=True):
+        return self._serve(_ticker_flight, market_cache.result_key("ticker"), self._get_stock_ticker, allow_stale)
+
+    async def get_stock_ticker_async(self, allow_stale=True):
+        return await self._aserve(_ticker_flight, market_cache.result_key("ticker"), self._get_stock_ticker, allow_stale)
+
+    def find_job_matches(self, role, skills, allow_stale=True):
+        key = market_cache.result_key("jobs", role, skills)
+        return self._serve(_jobs_flight, key, lambda: self._find_job_matches(role, skills), allow_stale)
+
+    async def find_job_matches_async(self, role, skills, allow_stale=True):
+        key = market_cache.result_key("jobs", role, skills)
+        return await self._aserve(_jobs_flight, key, lambda: self._find_job_matches(role, skills), allow_stale)
+
+    async def refresh_async(self, kind, role=None, skills=None):
+        """Recomputes one entry ("feeds", "ticker" or "jobs") whatever is cached, e.g. for precompute.py."""
+        if kind == "ticker":
+            flight, step = _ticker_flight, lambda: self._get_stock_ticker(use_cache=False)
+        elif kind == "feeds":
+            flight, step = _feeds_flight, lambda: self._get_live_feeds(role, skills, use_cache=False)
+        else:
+            flight, step = _jobs_flight, lambda: self._find_job_matches(role, skills, use_cache=False)
+        return await flight.do(market_cache.result_key(kind, role, skills), lambda: llm.arun(step(), self.async_grok))
+
+    def _get_live_feeds(self, role, skills, use_cache=True):
         # Fallback if no role provided
         if not role:
              return {
@@ -71,16 +112,18 @@ class MarketAnalystAgent:
                 "hot_projects": ["CI/CD Pipeline", "AI Chatbot", "E-commerce API", "Portfolio Site"]
             }
 
-        cache_key = f"feeds_{role}_{skills}"
-        cached = self._get_from_cache(cache_key, "feeds")
-        if cached:
-            return cached
-
+        cache_key = market_cache.result_key("feeds", role, skills)
         try:
+            cached = (yield self._from_cache(cache_key)) if use_cache else None
+            if cached:
+                print(f"[{cache_key}] Serving from cache")
+                return cached
+
             # 1. Search for trends using Tavily
             # REAL SEARCH for 2025/2026 trends
-            query = f"trending job titles and specific technical project ideas for {role} {skills} late 2025 2026"
-            search_result = self.tavily.search(query=query, search_depth="basic")
+            # Canonical role/skills, so equivalent profiles share the cached search
+            query = f"trending job titles and specific technical project ideas for {market_cache.canonical_role(role)} {' '.join(market_cache.canonical_skills(skills))} late 2025 2026"
+            search_result = yield from self._cached_search(use_cache, query=query, search_depth="basic")
             context = search_result.get("results", [])
 
             # 2. Use Grok to synthesize trends from search data
@@ -95,15 +138,16 @@ class MarketAnalystAgent:
             Return ONLY valid JSON.
             """
             
-            response = self.grok.chat.completions.create(
-                model=self.model_id,
-                messages=[
+            content = yield {
+                "task": "market.live_feeds",
+                "model": self.model_id,
+                "messages": [
                     {"role": "system", "content": "You are a market analyst. Return JSON only."},
                     {"role": "user", "content": prompt}
                 ]
-            )
-            data = json.loads(self._clean_json(response.choices[0].message.content))
-            self._save_to_cache(cache_key, data)
+            }
+            data = json.loads(self._clean_json(content))
+            market_cache.put(cache_key, "feeds", data)
             return data
             
         except Exception as e:
@@ -114,16 +158,17 @@ class MarketAnalystAgent:
                  "hot_projects": ["AI-Powered Dashboard", "E-commerce Microservices", "Real-time Chat App", "Crypto Portfolio Tracker"]
             }
 
-    def get_stock_ticker(self):
-        cache_key = "ticker_global"
-        cached = self._get_from_cache(cache_key, "ticker")
-        if cached:
-            return cached
-
+    def _get_stock_ticker(self, use_cache=True):
+        cache_key = market_cache.result_key("ticker")
         try:
+            cached = (yield self._from_cache(cache_key)) if use_cache else None
+            if cached:
+                print(f"[{cache_key}] Serving from cache")
+                return cached
+
             # Scrape real data for top AI/Tech companies
             query = "current stock price and percentage change for NVIDIA, Microsoft, Google, Meta, Tesla, OpenAI valuation"
-            search_result = self.tavily.search(query=query, search_depth="basic")
+            search_result = yield from self._cached_search(use_cache, query=query, search_depth="basic")
             context = search_result.get("results", [])
             
             prompt = f"""
@@ -137,15 +182,16 @@ class MarketAnalystAgent:
             Return a JSON object: {{ "ticker": [ "item1", "item2" ... ] }}
             """
             
-            response = self.grok.chat.completions.create(
-                model=self.model_id,
-                messages=[
+            content = yield {
+                "task": "market.stock_ticker",
+                "model": self.model_id,
+                "messages": [
                     {"role": "system", "content": "You are a financial data parser. Return JSON only."},
                     {"role": "user", "content": prompt}
                 ]
-            )
-            data = json.loads(self._clean_json(response.choices[0].message.content))
-            self._save_to_cache(cache_key, data)
+            }
+            data = json.loads(self._clean_json(content))
+            market_cache.put(cache_key, "ticker", data)
             return data
         except Exception as e:
             print(f"Ticker Error: {e}")
@@ -159,20 +205,21 @@ class MarketAnalystAgent:
                 ]
             }
 
-    def find_job_matches(self, role, skills):
+    def _find_job_matches(self, role, skills, use_cache=True):
         if not role:
             return []
 
-        cache_key = f"jobs_{role}_{skills}"
-        cached = self._get_from_cache(cache_key, "jobs")
-        if cached:
-            return cached
-
+        cache_key = market_cache.result_key("jobs", role, skills)
         try:
+            cached = (yield self._from_cache(cache_key)) if use_cache else None
+            if cached:
+                print(f"[{cache_key}] Serving from cache")
+                return cached
+
             # 1. Perform a real search using Tavily
             # Targeted query for specific platforms (LinkedIn, Indeed)
-            query = f"latest {role} jobs {skills} (site:linkedin.com/jobs OR site:indeed.com) apply now"
-            search_result = self.tavily.search(query=query, search_depth="basic", max_results=15)
+            query = f"latest {market_cache.canonical_role(role)} jobs {' '.join(market_cache.canonical_skills(skills))} (site:linkedin.com/jobs OR site:indeed.com) apply now"
+            search_result = yield from self._cached_search(use_cache, query=query, search_depth="basic", max_results=15)
             # ... rest is same ...
             context = search_result.get("results", [])
 
@@ -192,8 +239,7 @@ class MarketAnalystAgent:
             - "location": Location
             - "salary": Salary range (estimate if not in text)
             - "type": Full-time / Contract
-            - "match_score": 75-98 (integer, based on skill match)
-            - "skills": List of 3-4 matching skills from snippet
+            - "skills": List of the skills and technologies the posting asks for (up to 8)
             - "description": 1 sentence summary
             - "posted": e.g. "2 days ago"
             - "applicants": integer count (estimate)
@@ -202,22 +248,24 @@ class MarketAnalystAgent:
             Return ONLY a JSON array of objects.
             """
 
-            response = self.grok.chat.completions.create(
-                model=self.model_id,
-                messages=[
+            content = yield {
+                "task": "market.job_matches",
+                "model": self.model_id,
+                "messages": [
                     {"role": "system", "content": "You are a job search assistant. Return JSON only."},
                     {"role": "user", "content": prompt}
                 ]
-            )
+            }
             
-            jobs = json.loads(self._clean_json(response.choices[0].message.content))
+            jobs = json.loads(self._clean_json(content))
             
             # Enrich with random logos if missing
             for job in jobs:
                 if 'logo' not in job:
                     job['logo'] = random.choice(["🚀", "💡", "🐍", "☁️", "🤖", "💻", "🔥", "✨"])
             
-            self._save_to_cache(cache_key, jobs)    
+            market_cache.put(cache_key, "jobs", jobs)
+            job_index.ingest(jobs, role)
             return jobs
 
         except Exception as e:
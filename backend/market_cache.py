@@ -0,0 +1,262 @@
+"""
+Cache store for the market agent (replaces market_cache.json).
+
+Entries live in the `market_cache` table, so each write is its own atomic
+upsert - safe with several workers - and nothing is held in process memory.
+Two tiers:
+
+- "result": what the agent returns (live feeds, ticker, job matches),
+- "search": raw Tavily responses, so a new synthesis (after a failed one, or
+  for another prompt over the same query) reuses the search instead of
+  spending another Tavily call.
+
+Keys are canonical: roles are case-folded with whitespace collapsed and
+skills are mapped to skill_taxonomy ids, de-duplicated and sorted, so
+["ReactJS", "python3"] and ["Python", "React"] share an entry. Each entry has its own TTL (TTLS,
+override with MARKET_CACHE_TTL="jobs=3600,search=43200"); expired entries are
+deleted, then the least recently used beyond MARKET_CACHE_MAX_ENTRIES, every
+EVICT_EVERY writes and on startup.
+
+Stale-while-revalidate: past its TTL an entry stays servable for MAX_STALE
+more (override with MARKET_CACHE_MAX_STALE). Serving it starts one
+background refresh per key (refresh_later) instead of making the caller wait;
+past MAX_STALE it is gone and the next caller computes inline. Endpoints
+report what they served with track():
+
+    with market_cache.track() as served:
+        data = await market.get_live_feeds_async(role, skills)
+    return served.apply(data)      # adds "freshness" and "age_seconds"
+
+    key = market_cache.result_key("jobs", role, skills)
+    data = market_cache.get(key)            # or await market_cache.aget(key)
+    market_cache.put(key, "jobs", data)
+"""
+import asyncio
+import contextvars
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import async_db
+import database
+import rate_limiter
+import skill_taxonomy
+import write_queue
+
+HOUR = 3600
+
+DEFAULT_TTLS = {
+    "feeds": 24 * HOUR,
+    "ticker": 24 * HOUR,
+    "jobs": 24 * HOUR,
+    "search": 24 * HOUR,
+}
+
+# How long past its TTL an entry may still be served while it refreshes
+DEFAULT_MAX_STALE = {
+    "feeds": 7 * 24 * HOUR,
+    "ticker": 12 * HOUR,
+    "jobs": 3 * 24 * HOUR,
+    "search": 0,
+}
+
+MARKET_CACHE_MAX_ENTRIES = int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "5000"))
+MARKET_CACHE_TOUCH_DELAY = float(os.getenv("MARKET_CACHE_TOUCH_DELAY_MS", "5000")) / 1000
+EVICT_EVERY = 50 # writes between eviction passes
+
+def _parse_seconds(spec):
+    ttls = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, ttl = item.partition("=")
+        try:
+            ttls[kind.strip()] = float(ttl)
+        except ValueError:
+            print(f"Market cache: ignoring bad setting '{item}'")
+    return ttls
+
+TTLS = {**DEFAULT_TTLS, **_parse_seconds(os.getenv("MARKET_CACHE_TTL", ""))}
+MAX_STALE = {**DEFAULT_MAX_STALE, **_parse_seconds(os.getenv("MARKET_CACHE_MAX_STALE", ""))}
+
+def _fold(text):
+    return re.sub(r"\s+", " ", str(text or "")).strip().casefold()
+
+def canonical_role(role):
+    return _fold(role)
+
+def canonical_skills(skills):
+    """Canonical skill ids (skill_taxonomy), sorted and de-duplicated; accepts a list or a comma-separated string."""
+    return skill_taxonomy.canonical_ids(skills)
+
+def result_key(kind, role=None, skills=None):
+    return f"result|{kind}|{canonical_role(role)}|{','.join(canonical_skills(skills))}"
+
+def search_key(**params):
+    """Key of a Tavily search: the case-folded query plus every other parameter."""
+    params = {**params, "query": _fold(params.get("query"))}
+    return "search|" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.writes = 0
+
+    def count(self, tier, outcome):
+        with self._lock:
+            counts = self.counts.setdefault(tier, {"hits": 0, "stale": 0, "misses": 0})
+            counts[outcome] += 1
+
+stats_counter = _Stats()
+
+def _tier(key):
+    return key.split("|", 1)[0]
+
+def _seen(key, entry, now):
+    if entry is None:
+        stats_counter.count(_tier(key), "misses")
+        return None
+    stats_counter.count(_tier(key), "hits" if entry["fresh"] else "stale")
+    write_queue.queue.submit(database.touch_market_cache_entry, key, now,
+                             key=("market_cache", key), delay=MARKET_CACHE_TOUCH_DELAY)
+    return entry
+
+def entry(key):
+    """The entry for `key`, fresh or stale (see get_market_cache_entry), or None."""
+    now = time.time()
+    return _seen(key, database.get_market_cache_entry(key, now), now)
+
+async def aentry(key):
+    """entry() with the read on the DB executor."""
+    now = time.time()
+    return _seen(key, await async_db.get_market_cache_entry(key, now), now)
+
+def get(key):
+    """Cached data for `key` if still fresh, else None."""
+    found = entry(key)
+    return found["data"] if found and found["fresh"] else None
+
+async def aget(key):
+    found = await aentry(key)
+    return found["data"] if found and found["fresh"] else None
+
+def put(key, kind, data, ttl=None):
+    """Queues `data` under `key` with the kind's TTL. Returns the write's future."""
+    ttl = TTLS.get(kind, DEFAULT_TTLS["jobs"]) if ttl is None else ttl
+    future = write_queue.queue.submit(database.put_market_cache_entry, key, _tier(key), kind, data, time.time(),
+                                      ttl, MAX_STALE.get(kind, 0))
+    with stats_counter._lock:
+        stats_counter.writes += 1
+        evict = stats_counter.writes % EVICT_EVERY == 0
+    if evict:
+        evict_now()
+    return future
+
+def evict_now():
+    """Queues an eviction pass (expired entries, then LRU beyond the bound)."""
+    return write_queue.queue.submit(database.evict_market_cache, MARKET_CACHE_MAX_ENTRIES, time.time(),
+                                    key=("market_cache", "evict"))
+
+# --- stale-while-revalidate ---
+
+_refreshing = set()
+_refresh_lock = threading.Lock()
+_tasks = set() # background refresh tasks in flight
+refreshes = {"started": 0, "failed": 0}
+
+def refresh_later(key, refresh):
+    """
+    Runs `refresh` in the background unless a refresh of `key` is already
+    running: a coroutine function as a task on the running loop, a plain
+    function in a thread. Runs at background priority, outside the caller's
+    request context. Returns whether it started one.
+    """
+    with _refresh_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+        refreshes["started"] += 1
+
+    def failed(e):
+        with _refresh_lock:
+            refreshes["failed"] += 1
+        # The stale value keeps being served; the next request tries again
+        print(f"Market refresh failed for {key}: {e}")
+
+    def finished():
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+    if inspect.iscoroutinefunction(refresh):
+        async def run():
+            try:
+                with rate_limiter.priority(rate_limiter.BACKGROUND):
+                    await refresh()
+            except Exception as e:
+                failed(e)
+            finally:
+                finished()
+
+        # The loop only keeps weak references to tasks; hold on to it until it is done
+        task = asyncio.get_running_loop().create_task(run(), context=contextvars.Context())
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    else:
+        def run():
+            try:
+                with rate_limiter.priority(rate_limiter.BACKGROUND):
+                    refresh()
+            except Exception as e:
+                failed(e)
+            finally:
+                finished()
+
+        threading.Thread(target=run, name="market-refresh", daemon=True).start()
+    return True
+
+class Served:
+    """What a request served: fresh unless any cached value it used was stale; age of the oldest."""
+    def __init__(self):
+        self.fresh = True
+        self.created_at = None
+
+    def saw(self, entry):
+        self.fresh = self.fresh and entry["fresh"]
+        if self.created_at is None or entry["created_at"] < self.created_at:
+            self.created_at = entry["created_at"]
+
+    def apply(self, result):
+        """`result` with "freshness" ("fresh"/"stale") and "age_seconds" added (dict results only)."""
+        if not isinstance(result, dict):
+            return result
+        age = 0 if self.created_at is None else max(int(time.time() - self.created_at), 0)
+        return {**result, "freshness": "fresh" if self.fresh else "stale", "age_seconds": age}
+
+_served = contextvars.ContextVar("market_served", default=None)
+
+@contextmanager
+def track():
+    """Collects what the market agent served inside the block (see Served)."""
+    served = Served()
+    token = _served.set(served)
+    try:
+        yield served
+    finally:
+        _served.reset(token)
+
+def report(entry):
+    """Records a cached value being served in the current request, if tracked."""
+    served = _served.get()
+    if served is not None:
+        served.saw(entry)
+
+def stats():
+    with stats_counter._lock:
+        requests = {tier: dict(counts) for tier, counts in stats_counter.counts.items()}
+    with _refresh_lock:
+        refreshing = {**refreshes, "running": len(_refreshing)}
+    return {"requests": requests, "refreshes": refreshing, "stored": database.get_market_cache_stats(),
+            "ttls": TTLS, "max_stale": MAX_STALE, "max_entries": MARKET_CACHE_MAX_ENTRIES}
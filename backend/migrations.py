@@ -0,0 +1,674 @@
+"""
+Versioned schema migrations for career_sapling.db.
+
+Each migration is a (version, name, apply) tuple. `migrate()` reads the
+highest applied version from `schema_version` and, only if something is
+pending, applies the remaining migrations in order inside one IMMEDIATE
+transaction. On an up-to-date database startup costs a single indexed read.
+
+To change the schema, append a new migration - never edit an applied one.
+"""
+import json
+import sqlite3
+
+def _columns(cursor, table):
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+
+def _add_column(cursor, table, column, decl):
+    """ALTER TABLE ... ADD COLUMN, skipped when the column already exists."""
+    if column not in _columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def _execute_script(cursor, script):
+    """
+    Runs a multi-statement script inside the migration's transaction
+    (executescript() would COMMIT first). Trigger bodies are kept whole.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \n;"):
+                cursor.execute(statement)
+            statement = ""
+    if statement.strip():
+        cursor.execute(statement)
+
+# --- MIGRATIONS ---
+
+def _baseline(cursor):
+    """
+    The schema previously assembled by init_db() on every import.
+    Databases created by older builds already have most of this; missing
+    columns are added so every install converges on the same shape.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            full_name TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            token TEXT PRIMARY KEY,
+            user_id INTEGER,
+            expires_at DATETIME,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role TEXT,
+            analysis_json TEXT,
+            projects_json TEXT,
+            job_matches_json TEXT,
+            job_matches_updated_at DATETIME,
+            active_projects_json TEXT,
+            current_phase INTEGER DEFAULT 0,
+            growth_stage TEXT DEFAULT 'Seed',
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    profile_columns = [
+        ("job_matches_json", "TEXT"),
+        ("job_matches_updated_at", "DATETIME"),
+        ("active_projects_json", "TEXT"),
+        ("full_name", "TEXT DEFAULT 'Cadet X'"),
+        ("email", "TEXT DEFAULT 'cadet.x@careerai.com'"),
+        ("location", "TEXT DEFAULT 'New York, USA'"),
+        ("avatar", "TEXT"),
+        ("bio", "TEXT DEFAULT 'Software Engineer'"),
+        ("user_id", "INTEGER REFERENCES users(id)"),
+    ]
+    for col, decl in profile_columns:
+        _add_column(cursor, "profiles", col, decl)
+
+    # Global projects table (one row per started project)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS projects (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            title TEXT,
+            data_json TEXT,
+            code_content TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+    _add_column(cursor, "projects", "code_content", "TEXT")
+    _add_column(cursor, "projects", "user_id", "INTEGER REFERENCES users(id)")
+
+    # Goals and activity were declared twice (user_id and profile_id variants).
+    # Existing databases ended up with both columns, so that is the canonical shape.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER,
+            user_id INTEGER,
+            text TEXT,
+            tag TEXT,
+            color TEXT,
+            is_done BOOLEAN DEFAULT 0,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(profile_id) REFERENCES profiles(id),
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+    _add_column(cursor, "user_goals", "profile_id", "INTEGER REFERENCES profiles(id)")
+    _add_column(cursor, "user_goals", "user_id", "INTEGER REFERENCES users(id)")
+    _add_column(cursor, "user_goals", "timestamp", "DATETIME")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_activity (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER,
+            user_id INTEGER,
+            date TEXT, -- YYYY-MM-DD
+            hours REAL,
+            level INTEGER,
+            FOREIGN KEY(profile_id) REFERENCES profiles(id),
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+    _add_column(cursor, "user_activity", "profile_id", "INTEGER REFERENCES profiles(id)")
+    _add_column(cursor, "user_activity", "user_id", "INTEGER REFERENCES users(id)")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            title TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+    _add_column(cursor, "chat_sessions", "user_id", "INTEGER REFERENCES users(id)")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            role TEXT,
+            content TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            category TEXT NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS community_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id INTEGER,
+            user_id INTEGER,
+            content TEXT,
+            type TEXT DEFAULT 'text',
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(channel_id) REFERENCES channels(id),
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Seed Default Channels
+    default_channels = [
+        ("general", "Community"),
+        ("frontend-devs", "Community"),
+        ("data-science", "Community"),
+        ("job-postings", "Career"),
+        ("code-review", "Dev")
+    ]
+    cursor.executemany("INSERT OR IGNORE INTO channels (name, category) VALUES (?, ?)", default_channels)
+
+def _hot_query_indexes(cursor):
+    """Composite indexes matching the WHERE + ORDER BY of the hot queries."""
+    indexes = [
+        # Latest profile per user / globally
+        "CREATE INDEX IF NOT EXISTS idx_profiles_user_timestamp ON profiles(user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_profiles_timestamp ON profiles(timestamp)",
+        # Workspace listing, newest first
+        "CREATE INDEX IF NOT EXISTS idx_projects_user_updated ON projects(user_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects(updated_at)",
+        # Chat history replay and session sidebar
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_created ON chat_sessions(user_id, created_at)",
+        # Community channel timeline
+        "CREATE INDEX IF NOT EXISTS idx_community_messages_channel_ts ON community_messages(channel_id, timestamp)",
+        # Session expiry sweeps
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)",
+        # Goals / activity heatmap
+        "CREATE INDEX IF NOT EXISTS idx_user_goals_profile ON user_goals(profile_id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_activity_user_date ON user_activity(user_id, date)",
+    ]
+    for statement in indexes:
+        cursor.execute(statement)
+
+def _normalize_json_blobs(cursor):
+    """
+    Splits the profile/project JSON blobs into child tables so readers can
+    fetch (and decode) only the parts they need. Existing rows are backfilled
+    and the moved data is removed from the blobs.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS profile_skills (
+            profile_id INTEGER NOT NULL,
+            kind TEXT NOT NULL, -- 'current' or 'gap'
+            position INTEGER NOT NULL,
+            skill TEXT NOT NULL,
+            PRIMARY KEY(profile_id, kind, position),
+            FOREIGN KEY(profile_id) REFERENCES profiles(id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Lab-generated project ideas shown on the dashboard
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS profile_projects (
+            profile_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            project_key TEXT,
+            title TEXT,
+            difficulty TEXT,
+            data_json TEXT,
+            PRIMARY KEY(profile_id, position),
+            FOREIGN KEY(profile_id) REFERENCES profiles(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_matches (
+            profile_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            title TEXT,
+            company TEXT,
+            link TEXT,
+            match_score INTEGER,
+            data_json TEXT,
+            PRIMARY KEY(profile_id, position),
+            FOREIGN KEY(profile_id) REFERENCES profiles(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS project_phases (
+            project_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            phase_id INTEGER,
+            title TEXT,
+            description TEXT,
+            tasks_json TEXT,
+            resources_json TEXT,
+            PRIMARY KEY(project_id, position),
+            FOREIGN KEY(project_id) REFERENCES projects(id)
+        )
+    ''')
+
+    # Scalar project fields become columns; data_json keeps any extra keys
+    for col, decl in [("tech_stack", "TEXT"), ("description", "TEXT"), ("current_phase", "INTEGER DEFAULT 1"),
+                      ("total_phases", "INTEGER"), ("started_at", "TEXT")]:
+        _add_column(cursor, "projects", col, decl)
+
+    # --- Backfill profiles ---
+    rows = cursor.execute("SELECT id, analysis_json, projects_json, job_matches_json FROM profiles").fetchall()
+    for profile_id, analysis_json, projects_json, job_matches_json in rows:
+        try:
+            analysis = json.loads(analysis_json) if analysis_json else {}
+        except ValueError:
+            analysis = None
+        if isinstance(analysis, dict):
+            for key, kind in (("current_skills", "current"), ("skill_gaps", "gap")):
+                skills = analysis.get(key)
+                if isinstance(skills, list) and all(isinstance(s, str) for s in skills):
+                    cursor.executemany("INSERT INTO profile_skills (profile_id, kind, position, skill) VALUES (?, ?, ?, ?)",
+                                       [(profile_id, kind, i, s) for i, s in enumerate(skills)])
+                    del analysis[key]
+            analysis_json = json.dumps(analysis)
+
+        try:
+            ideas = json.loads(projects_json) if projects_json else []
+        except ValueError:
+            ideas = []
+        cursor.executemany(
+            "INSERT INTO profile_projects (profile_id, position, project_key, title, difficulty, data_json) VALUES (?, ?, ?, ?, ?, ?)",
+            [(profile_id, i, p.get("id"), p.get("title"), p.get("difficulty"), json.dumps(p))
+             for i, p in enumerate(ideas) if isinstance(p, dict)])
+
+        try:
+            jobs = json.loads(job_matches_json) if job_matches_json else []
+        except ValueError:
+            jobs = []
+        cursor.executemany(
+            "INSERT INTO job_matches (profile_id, position, title, company, link, match_score, data_json) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(profile_id, i, j.get("title"), j.get("company"), j.get("link"), j.get("match_score"), json.dumps(j))
+             for i, j in enumerate(jobs) if isinstance(j, dict)])
+
+        cursor.execute("UPDATE profiles SET analysis_json = ?, projects_json = NULL, job_matches_json = NULL WHERE id = ?",
+                       (analysis_json, profile_id))
+
+    # --- Backfill projects ---
+    promoted = ("id", "title", "tech_stack", "description", "current_phase", "total_phases", "phases", "started_at")
+    rows = cursor.execute("SELECT id, data_json FROM projects").fetchall()
+    for project_id, data_json in rows:
+        try:
+            data = json.loads(data_json) if data_json else {}
+        except ValueError:
+            continue
+        phases = data.get("phases") or []
+        cursor.executemany(
+            "INSERT INTO project_phases (project_id, position, phase_id, title, description, tasks_json, resources_json) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(project_id, i, ph.get("id"), ph.get("title"), ph.get("description"), json.dumps(ph.get("tasks", [])),
+              json.dumps(ph["resources"]) if "resources" in ph else None)
+             for i, ph in enumerate(phases) if isinstance(ph, dict)])
+        extras = {k: v for k, v in data.items() if k not in promoted}
+        cursor.execute('''
+            UPDATE projects SET tech_stack = ?, description = ?, current_phase = ?, total_phases = ?, started_at = ?, data_json = ?
+            WHERE id = ?
+        ''', (data.get("tech_stack"), data.get("description"), data.get("current_phase", 1), data.get("total_phases"),
+              data.get("started_at"), json.dumps(extras), project_id))
+
+# Per-project contribution, shared by the backfill and database.verify_user_progress().
+# A project counts as complete once current_phase moves past its last phase;
+# missing phase data defaults to the standard 6-phase plan.
+PROGRESS_SQL = '''
+    SELECT COALESCE(user_id, 0) AS user_id,
+           COUNT(*) AS projects_started,
+           SUM(CASE WHEN COALESCE(NULLIF(current_phase, 0), 1) > COALESCE(NULLIF(phase_count, 0), 6) THEN 1 ELSE 0 END) AS projects_completed,
+           SUM(CASE WHEN COALESCE(NULLIF(current_phase, 0), 1) > COALESCE(NULLIF(phase_count, 0), 6)
+                    THEN COALESCE(NULLIF(phase_count, 0), 6)
+                    ELSE COALESCE(NULLIF(current_phase, 0), 1) - 1 END) AS completed_phases
+    FROM projects
+    GROUP BY COALESCE(user_id, 0)
+'''
+
+def _user_progress_counters(cursor):
+    """
+    Materialized per-user progress so growth/tree stats never rescan projects.
+    Projects without an owner are tracked under user_id 0.
+    """
+    _add_column(cursor, "projects", "phase_count", "INTEGER DEFAULT 0")
+    cursor.execute('''
+        UPDATE projects SET phase_count = (SELECT COUNT(*) FROM project_phases ph WHERE ph.project_id = projects.id)
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_progress (
+            user_id INTEGER PRIMARY KEY,
+            projects_started INTEGER NOT NULL DEFAULT 0,
+            projects_completed INTEGER NOT NULL DEFAULT 0,
+            completed_phases INTEGER NOT NULL DEFAULT 0,
+            -- Trees = completed projects + every 6 completed phases
+            trees INTEGER GENERATED ALWAYS AS (projects_completed + completed_phases / 6) VIRTUAL
+        )
+    ''')
+    cursor.execute("DELETE FROM user_progress")
+    cursor.execute(f'''
+        INSERT INTO user_progress (user_id, projects_started, projects_completed, completed_phases)
+        {PROGRESS_SQL}
+    ''')
+
+def _community_keyset_index(cursor):
+    """Message history pages by (channel_id, id) cursors instead of timestamps."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_community_messages_channel_id ON community_messages(channel_id, id)")
+    cursor.execute("DROP INDEX IF EXISTS idx_community_messages_channel_ts")
+
+def _search_index(cursor):
+    """
+    FTS5 full-text search over chat history, community channels and projects.
+    The indexes are external-content tables (no second copy of the text) kept
+    in sync by triggers. Chat and project documents carry an `owner` token
+    ('u<user_id>') so per-user queries are an index intersection, not a filter.
+    """
+    _execute_script(cursor, '''
+        -- Chat: message text + owning user (via the session)
+        CREATE VIEW IF NOT EXISTS chat_search_source AS
+            SELECT m.id, m.content, 'u' || s.user_id AS owner
+            FROM chat_messages m LEFT JOIN chat_sessions s ON s.id = m.session_id;
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS chat_fts USING fts5(
+            content, owner, content='chat_search_source', content_rowid='id',
+            tokenize='porter unicode61', prefix='2 3');
+        INSERT INTO chat_fts(chat_fts, rank) VALUES('rank', 'bm25(1.0, 0.0)');
+
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ai AFTER INSERT ON chat_messages BEGIN
+            INSERT INTO chat_fts(rowid, content, owner) SELECT id, content, owner FROM chat_search_source WHERE id = new.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_bd BEFORE DELETE ON chat_messages BEGIN
+            INSERT INTO chat_fts(chat_fts, rowid, content, owner)
+                SELECT 'delete', id, content, owner FROM chat_search_source WHERE id = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_bu BEFORE UPDATE OF content, session_id ON chat_messages BEGIN
+            INSERT INTO chat_fts(chat_fts, rowid, content, owner)
+                SELECT 'delete', id, content, owner FROM chat_search_source WHERE id = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_au AFTER UPDATE OF content, session_id ON chat_messages BEGIN
+            INSERT INTO chat_fts(rowid, content, owner) SELECT id, content, owner FROM chat_search_source WHERE id = new.id;
+        END;
+
+        -- Community: channels are public, so the table itself is the content
+        CREATE VIRTUAL TABLE IF NOT EXISTS community_fts USING fts5(
+            content, content='community_messages', content_rowid='id',
+            tokenize='porter unicode61', prefix='2 3');
+
+        CREATE TRIGGER IF NOT EXISTS community_messages_fts_ai AFTER INSERT ON community_messages BEGIN
+            INSERT INTO community_fts(rowid, content) VALUES (new.id, new.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS community_messages_fts_ad AFTER DELETE ON community_messages BEGIN
+            INSERT INTO community_fts(community_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS community_messages_fts_au AFTER UPDATE OF content ON community_messages BEGIN
+            INSERT INTO community_fts(community_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO community_fts(rowid, content) VALUES (new.id, new.content);
+        END;
+
+        -- Projects: title, description, stack and every phase's title/tasks
+        CREATE VIEW IF NOT EXISTS project_search_source AS
+            SELECT p.rowid AS rid, p.title, p.description, p.tech_stack,
+                   -- tasks_json is a list of strings; strip the JSON punctuation for readable snippets
+                   -- (json_each() in this view makes FTS5's 'rebuild' fail)
+                   (SELECT group_concat(COALESCE(ph.title, '') || ': ' || COALESCE(ph.description, '') || ' '
+                                        || replace(replace(replace(COALESCE(ph.tasks_json, ''), '", "', ', '), '["', ''), '"]', ''), ' | ')
+                    FROM project_phases ph WHERE ph.project_id = p.id) AS phases,
+                   'u' || p.user_id AS owner
+            FROM projects p;
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS project_fts USING fts5(
+            title, description, tech_stack, phases, owner, content='project_search_source', content_rowid='rid',
+            tokenize='porter unicode61', prefix='2 3');
+        INSERT INTO project_fts(project_fts, rank) VALUES('rank', 'bm25(10.0, 3.0, 3.0, 1.0, 0.0)');
+
+        CREATE TRIGGER IF NOT EXISTS projects_fts_ai AFTER INSERT ON projects BEGIN
+            INSERT INTO project_fts(rowid, title, description, tech_stack, phases, owner)
+                SELECT rid, title, description, tech_stack, phases, owner FROM project_search_source WHERE rid = new.rowid;
+        END;
+        CREATE TRIGGER IF NOT EXISTS projects_fts_bu BEFORE UPDATE OF title, description, tech_stack, user_id ON projects BEGIN
+            INSERT INTO project_fts(project_fts, rowid, title, description, tech_stack, phases, owner)
+                SELECT 'delete', rid, title, description, tech_stack, phases, owner FROM project_search_source WHERE rid = old.rowid;
+        END;
+        CREATE TRIGGER IF NOT EXISTS projects_fts_au AFTER UPDATE OF title, description, tech_stack, user_id ON projects BEGIN
+            INSERT INTO project_fts(rowid, title, description, tech_stack, phases, owner)
+                SELECT rid, title, description, tech_stack, phases, owner FROM project_search_source WHERE rid = new.rowid;
+        END;
+        CREATE TRIGGER IF NOT EXISTS projects_fts_bd BEFORE DELETE ON projects BEGIN
+            INSERT INTO project_fts(project_fts, rowid, title, description, tech_stack, phases, owner)
+                SELECT 'delete', rid, title, description, tech_stack, phases, owner FROM project_search_source WHERE rid = old.rowid;
+        END;
+    ''')
+
+    # Phase rows change the project's document: drop it before, re-add after
+    for event, ref in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+        name = event.lower()
+        _execute_script(cursor, f'''
+            CREATE TRIGGER IF NOT EXISTS project_phases_fts_b{name[0]} BEFORE {event} ON project_phases BEGIN
+                INSERT INTO project_fts(project_fts, rowid, title, description, tech_stack, phases, owner)
+                    SELECT 'delete', rid, title, description, tech_stack, phases, owner FROM project_search_source
+                    WHERE rid = (SELECT rowid FROM projects WHERE id = {ref}.project_id);
+            END;
+            CREATE TRIGGER IF NOT EXISTS project_phases_fts_a{name[0]} AFTER {event} ON project_phases BEGIN
+                INSERT INTO project_fts(rowid, title, description, tech_stack, phases, owner)
+                    SELECT rid, title, description, tech_stack, phases, owner FROM project_search_source
+                    WHERE rid = (SELECT rowid FROM projects WHERE id = {ref}.project_id);
+            END;
+        ''')
+
+    for table in ("chat_fts", "community_fts", "project_fts"):
+        cursor.execute(f"INSERT INTO {table}({table}) VALUES('rebuild')")
+
+def _llm_cache(cursor):
+    """Completions cached by llm_cache.py, keyed by a hash of the request."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            task TEXT,
+            model TEXT,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_task ON llm_cache(task)")
+
+def _jobs(cursor):
+    """Background jobs (jobs.py): queued work survives a restart."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            kind TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'queued',
+            payload TEXT,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            idempotency_key TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at) WHERE finished_at IS NOT NULL")
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency ON jobs(user_id, idempotency_key)
+        WHERE idempotency_key IS NOT NULL
+    ''')
+
+def _chat_memory(cursor):
+    """Rolling per-session summary for chat_memory.py: older turns live here, not in the prompt."""
+    _add_column(cursor, "chat_sessions", "summary", "TEXT")
+    # id of the last chat_messages row folded into the summary
+    _add_column(cursor, "chat_sessions", "summarized_through", "INTEGER NOT NULL DEFAULT 0")
+
+def _market_cache(cursor):
+    """market_cache.py: market agent results and raw Tavily searches (replaces market_cache.json)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS market_cache (
+            key TEXT PRIMARY KEY,
+            tier TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_market_cache_last_used ON market_cache(last_used_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_market_cache_expires ON market_cache(expires_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_market_cache_tier ON market_cache(tier, kind)")
+
+def _market_cache_stale(cursor):
+    """Stale-while-revalidate: entries are fresh until fresh_until, servable (stale) until expires_at."""
+    _add_column(cursor, "market_cache", "fresh_until", "REAL NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE market_cache SET fresh_until = expires_at")
+
+def _precompute_runs(cursor):
+    """Run log of precompute.py: one row per run, one per cohort it handled."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS precompute_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            slot TEXT NOT NULL UNIQUE,
+            trigger TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            started_at REAL NOT NULL,
+            finished_at REAL,
+            cohorts INTEGER NOT NULL DEFAULT 0,
+            computed INTEGER NOT NULL DEFAULT 0,
+            degraded INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            seconds REAL,
+            error TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS precompute_cohorts (
+            run_id INTEGER NOT NULL REFERENCES precompute_runs(id),
+            role TEXT NOT NULL,
+            skills TEXT NOT NULL,
+            profiles INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            seconds REAL,
+            error TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_precompute_cohorts_run ON precompute_cohorts(run_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_precompute_runs_started ON precompute_runs(started_at)")
+
+def _job_index(cursor):
+    """job_index.py: every scraped job posting, deduplicated by link, with a skill -> posting inverted index."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_postings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            link TEXT NOT NULL UNIQUE,
+            role TEXT NOT NULL,
+            title TEXT,
+            company TEXT,
+            data_json TEXT NOT NULL,
+            first_seen_at REAL NOT NULL,
+            last_seen_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_posting_skills (
+            skill TEXT NOT NULL,
+            job_id INTEGER NOT NULL REFERENCES job_postings(id),
+            PRIMARY KEY (skill, job_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_postings_role ON job_postings(role, last_seen_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_postings_seen ON job_postings(last_seen_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_posting_skills_job ON job_posting_skills(job_id)")
+
+MIGRATIONS = [
+    (1, "baseline", _baseline),
+    (2, "hot_query_indexes", _hot_query_indexes),
+    (3, "normalize_json_blobs", _normalize_json_blobs),
+    (4, "user_progress_counters", _user_progress_counters),
+    (5, "community_keyset_index", _community_keyset_index),
+    (6, "search_index", _search_index),
+    (7, "llm_cache", _llm_cache),
+    (8, "jobs", _jobs),
+    (9, "chat_memory", _chat_memory),
+    (10, "market_cache", _market_cache),
+    (11, "market_cache_stale", _market_cache_stale),
+    (12, "precompute_runs", _precompute_runs),
+    (13, "job_index", _job_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# --- RUNNER ---
+
+def current_version(conn):
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0 # Fresh or pre-migration database
+    return row[0] or 0
+
+def migrate(conn):
+    """Applies pending migrations. Returns the resulting schema version."""
+    if current_version(conn) >= LATEST_VERSION:
+        return LATEST_VERSION
+
+    # IMMEDIATE takes the write lock up front so concurrent workers queue here
+    # and re-check the version instead of applying the same migration twice.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        version = current_version(conn)
+        cursor = conn.cursor()
+        for number, name, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            print(f"Applying migration {number:03d}_{name}")
+            apply(cursor)
+            cursor.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (number, name))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return LATEST_VERSION
@@ -1,18 +1,33 @@
-import os
 import json
-from openai import OpenAI
+
+import llm
 
 class MirrorAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GROQ_API_KEY")
-        # Initialize OpenAI client for Groq Cloud
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.groq.com/openai/v1"
-        )
+    def __init__(self, client=None, async_client=None):
+        # Shared Groq Cloud clients (OpenAI-compatible), see llm.py
+        self.client = client or llm.get_client()
+        self.async_client = async_client or llm.get_async_client()
         self.model_id = "llama-3.3-70b-versatile"
 
     def analyze_resume(self, text, target_role):
+        return llm.run(self._analyze_resume(text, target_role), self.client)
+
+    async def analyze_resume_async(self, text, target_role):
+        return await llm.arun(self._analyze_resume(text, target_role), self.async_client)
+
+    def analyze_image_resume(self, base64_image, target_role):
+        return llm.run(self._analyze_image_resume(base64_image, target_role), self.client)
+
+    async def analyze_image_resume_async(self, base64_image, target_role):
+        return await llm.arun(self._analyze_image_resume(base64_image, target_role), self.async_client)
+
+    def generate_project_phases(self, project_title, tech_stack):
+        return llm.run(self._generate_project_phases(project_title, tech_stack), self.client)
+
+    async def generate_project_phases_async(self, project_title, tech_stack):
+        return await llm.arun(self._generate_project_phases(project_title, tech_stack), self.async_client)
+
+    def _analyze_resume(self, text, target_role):
         # If content starts with Vision Tag, handle differently? 
         # Actually logic is handled by caller.
         prompt = f"""
@@ -32,16 +47,16 @@ class MirrorAgent:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_id,
-                messages=[
+            content = yield {
+                "task": "mirror.analyze_resume",
+                "model": self.model_id,
+                "messages": [
                     {"role": "system", "content": "You are an expert career coach and resume analyzer. Return JSON only."},
                     {"role": "user", "content": prompt}
                 ]
-            )
+            }
             
             # Scrubbing and parsing
-            content = response.choices[0].message.content
             raw_data = content.strip().replace("```json", "").replace("```", "")
             return json.loads(raw_data)
         except Exception as e:
@@ -56,7 +71,7 @@ class MirrorAgent:
                 "growth_stage": "Sprout"
             }
 
-    def analyze_image_resume(self, base64_image, target_role):
+    def _analyze_image_resume(self, base64_image, target_role):
         """Uses Llama Vision to analyze an image-based resume"""
         print("Using Vision Model for Resume Analysis...")
         prompt = f"""
@@ -73,10 +88,11 @@ class MirrorAgent:
         """
         
         try:
-            response = self.client.chat.completions.create(
+            content = yield {
+                "task": "mirror.analyze_image_resume",
                 # Switch to Llama 4 Maverick (Newest Multimodal)
-                model="meta-llama/llama-4-maverick-17b-128e-instruct",
-                messages=[
+                "model": "meta-llama/llama-4-maverick-17b-128e-instruct",
+                "messages": [
                     {
                         "role": "user",
                         "content": [
@@ -90,17 +106,16 @@ class MirrorAgent:
                         ]
                     }
                 ],
-                response_format={"type": "json_object"}
-            )
+                "response_format": {"type": "json_object"}
+            }
             
-            content = response.choices[0].message.content
             # Vision models can be chatty, ensure JSON
             return json.loads(content)
         except Exception as e:
             print(f"Vision Analysis Error: {e}")
-            return self.analyze_resume("FALLBACK TEXT", target_role) # Fallback to text mock
+            return (yield from self._analyze_resume("FALLBACK TEXT", target_role)) # Fallback to text mock
     
-    def generate_project_phases(self, project_title, tech_stack):
+    def _generate_project_phases(self, project_title, tech_stack):
         prompt = f"""
         Project: "{project_title}" using {tech_stack}.
         Break this project down into exactly 6 distinct, progressive phases.
@@ -117,15 +132,15 @@ class MirrorAgent:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_id,
-                messages=[
+            content = yield {
+                "task": "mirror.generate_project_phases",
+                "model": self.model_id,
+                "messages": [
                     {"role": "system", "content": "You are a technical project manager. Return JSON only."},
                     {"role": "user", "content": prompt}
                 ]
-            )
+            }
             # Scrubbing and parsing
-            content = response.choices[0].message.content
             text = content.strip().replace("```json", "").replace("```", "")
             return json.loads(text)
         except Exception as e:
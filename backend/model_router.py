@@ -0,0 +1,167 @@
+"""
+Per-task model routing.
+
+Each agent task declares a tier and the shape of the JSON it must return
+(TASKS). "small" tasks - structured extraction such as turning search results
+into ticker strings or job listings - go to a fast 8B model first; if its
+answer does not parse or does not match the schema (or the call fails), the
+request is escalated to the large model. "large" tasks go straight to the
+large model, and "vision" tasks keep the model they ask for.
+
+    LLM_MODEL_SMALL=llama-3.1-8b-instant
+    LLM_MODEL_LARGE=llama-3.3-70b-versatile
+    LLM_ROUTES="market.stock_ticker=large,lab.generate_projects=small"
+    LLM_ROUTING=0                       # everything keeps the model it asks for
+
+A schema is a JSON skeleton: a dict lists the keys that must be present
+(extra keys are fine), a one-item list means a non-empty list of that shape,
+and str/int/bool/dict/list check the type.
+
+Latency, tokens and escalations are counted per task and model; stats()
+includes an estimate of what the small tier saved over running everything on
+the large model.
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+
+TIERS = {
+    "small": os.getenv("LLM_MODEL_SMALL", "llama-3.1-8b-instant"),
+    "large": os.getenv("LLM_MODEL_LARGE", "llama-3.3-70b-versatile"),
+}
+
+TASKS = {
+    "market.stock_ticker": {"tier": "small", "schema": {"ticker": [str]}},
+    "market.job_matches": {"tier": "small", "schema": [{"title": str, "company": str, "link": str}]},
+    "market.live_feeds": {"tier": "small", "schema": {"hot_jobs": [str], "hot_projects": [str]}},
+    "foundry.validate_code": {"tier": "small", "schema": {"output": str, "review": str}},
+    "foundry.chat_architect": {"tier": "large", "schema": None},
+    "foundry.verify_screenshot": {"tier": "vision", "schema": {"approved": bool, "feedback": str}},
+    "mirror.career_chat": {"tier": "large", "schema": None},
+    "mirror.chat_summary": {"tier": "small", "schema": None},
+    "mirror.analyze_resume": {"tier": "large", "schema": {"current_skills": [str], "skill_gaps": list, "growth_stage": str}},
+    "mirror.analyze_image_resume": {"tier": "vision", "schema": {"current_skills": [str], "skill_gaps": list}},
+    "mirror.generate_project_phases": {"tier": "large", "schema": [{"title": str, "tasks": [str]}]},
+    "lab.generate_projects": {"tier": "large", "schema": dict},
+    "resume.generate_resume_content": {"tier": "large", "schema": {"summary": str, "skills_section": list}},
+}
+
+# USD per million tokens (prompt, completion), for the savings estimate only
+PRICES = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+
+LLM_ROUTING = os.getenv("LLM_ROUTING", "1") != "0"
+
+def _parse_routes(spec):
+    routes = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        task, _, tier = item.partition("=")
+        if tier.strip() in TIERS or tier.strip() == "vision":
+            routes[task.strip()] = tier.strip()
+        else:
+            print(f"Model router: ignoring bad route '{item}'")
+    return routes
+
+ROUTES = _parse_routes(os.getenv("LLM_ROUTES", ""))
+
+def tier_for(task):
+    if task in ROUTES:
+        return ROUTES[task]
+    return TASKS.get(task, {}).get("tier")
+
+def plan(request):
+    """
+    (first, escalation): the request to send first, with its model chosen by
+    the task's tier, and the large-model request to retry with if the first
+    answer is rejected - or None when there is nothing to escalate to.
+    """
+    tier = tier_for(request.get("task")) if LLM_ROUTING else None
+    if tier not in TIERS:
+        return request, None
+    first = {**request, "model": TIERS[tier]}
+    if tier == "large" or TIERS["large"] == first["model"]:
+        return first, None
+    return first, {**request, "model": TIERS["large"]}
+
+def _matches(value, schema):
+    if isinstance(schema, dict):
+        return isinstance(value, dict) and all(k in value and _matches(value[k], s) for k, s in schema.items())
+    if isinstance(schema, list):
+        return isinstance(value, list) and len(value) > 0 and all(_matches(v, schema[0]) for v in value)
+    if schema is int:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, schema)
+
+def accepts(request, content):
+    """Whether `content` is a usable answer for the request's task (always True without a schema)."""
+    schema = TASKS.get(request.get("task"), {}).get("schema")
+    if schema is None:
+        return True
+    if content is None:
+        return False
+    try:
+        value = json.loads(content.strip().replace("```json", "").replace("```", ""))
+    except ValueError:
+        return False
+    return _matches(value, schema)
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (task, model) -> counters
+        self.calls = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+        self.escalations = defaultdict(lambda: {"schema": 0, "error": 0})
+
+    def observe(self, request, seconds, usage):
+        with self._lock:
+            entry = self.calls[(request.get("task"), request.get("model"))]
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            entry["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def escalated(self, request, reason):
+        with self._lock:
+            self.escalations[request.get("task")][reason] += 1
+
+    def snapshot(self):
+        large = TIERS["large"]
+        tasks = {}
+        saved = 0.0
+        with self._lock:
+            for (task, model), entry in self.calls.items():
+                row = tasks.setdefault(task, {"models": {}, "escalations": dict(self.escalations.get(task, {}))})
+                row["models"][model] = {
+                    **entry,
+                    "seconds": round(entry["seconds"], 2),
+                    "avg_latency": round(entry["seconds"] / entry["calls"], 3) if entry["calls"] else None,
+                }
+                if model != large and model in PRICES and large in PRICES:
+                    # What these tokens would have cost on the large model, minus what they did cost
+                    for price_large, price_small, tokens in zip(PRICES[large], PRICES[model],
+                                                                (entry["prompt_tokens"], entry["completion_tokens"])):
+                        saved += tokens * (price_large - price_small) / 1e6
+            # Escalated calls paid for both models: their small-model tokens bought nothing
+            for task, row in tasks.items():
+                small = row["models"].get(TIERS["small"])
+                escalated = row["escalations"].get("schema", 0) # failed calls used no tokens
+                if small and escalated and small["calls"]:
+                    share = escalated / small["calls"]
+                    saved -= share * sum(t * p / 1e6 for t, p in zip(
+                        (small["prompt_tokens"], small["completion_tokens"]), PRICES.get(large, (0, 0))))
+        return {"enabled": LLM_ROUTING, "tiers": TIERS, "routes": {t: tier_for(t) for t in TASKS},
+                "tasks": tasks, "estimated_savings_usd": round(saved, 4)}
+
+stats_counter = _Stats()
+
+def observe(request, seconds, usage):
+    stats_counter.observe(request, seconds, usage)
+
+def escalated(request, reason):
+    stats_counter.escalated(request, reason)
+
+def stats():
+    return stats_counter.snapshot()
@@ -0,0 +1,229 @@
+"""
+Off-peak market precompute (the README's "Daily Scraper").
+
+Once a day at PRECOMPUTE_AT (local time, "HH:MM"; empty disables it) the
+server groups every user's latest profile into cohorts - same canonical role
+and skill set, i.e. the same market_cache keys - and recomputes job matches
+and live feeds once per cohort, plus the ticker once. Daytime requests for
+those users are then plain cache reads.
+
+Budget: PRECOMPUTE_CONCURRENCY cohorts at a time, the PRECOMPUTE_MAX_COHORTS
+largest cohorts, PRECOMPUTE_MAX_MINUTES in total, and the run stops after
+PRECOMPUTE_MAX_FAILURES failed or degraded cohorts (a dependency is down -
+the breakers and the stale entries cover the day). LLM calls run at
+background priority. Whatever is left over is logged as skipped.
+
+Every run is logged in precompute_runs / precompute_cohorts with per-cohort
+timing. With several workers, each day's slot is claimed in the database, so
+only one process runs it.
+
+    python manage.py precompute [--stub] [--limit N] [--concurrency N]
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import async_db
+import circuit_breaker
+import database
+import job_index
+import market_cache
+import rate_limiter
+
+PRECOMPUTE_AT = os.getenv("PRECOMPUTE_AT", "03:00")
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))
+PRECOMPUTE_MAX_COHORTS = int(os.getenv("PRECOMPUTE_MAX_COHORTS", "200"))
+PRECOMPUTE_MAX_MINUTES = float(os.getenv("PRECOMPUTE_MAX_MINUTES", "60"))
+PRECOMPUTE_MAX_FAILURES = int(os.getenv("PRECOMPUTE_MAX_FAILURES", "10"))
+
+def cohorts(profiles):
+    """[(role, skills, profile count)] by canonical (role, skills), largest first."""
+    grouped = {}
+    for role, skills in profiles:
+        if not role:
+            continue
+        key = (market_cache.canonical_role(role), market_cache.canonical_skills(skills))
+        if key in grouped:
+            grouped[key][2] += 1
+        else:
+            grouped[key] = [role, list(skills), 1] # the first profile's spelling goes into the prompts
+    return sorted((tuple(c) for c in grouped.values()), key=lambda c: c[2], reverse=True)
+
+async def _cohort(market, role, skills):
+    """Recomputes one cohort's entries. Returns "ok", or "degraded" if a fallback was produced (not cached)."""
+    with circuit_breaker.track() as health:
+        await market.refresh_async("jobs", role, skills)
+        await market.refresh_async("feeds", role, skills)
+    return "degraded" if health.degraded else "ok"
+
+async def run(market, trigger="manual", slot=None, limit=PRECOMPUTE_MAX_COHORTS,
+              concurrency=PRECOMPUTE_CONCURRENCY, max_minutes=PRECOMPUTE_MAX_MINUTES):
+    """
+    One precompute run. Returns the finished run-log row, or None if `slot`
+    was already claimed (by default every manual run gets its own slot).
+    """
+    started = time.time()
+    slot = slot or f"{trigger}-{started:.6f}"
+    run_id = await async_db.claim_precompute_run(slot, trigger, started)
+    if run_id is None:
+        return None
+
+    counts = {"cohorts": 0, "computed": 0, "degraded": 0, "failed": 0, "skipped": 0}
+    status, error = "done", None
+    deadline = time.monotonic() + max_minutes * 60
+    try:
+        purged = await async_db.run(job_index.purge)
+        if purged:
+            print(f"Job index: purged {purged} old posting(s)")
+        todo = cohorts(await async_db.get_precompute_profiles())
+        counts["cohorts"] = len(todo)
+        print(f"Precompute run {run_id} ({trigger}): {len(todo)} cohort(s)")
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def one(position, role, skills, profiles):
+            async with semaphore:
+                skill_text = ",".join(market_cache.canonical_skills(skills))
+                reason = None
+                if position >= limit:
+                    reason = "cohort limit"
+                elif time.monotonic() > deadline:
+                    reason = "time limit"
+                elif counts["failed"] + counts["degraded"] >= PRECOMPUTE_MAX_FAILURES:
+                    reason = "too many failures"
+                if reason:
+                    counts["skipped"] += 1
+                    await async_db.record_precompute_cohort(run_id, role, skill_text, profiles, "skipped", None, reason)
+                    return
+                t = time.monotonic()
+                try:
+                    outcome, problem = await _cohort(market, role, skills), None
+                except Exception as e:
+                    outcome, problem = "failed", str(e)
+                seconds = time.monotonic() - t
+                counts["computed" if outcome == "ok" else outcome] += 1
+                await async_db.record_precompute_cohort(run_id, role, skill_text, profiles, outcome, seconds, problem)
+                print(f"  {role} [{skill_text}] ({profiles} profile(s)): {outcome} in {seconds:.1f}s")
+
+        with rate_limiter.priority(rate_limiter.BACKGROUND):
+            await market.refresh_async("ticker")
+            await asyncio.gather(*(one(i, *cohort) for i, cohort in enumerate(todo)))
+    except Exception as e:
+        status, error = "failed", str(e)
+        print(f"Precompute run {run_id} failed: {e}")
+
+    seconds = time.time() - started
+    await async_db.finish_precompute_run(run_id, status, counts, time.time(), seconds, error)
+    print(f"Precompute run {run_id} {status} in {seconds:.1f}s: {counts}")
+    return (await async_db.get_precompute_runs(1))[0]
+
+# --- schedule ---
+
+def next_run_at(now=None):
+    """Next PRECOMPUTE_AT as a local datetime, or None when scheduling is off."""
+    if not PRECOMPUTE_AT:
+        return None
+    hour, _, minute = PRECOMPUTE_AT.partition(":")
+    now = now or datetime.now()
+    at = now.replace(hour=int(hour), minute=int(minute or 0), second=0, microsecond=0)
+    return at if at > now else at + timedelta(days=1)
+
+async def scheduler(market):
+    """Runs the daily precompute forever. Start once, on startup."""
+    while True:
+        at = next_run_at()
+        if at is None:
+            return
+        await asyncio.sleep(max((at - datetime.now()).total_seconds(), 0))
+        try:
+            await run(market, trigger="scheduled", slot=f"scheduled-{at:%Y-%m-%d}")
+        except Exception as e:
+            print(f"Precompute scheduler: {e}")
+        await asyncio.sleep(60) # past the minute, so the same slot is not picked again
+
+_task = None
+
+def start(market):
+    global _task
+    if _task is None and PRECOMPUTE_AT:
+        _task = asyncio.create_task(scheduler(market), name="market-precompute")
+        print(f"Market precompute scheduled daily at {PRECOMPUTE_AT}")
+
+# --- stubs for manual runs ---
+# `manage.py precompute --stub` runs the whole pipeline (router, limiter,
+# breakers, caches, run log) on a copy of the database without calling
+# Tavily or Groq.
+
+STUB_DELAY = float(os.getenv("PRECOMPUTE_STUB_DELAY_MS", "50")) / 1000
+
+def _stub_search(query):
+    return {"query": query, "results": [{"title": f"Result for {query}", "url": "https://example.com/jobs/1",
+                                         "content": "Stub search result"}]}
+
+class StubTavily:
+    def search(self, query, **kwargs):
+        time.sleep(STUB_DELAY)
+        return _stub_search(query)
+
+class AsyncStubTavily:
+    async def search(self, query, **kwargs):
+        await asyncio.sleep(STUB_DELAY)
+        return _stub_search(query)
+
+def _stub_reply(messages):
+    system = messages[0]["content"] if messages else ""
+    if "financial" in system:
+        content = {"ticker": ["Stub Corp (STUB) ▲ +1.0%"]}
+    elif "job search" in system:
+        content = [{"title": "Stub Engineer", "company": "Stub Inc", "location": "Remote", "salary": "$100k",
+                    "type": "Full-time", "match_score": 90, "skills": ["Python"], "description": "Stub listing.",
+                    "posted": "today", "applicants": 1, "link": "https://example.com/jobs/1"}]
+    else:
+        content = {"hot_jobs": ["Stub Job"], "hot_projects": ["Stub Project"]}
+    text = json.dumps(content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+                           usage=SimpleNamespace(prompt_tokens=len(json.dumps(messages)) // 4,
+                                                 completion_tokens=len(text) // 4))
+
+class StubGroq:
+    """Quacks like the OpenAI client for chat.completions.create (blocking)."""
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages=(), **kwargs):
+        time.sleep(STUB_DELAY)
+        return _stub_reply(messages)
+
+class AsyncStubGroq:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, messages=(), **kwargs):
+        await asyncio.sleep(STUB_DELAY)
+        return _stub_reply(messages)
+
+def stub_market():
+    """A MarketAnalystAgent wired to the stubs."""
+    from market_agent import MarketAnalystAgent
+
+    market = MarketAnalystAgent(StubGroq(), AsyncStubGroq())
+    market.tavily = StubTavily()
+    market.tavily_async = AsyncStubTavily()
+    return market
+
+def scratch_copy():
+    """Points database.py at a copy of the database (so stub results never reach the real cache). Returns its path."""
+    path = os.path.join(tempfile.mkdtemp(prefix="sentinel-precompute-"), os.path.basename(database.DB_PATH))
+    source = sqlite3.connect(database.DB_PATH)
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    database.DB_PATH = path
+    return path
@@ -0,0 +1,154 @@
+"""
+Query-plan regression check for database.py.
+
+Every SQL string literal passed to `.execute()` in database.py is collected
+(via `ast`, so new helpers are picked up automatically) and run through
+EXPLAIN QUERY PLAN against a synthetic, fully migrated database. A query
+fails the check when SQLite plans a full table SCAN or a temp B-tree sort,
+unless it is a LIMIT-bounded walk of an index or listed in ALLOWED_SCANS.
+
+    python manage.py check-plans
+"""
+import ast
+import os
+import random
+import sqlite3
+import tempfile
+
+import migrations
+
+DATABASE_MODULE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.py")
+
+# Queries that are unbounded by design: (function name, table) -> reason
+ALLOWED_SCANS = {
+    ("get_channels", "channels"): "tiny lookup table, listed in full",
+    ("get_all_profiles", "profiles"): "history sidebar lists every profile",
+    ("get_all_active_projects", "projects"): "global listing when no user is given",
+    ("get_global_tree_stats", "user_progress"): "one row per user, summed for the platform total",
+    ("verify_user_progress", "user_progress"): "offline counter audit",
+    ("verify_user_progress", "projects"): "offline counter audit",
+    ("clear_llm_cache", "llm_cache"): "maintenance command",
+    ("get_llm_cache_stats", "llm_cache"): "maintenance command, one pass over a bounded table",
+    ("get_market_cache_stats", "market_cache"): "stats endpoint, one index pass over a bounded table",
+    ("get_precompute_profiles", "latest"): "nightly precompute reads every user's latest profile",
+    ("get_job_index_stats", "job_postings"): "stats endpoint, covering index count",
+    ("get_job_index_stats", "job_posting_skills"): "stats endpoint, covering index count",
+    ("get_job_index_stats", "(subquery-1)"): "stats endpoint, one row per distinct skill",
+}
+
+def _literal(node, literals):
+    """Resolves a string constant, a known name, or `a + b` of those."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return literals.get(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _literal(node.left, literals), _literal(node.right, literals)
+        if left is not None and right is not None:
+            return left + right
+    return None
+
+def collect_queries(path=DATABASE_MODULE):
+    """Returns [(function_name, sql)] for every literal SQL executed in `path`."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+
+    # Module-level SQL fragments, e.g. `MESSAGE_SELECT = '''...'''`
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    constants[target.id] = node.value.value
+
+    queries = []
+    for func in ast.walk(tree):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        # SQL kept in a local first, e.g. `query = '''...'''`
+        literals = dict(constants)
+        for node in ast.walk(func):
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        literals[target.id] = node.value.value
+
+        for node in ast.walk(func):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+                continue
+            if node.func.attr not in ("execute", "executemany") or not node.args:
+                continue
+            sql = _literal(node.args[0], literals)
+            if sql is None:
+                continue # f-strings / dynamic SQL can't be planned statically
+            if sql.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")):
+                queries.append((func.name, " ".join(sql.split())))
+    return queries
+
+def build_synthetic_db(path, scale=1):
+    """Creates a migrated database with enough rows that bad plans would hurt."""
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    rnd = random.Random(42)
+    users = 500 * scale
+
+    conn.executemany("INSERT INTO users (id, email, password_hash, full_name) VALUES (?, ?, 'x', ?)",
+                     [(i, f"user{i}@example.com", f"User {i}") for i in range(1, users + 1)])
+    conn.executemany("INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)",
+                     [(f"tok{i}", rnd.randint(1, users), f"2026-{rnd.randint(1, 12):02d}-01T00:00:00") for i in range(5000 * scale)])
+    conn.executemany("INSERT INTO profiles (role, analysis_json, projects_json, user_id, timestamp) VALUES ('Engineer', '{}', '[]', ?, ?)",
+                     [(rnd.randint(1, users), f"2026-01-{rnd.randint(1, 28):02d} 10:00:00") for _ in range(10000 * scale)])
+    conn.executemany("INSERT INTO projects (id, title, data_json, user_id, updated_at) VALUES (?, 'P', '{}', ?, ?)",
+                     [(f"proj_{i}", rnd.randint(1, users), f"2026-01-{rnd.randint(1, 28):02d} 10:00:00") for i in range(10000 * scale)])
+    conn.executemany("INSERT INTO chat_sessions (id, user_id, title) VALUES (?, ?, 'Chat')",
+                     [(f"chat_{i}", rnd.randint(1, users)) for i in range(5000 * scale)])
+    conn.executemany("INSERT INTO chat_messages (session_id, role, content) VALUES (?, 'user', 'hello')",
+                     [(f"chat_{rnd.randint(0, 5000 * scale - 1)}",) for _ in range(50000 * scale)])
+    conn.executemany("INSERT INTO community_messages (channel_id, user_id, content) VALUES (?, ?, 'hi')",
+                     [(rnd.randint(1, 5), rnd.randint(1, users)) for _ in range(50000 * scale)])
+    conn.executemany("INSERT INTO user_activity (user_id, date, hours, level) VALUES (?, ?, 1, 1)",
+                     [(rnd.randint(1, users), f"2026-01-{rnd.randint(1, 28):02d}") for _ in range(10000 * scale)])
+    conn.commit()
+    return conn
+
+def plan_problems(conn, func_name, sql):
+    """Returns the offending EXPLAIN QUERY PLAN lines for one query."""
+    params = (1,) * sql.count("?")
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    bounded = " LIMIT " in sql.upper()
+
+    problems = []
+    for row in rows:
+        detail = row[3]
+        if "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+        elif detail.startswith("SCAN "):
+            table = detail.split()[1]
+            if " VIRTUAL TABLE INDEX " in detail and "M" in detail.rsplit(":", 1)[-1]:
+                continue # FTS5 MATCH is an index lookup
+            if table == "json_each":
+                continue # walks a list passed as a JSON parameter
+            if bounded and " INDEX " in detail:
+                continue # LIMIT-ed walk down an ordered index
+            if (func_name, table) in ALLOWED_SCANS:
+                continue
+            problems.append(detail)
+    return problems
+
+def check(scale=1, verbose=False):
+    """Runs the check on a throwaway database. Returns a list of failures."""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        conn = build_synthetic_db(path, scale)
+        failures = []
+        for func_name, sql in collect_queries():
+            problems = plan_problems(conn, func_name, sql)
+            if verbose:
+                print(f"{'FAIL' if problems else 'ok  '} {func_name}: {sql[:90]}")
+            if problems:
+                failures.append((func_name, sql, problems))
+        conn.close()
+        return failures
+    finally:
+        os.remove(path)
@@ -0,0 +1,355 @@
+"""
+Central scheduler for Groq requests.
+
+Every completion made through llm.py takes a slot here first. Per model it
+keeps:
+
+- a requests-per-minute and a tokens-per-minute budget over a sliding 60s
+  window (MODEL_LIMITS, override with GROQ_RATE_LIMITS="model=rpm:tpm,..."),
+- an AIMD concurrency limit: +1/limit after each success, halved on a 429,
+- a pause until the `retry-after` of the last 429 has passed.
+
+Waiting requests are admitted by priority (interactive chat before analysis
+before background work - market refreshes and the precompute run inside
+`priority(BACKGROUND)`), oldest first within a priority. A market request a
+user is waiting on runs at normal priority. 429s,
+5xx and connection errors are retried with tenacity - after `retry-after`
+when Groq sends one, with exponential jittered backoff otherwise - so under a
+burst callers get a real answer a little later instead of an agent fallback.
+
+    response = rate_limiter.call(request, lambda: client.chat.completions.create(**kwargs))
+    response = await rate_limiter.acall(request, lambda: aclient.chat.completions.create(**kwargs))
+
+    with rate_limiter.priority(rate_limiter.BACKGROUND):
+        ...  # everything in here queues behind user-facing requests
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import openai
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, stop_after_delay, wait_exponential_jitter
+
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+
+# Task label (or agent prefix) -> priority; lower is admitted first
+TASK_PRIORITY = {
+    "mirror.career_chat": INTERACTIVE,
+    "foundry": INTERACTIVE,
+}
+
+# Groq's published free-tier limits
+MODEL_LIMITS = {
+    "llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000},
+    "llama-3.3-70b-versatile": {"rpm": 30, "tpm": 12000},
+    "meta-llama/llama-4-maverick-17b-128e-instruct": {"rpm": 30, "tpm": 6000},
+}
+DEFAULT_LIMITS = {"rpm": 30, "tpm": 6000}
+
+WINDOW = 60.0
+LLM_CONCURRENCY_START = float(os.getenv("LLM_CONCURRENCY_START", "8"))
+LLM_CONCURRENCY_MAX = float(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "5"))
+LLM_RETRY_BUDGET = float(os.getenv("LLM_RETRY_BUDGET", "90")) # seconds, across all attempts
+COMPLETION_ESTIMATE = 512 # tokens reserved for the answer when max_tokens isn't set
+
+def _parse_limits(spec):
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            model, _, values = item.rpartition("=")
+            rpm, tpm = values.split(":")
+            limits[model] = {"rpm": int(rpm), "tpm": int(tpm)}
+        except ValueError:
+            print(f"Rate limiter: ignoring bad limit '{item}'")
+    return limits
+
+MODEL_LIMITS = {**MODEL_LIMITS, **_parse_limits(os.getenv("GROQ_RATE_LIMITS", ""))}
+
+_priority = contextvars.ContextVar("llm_priority", default=None)
+
+@contextmanager
+def priority(level):
+    """Runs every LLM request made inside the block at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def priority_for(task):
+    override = _priority.get()
+    if override is not None:
+        return override
+    if task in TASK_PRIORITY:
+        return TASK_PRIORITY[task]
+    return TASK_PRIORITY.get((task or "").split(".")[0], NORMAL)
+
+def estimate_tokens(request):
+    # ~4 characters per token for the prompt, plus room for the answer
+    prompt = len(json.dumps(request.get("messages", []), ensure_ascii=False)) // 4
+    return prompt + (request.get("max_tokens") or COMPLETION_ESTIMATE)
+
+def retry_after(exc):
+    """Seconds Groq asked us to wait (retry-after header), or None."""
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def _retryable(exc):
+    return isinstance(exc, (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError))
+
+class _Ticket:
+    """A granted slot. Exactly one of done()/failed() must be called."""
+    __slots__ = ("model", "usage", "waker", "granted", "cancelled")
+
+    def __init__(self, model, tokens, waker=None):
+        self.model = model
+        self.usage = [0.0, tokens] # [admitted at, tokens]: this request's entry in the window
+        self.waker = waker         # (loop, future) of an async waiter
+        self.granted = False
+        self.cancelled = False
+
+class _Model:
+    def __init__(self, name):
+        limits = MODEL_LIMITS.get(name, DEFAULT_LIMITS)
+        self.name = name
+        self.rpm = limits["rpm"]
+        self.tpm = limits["tpm"]
+        self.limit = min(LLM_CONCURRENCY_START, LLM_CONCURRENCY_MAX)
+        self.in_flight = 0
+        self.window = deque() # usage entries of requests admitted in the last WINDOW seconds
+        self.waiting = []     # heap of (priority, seq, ticket)
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.stats = {"admitted": 0, "rate_limited": 0, "errors": 0}
+
+    def _trim(self, now):
+        while self.window and self.window[0][0] <= now - WINDOW:
+            self.window.popleft()
+
+    def next_admission(self, now):
+        """0 if the head waiter may go now, the time to retry at, or None (wait for a release)."""
+        self._trim(now)
+        if now < self.paused_until:
+            return self.paused_until
+        if self.in_flight >= int(self.limit):
+            return None
+        if len(self.window) >= self.rpm:
+            return self.window[0][0] + WINDOW
+        tokens = self.waiting[0][2].usage[1]
+        used = sum(entry[1] for entry in self.window)
+        if self.window and used + tokens > self.tpm:
+            # Wait until enough of the window has expired to fit this request
+            for entry in self.window:
+                used -= entry[1]
+                if used + tokens <= self.tpm:
+                    return entry[0] + WINDOW
+            return self.window[-1][0] + WINDOW # bigger than the budget: wait for an empty window
+        return 0
+
+class Scheduler:
+    def __init__(self):
+        self._models = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._thread = None
+        self.retries = 0
+
+    def _model(self, name):
+        model = self._models.get(name)
+        if model is None:
+            model = self._models[name] = _Model(name)
+        return model
+
+    def _enqueue(self, name, tokens, level, waker=None):
+        ticket = _Ticket(name, tokens, waker)
+        with self._cond:
+            heapq.heappush(self._model(name).waiting, (level, next(self._seq), ticket))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name="llm-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return ticket
+
+    def acquire(self, name, tokens, level=NORMAL):
+        """Blocks until a request for `name` may be sent. Returns its ticket."""
+        ticket = self._enqueue(name, tokens, level)
+        with self._cond:
+            while not ticket.granted:
+                self._cond.wait()
+        return ticket
+
+    async def aacquire(self, name, tokens, level=NORMAL):
+        """Awaitable acquire()."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        ticket = self._enqueue(name, tokens, level, (loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._cond:
+                ticket.cancelled = True
+                if ticket.granted:
+                    self._release(ticket) # granted just as we were cancelled
+            raise
+        return ticket
+
+    def _grant(self, model, ticket, now):
+        model.in_flight += 1
+        ticket.usage[0] = now
+        model.window.append(ticket.usage)
+        model.stats["admitted"] += 1
+        ticket.granted = True
+        if ticket.waker is not None:
+            loop, future = ticket.waker
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wake_at = None
+                for model in self._models.values():
+                    while model.waiting:
+                        if model.waiting[0][2].cancelled:
+                            heapq.heappop(model.waiting)
+                            continue
+                        when = model.next_admission(now)
+                        if when == 0:
+                            self._grant(model, heapq.heappop(model.waiting)[2], now)
+                            continue
+                        if when is not None:
+                            wake_at = when if wake_at is None else min(wake_at, when)
+                        break
+                # Sync waiters check their own ticket
+                self._cond.notify_all()
+                self._cond.wait(None if wake_at is None else max(wake_at - now, 0.01))
+
+    def _release(self, ticket):
+        model = self._models[ticket.model]
+        model.in_flight -= 1
+        self._cond.notify_all()
+
+    def done(self, ticket, tokens=None):
+        """The request succeeded; `tokens` is what it really cost, if known."""
+        with self._cond:
+            model = self._models[ticket.model]
+            if tokens is not None:
+                ticket.usage[1] = tokens
+            model.limit = min(model.limit + 1 / model.limit, LLM_CONCURRENCY_MAX)
+            self._release(ticket)
+
+    def failed(self, ticket, exc):
+        with self._cond:
+            model = self._models[ticket.model]
+            if isinstance(exc, openai.RateLimitError):
+                model.stats["rate_limited"] += 1
+                now = time.monotonic()
+                # One cut per burst of 429s, not one per request that hit it
+                if now - model.last_decrease > 1.0:
+                    model.limit = max(model.limit / 2, 1)
+                    model.last_decrease = now
+                wait = retry_after(exc)
+                if wait:
+                    model.paused_until = max(model.paused_until, now + wait)
+            else:
+                model.stats["errors"] += 1
+            self._release(ticket)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            result = {}
+            for name, model in self._models.items():
+                model._trim(now)
+                result[name] = {
+                    "concurrency_limit": round(model.limit, 2),
+                    "in_flight": model.in_flight,
+                    "queued": sum(1 for *_, t in model.waiting if not t.cancelled),
+                    "requests_last_minute": len(model.window),
+                    "tokens_last_minute": sum(entry[1] for entry in model.window),
+                    "rpm": model.rpm,
+                    "tpm": model.tpm,
+                    "paused_for": round(max(model.paused_until - now, 0), 1),
+                    **model.stats,
+                }
+            return {"models": result, "retries": self.retries}
+
+scheduler = Scheduler()
+
+class _wait_retry_after:
+    """tenacity wait: Groq's retry-after (plus jitter) when given, else exponential backoff."""
+    def __init__(self):
+        self._backoff = wait_exponential_jitter(initial=1, max=20)
+
+    def __call__(self, retry_state):
+        scheduler.retries += 1
+        seconds = retry_after(retry_state.outcome.exception())
+        if seconds is not None:
+            return seconds + random.uniform(0, 1)
+        return self._backoff(retry_state)
+
+def _retrying(cls):
+    return cls(
+        retry=retry_if_exception(_retryable),
+        wait=_wait_retry_after(),
+        stop=stop_after_attempt(LLM_RETRIES) | stop_after_delay(LLM_RETRY_BUDGET),
+        reraise=True,
+    )
+
+def _usage(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+def call(request, fn):
+    """Runs `fn()` (one Groq call for `request`) inside a slot, with retries. Blocking."""
+    model, tokens, level = request.get("model"), estimate_tokens(request), priority_for(request.get("task"))
+    for attempt in _retrying(Retrying):
+        with attempt:
+            ticket = scheduler.acquire(model, tokens, level)
+            try:
+                response = fn()
+            except BaseException as e:
+                scheduler.failed(ticket, e)
+                raise
+            scheduler.done(ticket, _usage(response))
+            return response
+
+async def aopen(request, afn):
+    """
+    Awaits `afn()` inside a slot, with retries, and returns (ticket, result)
+    without releasing the slot - for streams, which hold it until they end.
+    Call scheduler.done(ticket) / scheduler.failed(ticket, exc) afterwards.
+    """
+    model, tokens, level = request.get("model"), estimate_tokens(request), priority_for(request.get("task"))
+    async for attempt in _retrying(AsyncRetrying):
+        with attempt:
+            ticket = await scheduler.aacquire(model, tokens, level)
+            try:
+                return ticket, await afn()
+            except BaseException as e:
+                scheduler.failed(ticket, e)
+                raise
+
+async def acall(request, afn):
+    """Awaitable call()."""
+    ticket, response = await aopen(request, afn)
+    scheduler.done(ticket, _usage(response))
+    return response
+
+def stats():
+    return scheduler.stats()
@@ -1,12 +1,18 @@
-from openai import OpenAI
 import json
-import os
+import llm
 
 class ResumeAgent:
-    def __init__(self, client=None):
-        self.client = client
-        
+    def __init__(self, client=None, async_client=None):
+        self.client = client or llm.get_client()
+        self.async_client = async_client or llm.get_async_client()
+
     def generate_resume_content(self, current_profile, completed_projects, target_job_description):
+        return llm.run(self._generate_resume_content(current_profile, completed_projects, target_job_description), self.client)
+
+    async def generate_resume_content_async(self, current_profile, completed_projects, target_job_description):
+        return await llm.arun(self._generate_resume_content(current_profile, completed_projects, target_job_description), self.async_client)
+        
+    def _generate_resume_content(self, current_profile, completed_projects, target_job_description):
         """
         Generates tailored resume sections (Summary, Experience, Projects) 
         based on the user's Sentinel history and the target job.
@@ -56,15 +62,16 @@ class ResumeAgent:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                 model="llama-3.3-70b-versatile",
-                 messages=[
-                     {"role": "system", "content": "You are a JSON-only resume generator."},
-                     {"role": "user", "content": system_prompt}
-                 ],
-                 response_format={"type": "json_object"}
-            )
-            return json.loads(response.choices[0].message.content)
+            content = yield {
+                "task": "resume.generate_resume_content",
+                "model": "llama-3.3-70b-versatile",
+                "messages": [
+                    {"role": "system", "content": "You are a JSON-only resume generator."},
+                    {"role": "user", "content": system_prompt}
+                ],
+                "response_format": {"type": "json_object"}
+            }
+            return json.loads(content)
         except Exception as e:
             print(f"Resume Gen Error: {e}")
             return {"error": str(e)}
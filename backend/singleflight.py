@@ -0,0 +1,128 @@
+"""
+Request coalescing ("singleflight").
+
+Concurrent callers asking for the same key share one upstream call: the first
+caller starts it, everyone who arrives while it is running awaits the same
+result (or exception). Used for market feeds/job matches when a role cohort
+misses the cache together, for identical in-flight LLM and Tavily requests,
+and for repeated /analyze submissions.
+
+    feeds = singleflight.Group("market.live_feeds")
+    data = await feeds.do(("feeds", role, skills), lambda: fetch(role, skills))
+    data = feeds.do_sync(key, lambda: fetch_blocking(role, skills))
+
+`remember` keeps a successful result for that many seconds after the call
+finished, so a retry with the same key (an idempotency key) is answered from
+it instead of running again. Errors are never remembered.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+_groups = {}
+
+class Group:
+    def __init__(self, name, remember=0):
+        self.name = name
+        self.remember = remember
+        self._tasks = {}        # key -> asyncio.Task (event-loop callers)
+        self._futures = {}      # key -> Future (thread callers)
+        self._done = {}         # key -> (deadline, result)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executed = 0
+        self.collapsed = 0
+        self.replayed = 0
+        _groups[name] = self
+
+    def _replay(self, key):
+        entry = self._done.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            self._done.pop(key, None)
+            return False, None
+        self.replayed += 1
+        return True, entry[1]
+
+    def _finished(self, key, result, remember):
+        if remember:
+            now = time.monotonic()
+            with self._lock:
+                # Drop whatever else has expired while we are here
+                for k in [k for k, (deadline, _) in self._done.items() if deadline <= now]:
+                    del self._done[k]
+                self._done[key] = (now + remember, result)
+
+    async def do(self, key, fn, remember=None):
+        """
+        Awaits `fn()` (a coroutine function) once per key across concurrent
+        callers. A caller that gets cancelled does not cancel the shared call.
+        """
+        remember = self.remember if remember is None else remember
+        self.calls += 1
+        hit, result = self._replay(key)
+        if hit:
+            return result
+
+        task = self._tasks.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+
+            def finished(t):
+                self._tasks.pop(key, None)
+                if not t.cancelled() and t.exception() is None:
+                    self._finished(key, t.result(), remember)
+
+            task.add_done_callback(finished)
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def do_sync(self, key, fn, remember=None):
+        """Blocking do(): runs `fn()` once per key across concurrent threads."""
+        remember = self.remember if remember is None else remember
+        with self._lock:
+            self.calls += 1
+            hit, result = self._replay(key)
+            if hit:
+                return result
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                self.executed += 1
+                future = self._futures[key] = Future()
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            self._finished(key, result, remember)
+            return result
+        finally:
+            with self._lock:
+                self._futures.pop(key, None)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "collapsed": self.collapsed,
+            "replayed": self.replayed,
+            "in_flight": len(self._tasks) + len(self._futures),
+        }
+
+def stats():
+    """Per-group counters: how many calls were collapsed onto another caller's."""
+    return {name: group.stats() for name, group in _groups.items()}
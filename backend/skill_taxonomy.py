@@ -0,0 +1,193 @@
+"""
+Canonical skill ids for cache and index keys.
+
+The LLMs name the same skill many ways ("ReactJS", "react.js", "React");
+the cache keys, cohorts and the job index need one. Each known skill has a
+canonical id, and every alias maps to it through a hash index of normalized
+forms: NFKC, case-folded, everything but letters, digits, "+" and "#"
+stripped (so "React JS", "react.js" and "ReactJS" share the form "reactjs").
+A trailing version ("Python 3.11", "Angular 17") is dropped when the rest is
+a known skill. Aliases only name the same skill - related tools (Git and
+GitHub, Spring and Spring Boot) stay apart.
+
+Unknown skills get a slug id built like the known ones (case-folded, runs
+of other characters turned into "-"), so "Agile Methodologies" and
+"agile-methodologies" collapse. With SKILL_FUZZY=1, an unknown form of 5+
+characters also tries the closest alias (difflib, SKILL_FUZZY_CUTOFF); it is
+off by default because near-misses are often different words ("Trust" is not
+Rust). Lookups are memoized per string.
+
+Only ids leave this module: agent output keeps the LLM's display strings.
+
+    skill_taxonomy.canonical_ids("React, python3")   # ("python", "react")
+"""
+import difflib
+import functools
+import os
+import re
+import unicodedata
+
+SKILL_FUZZY = os.getenv("SKILL_FUZZY", "0") == "1"
+SKILL_FUZZY_CUTOFF = float(os.getenv("SKILL_FUZZY_CUTOFF", "0.88"))
+
+# (canonical id, display name, aliases) - aliases are only needed where the
+# normalized forms differ: "React.js" and "react js" already match "React"
+TAXONOMY = [
+    # Languages
+    ("python", "Python", ["python3", "py"]),
+    ("javascript", "JavaScript", ["js", "ecmascript", "es6", "vanilla js"]),
+    ("typescript", "TypeScript", ["ts"]),
+    ("java", "Java", ["java se", "core java"]),
+    ("kotlin", "Kotlin", []),
+    ("swift", "Swift", []),
+    ("go", "Go", ["golang"]),
+    ("rust", "Rust", []),
+    ("c", "C", ["c language"]),
+    ("cpp", "C++", ["c++", "cplusplus"]),
+    ("csharp", "C#", ["c#", "c sharp"]),
+    ("php", "PHP", []),
+    ("ruby", "Ruby", []),
+    ("scala", "Scala", []),
+    ("r", "R", ["r language", "rlang"]),
+    ("matlab", "MATLAB", []),
+    ("dart", "Dart", []),
+    ("sql", "SQL", []),
+    ("bash", "Bash", ["bash scripting"]),
+    ("html", "HTML", ["html5"]),
+    ("css", "CSS", ["css3"]),
+    # Frontend
+    ("react", "React", ["reactjs"]),
+    ("react-native", "React Native", []),
+    ("nextjs", "Next.js", []),
+    ("vue", "Vue.js", ["vuejs", "vue"]),
+    ("angular", "Angular", ["angularjs"]),
+    ("svelte", "Svelte", []),
+    ("redux", "Redux", []),
+    ("tailwind", "Tailwind CSS", ["tailwindcss", "tailwind"]),
+    ("bootstrap", "Bootstrap", []),
+    ("flutter", "Flutter", []),
+    # Backend
+    ("nodejs", "Node.js", ["node"]),
+    ("express", "Express", ["expressjs"]),
+    ("django", "Django", []),
+    ("flask", "Flask", []),
+    ("fastapi", "FastAPI", []),
+    ("spring", "Spring", ["spring framework"]),
+    ("dotnet", ".NET", ["dotnet core", "net core"]),
+    ("rails", "Ruby on Rails", ["rails", "ror"]),
+    ("laravel", "Laravel", []),
+    ("graphql", "GraphQL", []),
+    ("rest-api", "REST APIs", ["rest", "restful", "rest api", "restful api", "restful apis"]),
+    ("microservices", "Microservices", ["microservice architecture"]),
+    # Data stores
+    ("postgresql", "PostgreSQL", ["postgres", "psql"]),
+    ("mysql", "MySQL", []),
+    ("sqlite", "SQLite", []),
+    ("mongodb", "MongoDB", ["mongo"]),
+    ("redis", "Redis", []),
+    ("elasticsearch", "Elasticsearch", ["elastic search"]),
+    ("cassandra", "Cassandra", []),
+    ("dynamodb", "DynamoDB", []),
+    ("firebase", "Firebase", []),
+    # Cloud / DevOps
+    ("aws", "AWS", ["amazon web services"]),
+    ("azure", "Azure", ["microsoft azure"]),
+    ("gcp", "Google Cloud", ["google cloud platform"]),
+    ("docker", "Docker", []),
+    ("kubernetes", "Kubernetes", ["k8s"]),
+    ("terraform", "Terraform", []),
+    ("ansible", "Ansible", []),
+    ("ci-cd", "CI/CD", ["cicd", "continuous integration", "continuous deployment"]),
+    ("jenkins", "Jenkins", []),
+    ("github-actions", "GitHub Actions", []),
+    ("git", "Git", []),
+    ("linux", "Linux", []),
+    ("nginx", "Nginx", []),
+    # Data / ML
+    ("machine-learning", "Machine Learning", ["ml"]),
+    ("deep-learning", "Deep Learning", ["dl"]),
+    ("artificial-intelligence", "Artificial Intelligence", ["ai"]),
+    ("nlp", "NLP", ["natural language processing"]),
+    ("computer-vision", "Computer Vision", []),
+    ("llm", "LLMs", ["llms", "large language models"]),
+    ("tensorflow", "TensorFlow", []),
+    ("pytorch", "PyTorch", ["torch"]),
+    ("scikit-learn", "scikit-learn", ["sklearn", "scikit"]),
+    ("pandas", "Pandas", []),
+    ("numpy", "NumPy", []),
+    ("spark", "Apache Spark", ["apache spark", "pyspark"]),
+    ("hadoop", "Hadoop", []),
+    ("kafka", "Apache Kafka", ["apache kafka"]),
+    ("airflow", "Apache Airflow", ["apache airflow"]),
+    ("data-analysis", "Data Analysis", ["data analytics"]),
+    ("data-visualization", "Data Visualization", ["data viz"]),
+    ("tableau", "Tableau", []),
+    ("power-bi", "Power BI", ["powerbi"]),
+    ("excel", "Excel", ["microsoft excel", "ms excel"]),
+    # Robotics / embedded
+    ("ros", "ROS", ["robot operating system", "ros2"]),
+    ("embedded-systems", "Embedded Systems", ["embedded"]),
+    ("arduino", "Arduino", []),
+    ("raspberry-pi", "Raspberry Pi", []),
+    # Practices
+    ("system-design", "System Design", []),
+    ("data-structures", "Data Structures & Algorithms", ["dsa", "data structures", "algorithms",
+                                                           "data structures and algorithms"]),
+    ("oop", "OOP", ["object oriented programming", "object-oriented programming"]),
+    ("testing", "Testing", ["unit testing", "automated testing"]),
+    ("agile", "Agile", []),
+    ("cloud-architecture", "Cloud Architecture", []),
+    ("cybersecurity", "Cybersecurity", ["cyber security", "information security", "infosec"]),
+    ("ui-ux", "UI/UX Design", ["ui/ux", "ux", "ui design", "ux design"]),
+]
+
+def _form(text):
+    """Normalized form for the alias index."""
+    text = unicodedata.normalize("NFKC", str(text)).casefold().strip()
+    return re.sub(r"[^\w+#]|_", "", text)
+
+def slug(text):
+    """Id for a skill outside the taxonomy, in the same shape as the known ids ("data-structures")."""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return re.sub(r"(?:[^\w+#]|_)+", "-", text).strip("-")
+
+_VERSION = re.compile(r"\s*v?\d+(?:\.\d+)*\s*$")
+
+# form -> canonical id; display names and ids index themselves
+ALIASES = {}
+for skill_id, name, aliases in TAXONOMY:
+    for alias in [skill_id, name, *aliases]:
+        ALIASES.setdefault(_form(alias), skill_id)
+
+_ALIAS_FORMS = list(ALIASES)
+
+@functools.lru_cache(maxsize=20000)
+def _lookup(skill):
+    form = _form(skill)
+    if form in ALIASES:
+        return ALIASES[form]
+    unversioned = _form(_VERSION.sub("", skill))
+    if unversioned and unversioned in ALIASES:
+        return ALIASES[unversioned]
+    if SKILL_FUZZY and len(form) >= 5:
+        close = difflib.get_close_matches(form, _ALIAS_FORMS, n=1, cutoff=SKILL_FUZZY_CUTOFF)
+        if close:
+            return ALIASES[close[0]]
+    return slug(skill)
+
+def canonical_id(skill):
+    """The skill's canonical id ("" for blank input)."""
+    if not isinstance(skill, str) or not skill.strip():
+        return ""
+    return _lookup(skill.strip())
+
+def canonical_ids(skills):
+    """Sorted, de-duplicated canonical ids; accepts a list or a comma-separated string."""
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    return tuple(sorted({canonical_id(s) for s in skills or ()} - {""}))
+
+def stats():
+    info = _lookup.cache_info()
+    return {"skills": len(TAXONOMY), "aliases": len(ALIASES), "memoized": info.currsize,
+            "hits": info.hits, "misses": info.misses}
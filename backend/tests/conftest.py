@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules (python main.py / manage.py from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A migrated throwaway database that every database.py helper uses."""
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+    yield database.DB_PATH
+    database.get_pool().close()
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """main.py imported without real API keys; its import-time init_db runs in a scratch directory."""
+    for key in ("GROQ_API_KEY", "OPENAI_API_KEY", "TAVILY_API_KEY"):
+        os.environ.setdefault(key, "test")
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        import main
+    finally:
+        os.chdir(cwd)
+    return main
+
+@pytest.fixture
+def client(main_module, db):
+    """(TestClient, auth headers) for a fresh user; startup tasks (workers, sweepers) are not started."""
+    from fastapi.testclient import TestClient
+
+    user_id = database.create_user(f"client{id(db)}@example.com", "x", "Test Client")
+    token = f"test-token-{user_id}"
+    database.create_session(user_id, token)
+    return TestClient(main_module.app), {"Authorization": f"Bearer {token}"}
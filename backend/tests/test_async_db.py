@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+import async_db
+import database
+
+SLOW_SQL = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 2000000) SELECT count(*) FROM c"
+
+def slow_query():
+    with database.transaction() as conn:
+        return conn.execute(SLOW_SQL).fetchone()[0]
+
+def test_slow_query_does_not_block_other_requests(db):
+    user_id = database.create_user("async@example.com", "x", "Async Test")
+
+    async def main():
+        started = time.perf_counter()
+        slow = asyncio.create_task(async_db.run(slow_query))
+        await asyncio.sleep(0.01) # the slow query is running on the DB executor
+
+        tick = time.perf_counter()
+        await asyncio.sleep(0)
+        tick = time.perf_counter() - tick
+
+        user = await async_db.get_user_by_id(user_id)
+        cheap = time.perf_counter() - started
+        assert not slow.done()
+        assert await slow == 2000000
+        return tick, cheap, time.perf_counter() - started, user
+
+    tick, cheap, total, user = asyncio.run(main())
+    assert user["email"] == "async@example.com"
+    assert tick < 0.05
+    assert cheap < total / 4, (cheap, total)
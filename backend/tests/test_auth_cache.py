@@ -0,0 +1,45 @@
+import time
+from datetime import datetime, timedelta
+
+import auth_cache
+import database
+
+def later(seconds):
+    return (datetime.now() + timedelta(seconds=seconds)).isoformat()
+
+def test_entries_expire_with_the_ttl_or_the_session():
+    cache = auth_cache.AuthCache(ttl=60)
+    cache.put("long-session", {"id": 1}, later(3600))
+    cache.put("ending-session", {"id": 2}, time.time() + 0.05)
+    cache.put("expired-session", {"id": 3}, later(-10))
+    assert cache.get("long-session") == {"id": 1}
+    assert cache.get("ending-session") == {"id": 2}
+    assert cache.get("expired-session") is None
+    time.sleep(0.06)
+    assert cache.get("ending-session") is None
+    assert cache.stats() == {"size": 1, "hits": 2, "misses": 2}
+
+def test_least_recently_used_token_is_evicted():
+    cache = auth_cache.AuthCache(max_size=2)
+    cache.put("a", {"id": 1}, later(3600))
+    cache.put("b", {"id": 2}, later(3600))
+    cache.get("a")
+    cache.put("c", {"id": 3}, later(3600))
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+def test_invalidate_user_drops_all_their_tokens():
+    cache = auth_cache.AuthCache()
+    cache.put("laptop", {"id": 1}, later(3600))
+    cache.put("phone", {"id": 1}, later(3600))
+    cache.put("other", {"id": 2}, later(3600))
+    cache.invalidate_user(1)
+    assert cache.get("laptop") is None and cache.get("phone") is None
+    assert cache.get("other") == {"id": 2}
+
+def test_logout_ends_a_cached_session(client):
+    http, headers = client
+    assert http.get("/chat/sessions", headers=headers).status_code == 200
+    assert http.post("/auth/logout", headers=headers).status_code == 200
+    assert http.get("/chat/sessions", headers=headers).status_code == 401
+    assert database.get_user_by_token(headers["Authorization"].split()[1]) is None
@@ -0,0 +1,109 @@
+import types
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, Breaker, CircuitOpenError
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A frozen time.monotonic for the breaker module; advance it with clock.now += seconds."""
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(circuit_breaker, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+def fail():
+    raise TimeoutError("upstream timed out")
+
+def trip(breaker):
+    for _ in range(circuit_breaker.BREAKER_MIN_CALLS):
+        with pytest.raises(TimeoutError):
+            breaker.call(fail)
+
+def test_opens_once_the_failure_rate_is_reached(clock):
+    breaker = Breaker("test", slow_call=10)
+    for _ in range(circuit_breaker.BREAKER_MIN_CALLS - 1):
+        with pytest.raises(TimeoutError):
+            breaker.call(fail)
+    assert breaker.state == CLOSED # too few calls to judge
+    with pytest.raises(TimeoutError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError) as e:
+        breaker.call(lambda: calls.append(1))
+    assert not calls and e.value.retry_in == circuit_breaker.BREAKER_OPEN_FOR
+
+def test_successes_keep_it_closed(clock):
+    breaker = Breaker("test", slow_call=10)
+    for i in range(20):
+        if i % 3 == 0:
+            with pytest.raises(TimeoutError):
+                breaker.call(fail)
+        else:
+            breaker.call(lambda: "ok")
+    assert breaker.state == CLOSED
+
+def test_failures_outside_the_window_are_forgotten(clock):
+    breaker = Breaker("test", slow_call=10)
+    for _ in range(circuit_breaker.BREAKER_MIN_CALLS - 1):
+        with pytest.raises(TimeoutError):
+            breaker.call(fail)
+    clock.now += circuit_breaker.BREAKER_WINDOW + 1
+    with pytest.raises(TimeoutError):
+        breaker.call(fail)
+    assert breaker.state == CLOSED
+
+def test_half_open_probe_success_closes(clock):
+    breaker = Breaker("test", slow_call=10)
+    trip(breaker)
+    clock.now += circuit_breaker.BREAKER_OPEN_FOR
+    assert breaker.snapshot()["state"] == HALF_OPEN
+
+    probe = breaker.before()
+    assert probe and breaker.state == HALF_OPEN
+    # Only BREAKER_PROBES calls get through while the probe is out
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+    breaker.after(probe, latency=0.1)
+    assert breaker.state == CLOSED
+    assert breaker.call(lambda: "ok") == "ok"
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = Breaker("test", slow_call=10)
+    trip(breaker)
+    clock.now += circuit_breaker.BREAKER_OPEN_FOR
+    with pytest.raises(TimeoutError):
+        breaker.call(fail)
+    assert breaker.state == OPEN and breaker.stats["opened"] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+def test_slow_probe_reopens(clock):
+    breaker = Breaker("test", slow_call=10)
+    trip(breaker)
+    clock.now += circuit_breaker.BREAKER_OPEN_FOR
+    breaker.after(breaker.before(), latency=30)
+    assert breaker.state == OPEN
+
+def test_groq_client_errors_do_not_count_as_outages(clock):
+    breaker = Breaker("groq", slow_call=10, is_failure=circuit_breaker._groq_outage)
+    request = types.SimpleNamespace(status_code=400)
+    error = circuit_breaker.openai.BadRequestError("bad request", response=types.SimpleNamespace(
+        status_code=400, headers={}, request=request), body=None)
+
+    def bad_request():
+        raise error
+
+    for _ in range(circuit_breaker.BREAKER_MIN_CALLS * 2):
+        with pytest.raises(circuit_breaker.openai.BadRequestError):
+            breaker.call(bad_request)
+    assert breaker.state == CLOSED
+
+def test_track_reports_fallbacks():
+    with circuit_breaker.track() as health:
+        assert health.apply({"jobs": []}) == {"jobs": []}
+        circuit_breaker.mark_degraded("tavily")
+    assert health.apply({"jobs": []}) == {"jobs": [], "degraded": True}
+    circuit_breaker.mark_degraded("groq") # outside track(): ignored
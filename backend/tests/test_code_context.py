@@ -0,0 +1,61 @@
+import code_context
+
+PYTHON = '''import os
+
+CONSTANT = 1
+
+@decorator
+def first(a):
+    return a
+
+
+class Thing:
+    """Doc."""
+
+    def method(self):
+        return 1
+
+    async def other(self):
+        return 2
+
+print(first(CONSTANT))
+'''
+
+JAVASCRIPT = '''const express = require("express");
+
+function handler(req, res) {
+  res.send("ok");
+}
+
+const helper = async (x) => {
+  return x;
+};
+'''
+
+def spans(code):
+    return [(c.name, c.start, c.end) for c in code_context.chunks(code)]
+
+def test_python_is_chunked_by_definition():
+    assert spans(PYTHON) == [
+        ("<module:1>", 1, 3),
+        ("first", 5, 7),        # the decorator belongs to the function
+        ("Thing", 10, 11),      # class header up to the first method, blank lines trimmed
+        ("Thing.method", 13, 14),
+        ("Thing.other", 16, 17),
+        ("<module:19>", 19, 19),
+    ]
+
+def test_other_languages_use_the_line_tokenizer():
+    assert spans(JAVASCRIPT) == [("<module:1>", 1, 1), ("handler", 3, 5), ("helper", 7, 9)]
+
+def test_python_that_does_not_parse_falls_back():
+    broken = "def ok():\n    return 1\n\ndef broken(:\n    pass\n"
+    assert [name for name, _, _ in spans(broken)] == ["ok", "broken"]
+
+def test_chunks_cover_the_text_and_change_digest_on_edit():
+    chunks = code_context.chunks(PYTHON)
+    assert chunks[1].text == "@decorator\ndef first(a):\n    return a"
+    edited = code_context.chunks(PYTHON.replace("return a", "return a + 1"))
+    assert edited[1].digest != chunks[1].digest
+    assert [c.digest for c in edited[2:]] == [c.digest for c in chunks[2:]]
+    assert code_context.chunks("") == []
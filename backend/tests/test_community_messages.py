@@ -0,0 +1,43 @@
+import pytest
+
+import database
+
+@pytest.fixture
+def channel(db, monkeypatch):
+    """'general' with a 5-message in-memory window and 12 messages m0..m11."""
+    monkeypatch.setattr(database, "COMMUNITY_BUFFER_SIZE", 5)
+    monkeypatch.setattr(database, "_channel_feeds", {})
+    user_id = database.create_user("poster@example.com", "x", "Poster")
+    for i in range(12):
+        database.add_community_message(user_id, "general", f"m{i}")
+    return user_id
+
+def contents(page):
+    return [m["content"] for m in page]
+
+def test_default_page_is_the_newest_messages(channel):
+    assert contents(database.get_channel_messages("general", limit=3)) == ["m9", "m10", "m11"]
+    # Longer than the window: read from SQLite, same shape
+    assert contents(database.get_channel_messages("general", limit=8)) == [f"m{i}" for i in range(4, 12)]
+
+def test_before_pages_back_through_history(channel):
+    newest = database.get_channel_messages("general", limit=4)
+    older = database.get_channel_messages("general", before=newest[0]["id"], limit=4)
+    oldest = database.get_channel_messages("general", before=older[0]["id"], limit=4)
+    assert contents(oldest + older + newest) == [f"m{i}" for i in range(12)]
+    assert database.get_channel_messages("general", before=oldest[0]["id"]) == []
+
+def test_polling_with_after_sees_new_posts(channel):
+    last = database.get_channel_messages("general")[-1]["id"]
+    assert database.get_channel_messages("general", after=last) == []
+    database.add_community_message(channel, "general", "new")
+    assert contents(database.get_channel_messages("general", after=last)) == ["new"]
+    # A cursor older than the window falls back to SQLite
+    first = database.get_channel_messages("general", limit=100)[0]["id"]
+    assert contents(database.get_channel_messages("general", after=first, limit=2)) == ["m1", "m2"]
+
+def test_limits_and_unknown_channels(channel):
+    assert len(database.get_channel_messages("general", limit=1000)) == 12
+    assert len(database.get_channel_messages("general", limit=0)) == 1
+    assert database.get_channel_messages("no-such-channel") == []
+    assert database.add_community_message(channel, "no-such-channel", "hi") is False
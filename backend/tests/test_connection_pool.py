@@ -0,0 +1,78 @@
+import threading
+
+import database
+
+WRITERS = 8
+READERS = 8
+MESSAGES = 50
+
+def test_parallel_writers_and_readers(db):
+    user_id = database.create_user("pool@example.com", "x", "Pool Test")
+    for w in range(WRITERS):
+        database.create_chat_session(f"s{w}", user_id)
+
+    errors = []
+    start = threading.Barrier(WRITERS + READERS)
+
+    def writer(w):
+        start.wait()
+        for i in range(MESSAGES):
+            # Insert, then read back inside the same transaction (the read-after-write path)
+            with database.transaction() as conn:
+                database.save_chat_message(f"s{w}", "user", f"message {i}")
+                count = conn.execute("SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (f"s{w}",)).fetchone()[0]
+                assert count == i + 1
+
+    def reader(r):
+        start.wait()
+        for _ in range(MESSAGES):
+            history = database.get_chat_history(f"s{r % WRITERS}")
+            assert all(m["role"] == "user" for m in history)
+
+    def run(fn, n):
+        try:
+            fn(n)
+        except Exception as e: # an sqlite3.OperationalError("database is locked") in particular
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(writer, w)) for w in range(WRITERS)]
+    threads += [threading.Thread(target=run, args=(reader, r)) for r in range(READERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=60)
+
+    assert not any(t.is_alive() for t in threads)
+    assert not errors, errors
+    for w in range(WRITERS):
+        assert len(database.get_chat_history(f"s{w}")) == MESSAGES
+
+def test_pool_stays_bounded(db):
+    pool = database.get_pool()
+    done = threading.Barrier(pool.size * 2)
+
+    def work():
+        with database.transaction() as conn:
+            conn.execute("SELECT 1")
+        done.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(pool.size * 2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=30)
+    assert pool._opened <= pool.size
+
+def test_after_commit_failure_is_reported_and_does_not_stop_others(db, capsys):
+    ran = []
+
+    def broken():
+        raise RuntimeError("callback exploded")
+
+    with database.transaction():
+        database.after_commit(broken)
+        database.after_commit(lambda: ran.append(True))
+
+    assert ran == [True]
+    err = capsys.readouterr().err
+    assert "Traceback" in err and "RuntimeError: callback exploded" in err
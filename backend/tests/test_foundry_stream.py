@@ -0,0 +1,67 @@
+import json
+from types import SimpleNamespace
+
+import circuit_breaker
+import code_context
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+class BrokenStream:
+    """Two deltas, then the connection drops."""
+    def __init__(self):
+        self.items = [chunk("Use a "), chunk("dict.")]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.items:
+            return self.items.pop(0)
+        raise ConnectionError("stream reset")
+
+    async def close(self):
+        pass
+
+class FakeClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        return BrokenStream()
+
+def events(response):
+    parsed = []
+    for frame in response.text.strip().split("\n\n"):
+        name, data = frame.split("\n")
+        parsed.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+def body(project_id="p1"):
+    return {"message": "How do I store this?", "code": "x = 1\n", "project_context": {"project_id": project_id, "title": "T"}}
+
+def test_failure_mid_stream_sends_an_error_event_and_keeps_the_partial_reply(main_module, client, monkeypatch):
+    http, headers = client
+    monkeypatch.setattr(main_module.foundry, "async_client", FakeClient())
+    recorded = []
+    monkeypatch.setattr(code_context, "record", lambda turn, reply: recorded.append(reply))
+
+    got = events(http.post("/foundry/chat/stream", json=body(), headers=headers))
+
+    assert [name for name, _ in got] == ["delta", "delta", "error"]
+    error = got[-1][1]
+    assert error["degraded"] is True
+    assert error["response"].startswith("Use a dict.") and "offline temporarily" in error["response"]
+    assert recorded == ["Use a dict."]
+
+def test_open_breaker_sends_the_degraded_fallback(main_module, client, monkeypatch):
+    http, headers = client
+
+    def is_open():
+        raise circuit_breaker.CircuitOpenError("groq", 30)
+    monkeypatch.setattr(circuit_breaker.groq, "check", is_open)
+
+    got = events(http.post("/foundry/chat/stream", json=body(), headers=headers))
+
+    assert [name for name, _ in got] == ["error"]
+    assert got[0][1]["degraded"] is True and "offline temporarily" in got[0][1]["response"]
@@ -0,0 +1,34 @@
+import job_index
+
+def posting(title, role, skills):
+    return {"role": role, "skills": skills, "data": {"title": title, "match_score": 5}}
+
+def test_score_ranks_skill_overlap_and_role():
+    candidates = [
+        posting("unrelated", "data scientist", ["r", "tableau"]),
+        posting("partial", "backend engineer", ["python", "docker"]),
+        posting("exact", "backend engineer", ["python", "sql"]),
+    ]
+    ranked = job_index.score(candidates, "Backend Engineer", ["Python", "SQL"], total=3,
+                             frequencies={"python": 2, "sql": 1, "docker": 1, "r": 1, "tableau": 1})
+    assert [job["title"] for job in ranked] == ["exact", "partial", "unrelated"]
+    assert ranked[0]["match_score"] == 100
+    assert ranked[-1]["match_score"] == 0
+    assert all(0 <= job["match_score"] <= 100 for job in ranked)
+
+def test_rare_skills_weigh_more():
+    candidates = [posting("common", "x", ["python"]), posting("rare", "x", ["rust"])]
+    ranked = job_index.score(candidates, "y", ["Python", "Rust"], total=100, frequencies={"python": 90, "rust": 2})
+    assert [job["title"] for job in ranked] == ["rare", "common"]
+
+def test_ties_keep_candidate_order_and_data_is_copied():
+    candidates = [posting("newer", "x", []), posting("older", "x", [])]
+    ranked = job_index.score(candidates, "y", [], total=2, frequencies={})
+    assert [job["title"] for job in ranked] == ["newer", "older"]
+    assert candidates[0]["data"]["match_score"] == 5
+    assert job_index.score([], "x", ["python"], 0, {}) == []
+
+def test_canonical_link():
+    assert job_index.canonical_link("HTTPS://Example.COM/jobs/1/#apply") == "https://example.com/jobs/1"
+    assert job_index.canonical_link("mailto:jobs@example.com") is None
+    assert job_index.canonical_link(None) is None
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+import database
+import jobs
+
+@pytest.fixture
+def pool(db, monkeypatch):
+    """Fresh job-pool state; start() runs inside each test's event loop."""
+    monkeypatch.setattr(jobs, "_scheduler", jobs._Scheduler())
+    monkeypatch.setattr(jobs, "_workers", [])
+    monkeypatch.setattr(jobs, "_handlers", {})
+    return jobs
+
+def drain(scheduler):
+    order = []
+    while (item := scheduler.pop()) is not None:
+        order.append(item[0])
+    return order
+
+def test_users_take_turns_within_a_priority(monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_PER_USER", 10)
+    scheduler = jobs._Scheduler()
+    for job_id in ("a1", "a2", "a3"):
+        scheduler.push(job_id, "alice", jobs.PRIORITY_NORMAL)
+    scheduler.push("b1", "bob", jobs.PRIORITY_NORMAL)
+    scheduler.push("b2", "bob", jobs.PRIORITY_NORMAL)
+    assert drain(scheduler) == ["a1", "b1", "a2", "b2", "a3"]
+
+def test_higher_priority_runs_first():
+    scheduler = jobs._Scheduler()
+    scheduler.push("low", 1, jobs.PRIORITY_LOW)
+    scheduler.push("normal", 2, jobs.PRIORITY_NORMAL)
+    scheduler.push("high", 3, jobs.PRIORITY_HIGH)
+    assert drain(scheduler) == ["high", "normal", "low"]
+
+def test_no_user_runs_more_than_the_cap(monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_PER_USER", 2)
+    scheduler = jobs._Scheduler()
+    for i in range(5):
+        scheduler.push(f"a{i}", "alice", jobs.PRIORITY_NORMAL)
+    scheduler.push("b0", "bob", jobs.PRIORITY_NORMAL)
+    assert drain(scheduler) == ["a0", "b0", "a1"]
+    assert len(scheduler) == 3
+    scheduler.done("alice")
+    assert drain(scheduler) == ["a2"]
+
+def test_jobs_run_and_report_every_state(pool):
+    @jobs.handler("echo")
+    async def echo(payload, user_id):
+        return {"echo": payload["text"], "user": user_id}
+
+    async def main():
+        await jobs.start(workers=2)
+        try:
+            job_id = await jobs.submit("echo", {"text": "hi"}, 7)
+            states = [job["status"] async for job in jobs.watch(job_id)]
+            return states, await jobs.get(job_id)
+        finally:
+            for worker in jobs._workers:
+                worker.cancel()
+
+    states, job = asyncio.run(main())
+    assert states[-1] == "done" and "running" in states
+    assert job["result"] == {"echo": "hi", "user": 7}
+
+def test_a_job_past_the_timeout_fails(pool, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_TIMEOUT", 0.05)
+
+    @jobs.handler("stuck")
+    async def stuck(payload, user_id):
+        await asyncio.sleep(10)
+
+    async def main():
+        await jobs.start(workers=1)
+        try:
+            return await jobs.wait(await jobs.submit("stuck", {}, 1))
+        finally:
+            for worker in jobs._workers:
+                worker.cancel()
+
+    job = asyncio.run(main())
+    assert job["status"] == "failed" and job["error"].startswith("Timed out")
+
+def test_unfinished_jobs_resume_on_start(pool):
+    ran = []
+
+    @jobs.handler("resumable")
+    async def resumable(payload, user_id):
+        ran.append(payload["n"])
+        return payload["n"]
+
+    database.create_job("queued", 1, "resumable", jobs.PRIORITY_NORMAL, {"n": 1}, 0)
+    database.create_job("interrupted", 1, "resumable", jobs.PRIORITY_NORMAL, {"n": 2}, 0)
+    database.mark_job_running("interrupted", 0) # the process died mid-run
+    database.create_job("given-up", 1, "resumable", jobs.PRIORITY_NORMAL, {"n": 3}, 0)
+    for _ in range(jobs.JOBS_MAX_ATTEMPTS):
+        database.mark_job_running("given-up", 0)
+
+    async def main():
+        await jobs.start(workers=1)
+        try:
+            return [await jobs.wait(job_id) for job_id in ("queued", "interrupted", "given-up")]
+        finally:
+            for worker in jobs._workers:
+                worker.cancel()
+
+    queued, interrupted, given_up = asyncio.run(main())
+    assert sorted(ran) == [1, 2]
+    assert queued["status"] == interrupted["status"] == "done"
+    assert interrupted["attempts"] == 2
+    assert given_up["status"] == "failed" and given_up["error"] == "Interrupted too many times"
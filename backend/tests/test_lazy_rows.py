@@ -0,0 +1,49 @@
+import asyncio
+
+import async_db
+import database
+
+def make_user(email="lazy@example.com"):
+    user_id = database.create_user(email, "x", "Lazy Rows")
+    database.save_career_data("Backend Engineer", {"current_skills": ["Python"], "skill_gaps": ["Docker"]},
+                              [{"id": "idea", "title": "Idea"}], "Sprout", user_id)
+    for i in range(3):
+        database.save_project_globally({"id": f"p{i}", "title": f"Project {i}", "current_phase": 0,
+                                        "phases": [{"id": n, "title": f"Phase {n}", "tasks": []} for n in range(i + 1)]},
+                                       user_id)
+    return user_id
+
+def test_project_listing_loads_phases_in_one_query(db, monkeypatch):
+    user_id = make_user()
+
+    def per_project(project_id):
+        raise AssertionError("phases were loaded one project at a time")
+    monkeypatch.setattr(database, "_load_project_phases", per_project)
+
+    statements = []
+    with database.transaction() as conn:
+        conn.set_trace_callback(statements.append)
+        projects = database.materialize(database.get_all_active_projects(user_id))
+        conn.set_trace_callback(None)
+
+    assert {p["id"]: len(p["phases"]) for p in projects} == {"p0": 1, "p1": 2, "p2": 3}
+    assert sum("FROM project_phases" in s for s in statements) == 1
+
+def test_async_fields_only_load_what_is_asked(db, monkeypatch):
+    user_id = make_user()
+
+    def unexpected(*args):
+        raise AssertionError("an unrequested child table was queried")
+    monkeypatch.setattr(database, "_load_profile_projects", unexpected)
+    monkeypatch.setattr(database, "_load_job_matches", unexpected)
+
+    profile = asyncio.run(async_db.get_profile_by_user_id(user_id, fields=("analysis",)))
+    assert profile["role"] == "Backend Engineer"
+    assert profile["analysis"]["current_skills"] == ["Python"]
+    assert "projects" not in profile and "job_matches" not in profile
+
+def test_async_results_are_fully_loaded_by_default(db):
+    user_id = make_user()
+    profile = asyncio.run(async_db.get_profile_by_user_id(user_id))
+    assert profile["projects"] == [{"id": "idea", "title": "Idea"}]
+    assert isinstance(profile, dict) and not isinstance(profile, database.LazyRow)
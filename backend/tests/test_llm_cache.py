@@ -0,0 +1,61 @@
+import types
+
+import pytest
+
+import llm_cache
+import write_queue
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time for the cache module."""
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(llm_cache, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+def request(task="lab.generate_projects", prompt="Suggest projects for a data engineer", **extra):
+    return {"model": "llama-3.3-70b-versatile", "task": task, "messages": [{"role": "user", "content": prompt}], **extra}
+
+def store(req, content):
+    llm_cache.store(req, content)
+    assert write_queue.queue.flush(timeout=5)
+
+def test_a_stored_answer_is_served_until_its_ttl(db, clock):
+    store(request(), "three projects")
+    assert llm_cache.lookup(request()) == "three projects"
+
+    clock.now += llm_cache.ttl_for("lab.generate_projects") - 1
+    assert llm_cache.lookup(request()) == "three projects"
+    clock.now += 2
+    assert llm_cache.lookup(request()) is None
+
+def test_only_identical_requests_share_an_answer(db, clock):
+    store(request(), "three projects")
+    # Indentation and trailing spaces of the prompt are normalized away
+    assert llm_cache.lookup(request(prompt="  Suggest projects for a data engineer   \n")) == "three projects"
+    assert llm_cache.lookup(request(prompt="Suggest projects for a web developer")) is None
+    assert llm_cache.lookup(request(temperature=0.2)) is None
+
+def test_conversations_are_never_cached(db, clock):
+    store(request(task="mirror.career_chat"), "hello")
+    assert llm_cache.lookup(request(task="mirror.career_chat")) is None
+    assert llm_cache.shared_key(request(task="mirror.career_chat")) is None
+
+def test_bypass_skips_the_lookup_and_refreshes_the_answer(db, clock):
+    store(request(), "old answer")
+    with llm_cache.bypass():
+        assert llm_cache.lookup(request()) is None
+        store(request(), "new answer")
+    assert llm_cache.lookup(request()) == "new answer"
+
+def test_malformed_json_answers_are_not_stored(db, clock):
+    json_request = request(response_format={"type": "json_object"})
+    store(json_request, "{not json")
+    assert llm_cache.lookup(json_request) is None
+    store(json_request, '{"projects": []}')
+    assert llm_cache.lookup(json_request) == '{"projects": []}'
+
+def test_policies_fall_back_from_task_to_agent_to_default():
+    assert llm_cache.ttl_for("foundry.validate_code") == 7 * llm_cache.DAY
+    assert llm_cache.ttl_for("market.live_feeds") == 6 * llm_cache.HOUR
+    assert llm_cache.ttl_for("unknown.task") == llm_cache.POLICIES["default"]
+    assert llm_cache._parse_policies("a=60, broken=x") == {"a": 60.0}
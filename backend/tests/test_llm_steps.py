@@ -0,0 +1,59 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import circuit_breaker
+import llm
+
+def response(content):
+    usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+class SyncClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: response(kw["messages"][-1]["content"].upper())))
+
+class SlowAsyncClient:
+    """Echoes the prompt upper-cased after `latency` seconds, or raises `error`."""
+    def __init__(self, latency=0.0, error=None):
+        self.latency = latency
+        self.error = error
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return response(kwargs["messages"][-1]["content"].upper())
+
+def greet(name):
+    """A step: one chat completion, with a fallback if it fails."""
+    try:
+        reply = yield {"model": "llama-3.3-70b-versatile", "task": "mirror.career_chat",
+                       "messages": [{"role": "user", "content": f"hello {name}"}]}
+    except Exception:
+        return "offline"
+    return reply
+
+def test_run_and_arun_drive_the_same_step(db):
+    assert llm.run(greet("ada"), SyncClient()) == "HELLO ADA"
+    assert asyncio.run(llm.arun(greet("ada"), SlowAsyncClient())) == "HELLO ADA"
+
+def test_concurrent_steps_share_the_event_loop(db):
+    async def main():
+        started = time.perf_counter()
+        replies = await asyncio.gather(*(llm.arun(greet(str(i)), SlowAsyncClient(latency=0.1)) for i in range(20)))
+        return replies, time.perf_counter() - started
+
+    replies, elapsed = asyncio.run(main())
+    assert replies == [f"HELLO {i}" for i in range(20)]
+    assert elapsed < 1.0 # 20 x 0.1s = 2s if they ran one after another
+
+def test_a_failed_call_is_thrown_into_the_step(db):
+    async def main():
+        with circuit_breaker.track() as health:
+            reply = await llm.arun(greet("ada"), SlowAsyncClient(error=ValueError("bad request")))
+        return reply, health
+
+    reply, health = asyncio.run(main())
+    assert reply == "offline" and health.degraded
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+import types
+
+import pytest
+
+import market_cache
+import rate_limiter
+import write_queue
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time for the cache module."""
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(market_cache, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+def put(key, kind, data):
+    market_cache.put(key, kind, data)
+    assert write_queue.queue.flush(timeout=5)
+
+def test_equivalent_roles_and_skills_share_a_key():
+    assert market_cache.result_key("jobs", "Data  Engineer", ["ReactJS", "python3"]) == \
+        market_cache.result_key("jobs", "data engineer", ["Python", "React", "python"])
+    assert market_cache.result_key("jobs", "data engineer", ["Python"]) != market_cache.result_key("feeds", "data engineer", ["Python"])
+
+def test_entries_expire_after_their_kinds_ttl(db, clock):
+    key = market_cache.search_key(query="Data Engineer jobs", max_results=5)
+    put(key, "search", {"results": [1]})
+    assert market_cache.get(key) == {"results": [1]}
+    clock.now += market_cache.TTLS["search"] + 1
+    # "search" has no stale period
+    assert market_cache.get(key) is None
+    assert market_cache.entry(key) is None
+
+def test_eviction_keeps_the_most_recently_used(db, clock, monkeypatch):
+    monkeypatch.setattr(market_cache, "MARKET_CACHE_MAX_ENTRIES", 2)
+    keys = [market_cache.result_key("jobs", role) for role in ("a", "b", "c")]
+    for key in keys:
+        put(key, "jobs", [key])
+        clock.now += 1
+    market_cache.evict_now()
+    assert write_queue.queue.flush(timeout=5)
+    assert [market_cache.get(key) is not None for key in keys] == [False, True, True]
+
+def test_past_its_ttl_an_entry_is_served_stale_until_max_stale(db, clock):
+    key = market_cache.result_key("feeds", "data engineer", ["Python"])
+    put(key, "feeds", {"trends": ["dbt"]})
+    created = clock.now
+    clock.now += market_cache.TTLS["feeds"] + 1
+    assert market_cache.get(key) is None # not fresh
+    stale = market_cache.entry(key)
+    assert stale == {"data": {"trends": ["dbt"]}, "fresh": False, "created_at": created}
+
+    with market_cache.track() as served:
+        market_cache.report(stale)
+    assert served.apply({"trends": ["dbt"]})["freshness"] == "stale"
+
+    clock.now += market_cache.MAX_STALE["feeds"]
+    assert market_cache.entry(key) is None
+
+def test_one_background_refresh_per_key():
+    async def main():
+        started, release = asyncio.Event(), asyncio.Event()
+        levels = []
+
+        async def refresh():
+            levels.append(rate_limiter.priority_for("mirror.career_chat"))
+            started.set()
+            await release.wait()
+
+        assert market_cache.refresh_later("test|swr", refresh)
+        await started.wait()
+        assert not market_cache.refresh_later("test|swr", refresh)
+        release.set()
+        await asyncio.gather(*market_cache._tasks)
+        assert market_cache.refresh_later("test|swr", refresh) # the first one has finished
+        await asyncio.gather(*market_cache._tasks)
+        return levels
+
+    # Refreshes run at background priority even when a user request started them
+    assert asyncio.run(main()) == [rate_limiter.BACKGROUND, rate_limiter.BACKGROUND]
+
+def test_a_failed_refresh_lets_the_next_request_try_again():
+    failed = market_cache.refreshes["failed"]
+    done = threading.Event()
+
+    def refresh():
+        done.set()
+        raise RuntimeError("tavily down")
+
+    assert market_cache.refresh_later("test|failing", refresh)
+    assert done.wait(5)
+    while "test|failing" in market_cache._refreshing:
+        time.sleep(0.01)
+    assert market_cache.refreshes["failed"] == failed + 1
+    assert market_cache.refresh_later("test|failing", lambda: None)
@@ -0,0 +1,53 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import llm
+import model_router
+
+SMALL, LARGE = model_router.TIERS["small"], model_router.TIERS["large"]
+
+class FakeClient:
+    """Answers each model from `answers` and records which models were asked."""
+    def __init__(self, answers):
+        self.answers = answers
+        self.models = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, **kwargs):
+        self.models.append(model)
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20, total_tokens=120)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.answers[model]))], usage=usage)
+
+def request(task, prompt="Extract tickers"):
+    return {"model": LARGE, "task": task, "cache": False, "messages": [{"role": "user", "content": prompt}]}
+
+def test_tasks_go_to_their_tier():
+    first, escalation = model_router.plan(request("market.stock_ticker"))
+    assert first["model"] == SMALL and escalation["model"] == LARGE
+    first, escalation = model_router.plan(request("mirror.career_chat"))
+    assert first["model"] == LARGE and escalation is None
+    vision = {**request("foundry.verify_screenshot"), "model": "vision-model"}
+    assert model_router.plan(vision) == (vision, None)
+
+def test_schemas_reject_unusable_answers():
+    ticker = request("market.stock_ticker")
+    assert model_router.accepts(ticker, '```json\n{"ticker": ["AI jobs up 4%"]}\n```')
+    assert not model_router.accepts(ticker, '{"ticker": []}')
+    assert not model_router.accepts(ticker, '{"ticker": [1]}')
+    assert not model_router.accepts(ticker, "Sure! Here are the tickers")
+    assert model_router.accepts(request("mirror.career_chat"), "Anything goes")
+
+def test_a_rejected_small_answer_escalates_to_the_large_model(db):
+    good = json.dumps({"ticker": ["Rust demand up"]})
+    client = FakeClient({SMALL: '{"ticker": "not a list"}', LARGE: good})
+    content = asyncio.run(llm.acomplete(request("market.stock_ticker", "Escalate me"), client))
+    assert content == good
+    assert client.models == [SMALL, LARGE]
+    assert model_router.stats()["tasks"]["market.stock_ticker"]["escalations"]["schema"] >= 1
+
+def test_an_accepted_small_answer_is_used(db):
+    good = json.dumps({"ticker": ["Go demand up"]})
+    client = FakeClient({SMALL: good, LARGE: "unused"})
+    assert asyncio.run(llm.acomplete(request("market.stock_ticker", "Keep me small"), client)) == good
+    assert client.models == [SMALL]
@@ -0,0 +1,6 @@
+import query_plans
+
+def test_every_query_uses_an_index():
+    # Same check as `python manage.py check-plans`
+    failures = query_plans.check()
+    assert not failures, "\n".join(f"{name}: {problems}\n  {sql}" for name, sql, problems in failures)
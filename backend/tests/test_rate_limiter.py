@@ -0,0 +1,101 @@
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+import rate_limiter
+from rate_limiter import BACKGROUND, INTERACTIVE, NORMAL, Scheduler
+
+def rate_limited(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions"))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+def test_aimd_grows_additively_and_halves_on_429():
+    scheduler = Scheduler()
+    start = rate_limiter.LLM_CONCURRENCY_START
+    for _ in range(4):
+        scheduler.done(scheduler.acquire("test-model", 10))
+    grown = scheduler.stats()["models"]["test-model"]["concurrency_limit"]
+    assert start < grown < start + 1 # +1/limit per success
+
+    scheduler.failed(scheduler.acquire("test-model", 10), rate_limited())
+    assert scheduler.stats()["models"]["test-model"]["concurrency_limit"] == pytest.approx(grown / 2, abs=0.01)
+
+    # The rest of the same burst of 429s does not cut it again
+    scheduler.failed(scheduler.acquire("test-model", 10), rate_limited())
+    assert scheduler.stats()["models"]["test-model"]["concurrency_limit"] == pytest.approx(grown / 2, abs=0.01)
+
+def test_retry_after_pauses_the_model():
+    scheduler = Scheduler()
+    scheduler.failed(scheduler.acquire("test-model", 10), rate_limited("30"))
+    stats = scheduler.stats()["models"]["test-model"]
+    assert 29 < stats["paused_for"] <= 30 and stats["rate_limited"] == 1
+
+    granted = threading.Event()
+    threading.Thread(target=lambda: (scheduler.acquire("test-model", 10), granted.set()), daemon=True).start()
+    assert not granted.wait(0.2)
+
+def test_requests_per_minute_budget():
+    model = rate_limiter._Model("test-model")
+    model.rpm = 2
+    model.waiting = [(NORMAL, 0, rate_limiter._Ticket("test-model", 10))]
+    model.window.extend([[100.0, 10], [110.0, 10]])
+    assert model.next_admission(120.0) == 100.0 + rate_limiter.WINDOW
+    assert model.next_admission(161.0) == 0
+
+def test_tokens_per_minute_budget():
+    model = rate_limiter._Model("test-model")
+    model.tpm = 1000
+    model.waiting = [(NORMAL, 0, rate_limiter._Ticket("test-model", 500))]
+    model.window.extend([[100.0, 400], [110.0, 400]])
+    # 800 used: the oldest entry has to expire before 500 more fit
+    assert model.next_admission(120.0) == 100.0 + rate_limiter.WINDOW
+
+def test_waiters_are_admitted_by_priority(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "LLM_CONCURRENCY_START", 1)
+    scheduler = Scheduler()
+    held = scheduler.acquire("test-model", 10)
+    order = []
+
+    def waiter(level):
+        ticket = scheduler.acquire("test-model", 10, level)
+        order.append(level)
+        # failed() with a non-429 error keeps the limit at 1 (done() would raise it to 2)
+        scheduler.failed(ticket, RuntimeError("released"))
+
+    threads = []
+    for level in (BACKGROUND, NORMAL, INTERACTIVE):
+        threads.append(threading.Thread(target=waiter, args=(level,)))
+        threads[-1].start()
+    while scheduler.stats()["models"]["test-model"]["queued"] < 3:
+        time.sleep(0.01)
+    scheduler.failed(held, RuntimeError("released"))
+    for thread in threads:
+        thread.join(5)
+    assert order == [INTERACTIVE, NORMAL, BACKGROUND]
+
+def test_priority_follows_task_and_context():
+    assert rate_limiter.priority_for("mirror.career_chat") == INTERACTIVE
+    assert rate_limiter.priority_for("foundry.architect") == INTERACTIVE
+    assert rate_limiter.priority_for("lab.generate") == NORMAL
+    with rate_limiter.priority(BACKGROUND):
+        assert rate_limiter.priority_for("mirror.career_chat") == BACKGROUND
+
+def test_call_retries_a_429_and_returns_the_answer(monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda a, b: 0)
+    attempts = []
+
+    def send():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise rate_limited("0")
+        return "answer"
+
+    assert rate_limiter.call({"model": "test-retry-model", "messages": []}, send) == "answer"
+    assert len(attempts) == 2
+
+def test_bad_limit_specs_are_ignored():
+    assert rate_limiter._parse_limits("a=10:100, broken, b=x:y") == {"a": {"rpm": 10, "tpm": 100}}
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+
+import pytest
+
+import singleflight
+
+def test_concurrent_callers_share_one_call():
+    group = singleflight.Group("test.share")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"feeds": calls[:]}
+
+    async def main():
+        return await asyncio.gather(*(group.do("role", fetch) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert group.stats()["executed"] == 1 and group.stats()["collapsed"] == 9
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    group = singleflight.Group("test.errors", remember=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise RuntimeError("upstream down")
+        return "ok"
+
+    async def main():
+        first = await asyncio.gather(*(group.do("key", fetch) for _ in range(5)), return_exceptions=True)
+        return first, await group.do("key", fetch)
+
+    first, retry = asyncio.run(main())
+    assert all(isinstance(e, RuntimeError) for e in first)
+    assert retry == "ok" and len(calls) == 2
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    group = singleflight.Group("test.cancel")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        leader = asyncio.create_task(group.do("key", fetch))
+        follower = asyncio.create_task(group.do("key", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "done"
+
+def test_remembered_results_answer_retries():
+    group = singleflight.Group("test.remember", remember=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert group.do_sync("idempotency-key", fetch) == 1
+    assert group.do_sync("idempotency-key", fetch) == 1
+    assert group.do_sync("other-key", fetch) == 2
+    assert group.stats()["replayed"] == 1
+
+def test_do_sync_collapses_threads_and_propagates_errors():
+    group = singleflight.Group("test.threads")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    errors = []
+
+    def caller():
+        try:
+            group.do_sync("key", fetch)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=caller) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while group.stats()["collapsed"] < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert len(calls) == 1 and len(errors) == 5
+    with pytest.raises(ValueError):
+        group.do_sync("key", fetch)
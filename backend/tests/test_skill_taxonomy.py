@@ -0,0 +1,28 @@
+import skill_taxonomy
+
+def test_aliases_and_spellings_share_an_id():
+    for spelling in ("React", "ReactJS", "react.js", "React JS", " react "):
+        assert skill_taxonomy.canonical_id(spelling) == "react"
+    assert skill_taxonomy.canonical_id("C++") == "cpp"
+    assert skill_taxonomy.canonical_id("k8s") == "kubernetes"
+
+def test_trailing_version_is_dropped_for_known_skills():
+    assert skill_taxonomy.canonical_id("Python 3.11") == "python"
+    assert skill_taxonomy.canonical_id("Angular 17") == "angular"
+
+def test_unknown_skills_are_slugified_like_known_ids():
+    assert skill_taxonomy.canonical_id("Agile Methodologies") == "agile-methodologies"
+    assert skill_taxonomy.canonical_id("agile_methodologies") == "agile-methodologies"
+    assert all(skill_taxonomy.slug(skill_id) == skill_id for skill_id, _, _ in skill_taxonomy.TAXONOMY)
+
+def test_distinct_tools_and_near_misses_stay_apart():
+    assert skill_taxonomy.canonical_id("GitHub") != skill_taxonomy.canonical_id("Git")
+    assert skill_taxonomy.canonical_id("Figma") != skill_taxonomy.canonical_id("UI/UX Design")
+    assert skill_taxonomy.canonical_id("Trust") == "trust"
+    assert skill_taxonomy.canonical_id("Scalar") == "scalar"
+
+def test_blank_and_non_string_input():
+    assert skill_taxonomy.canonical_id("  ") == ""
+    assert skill_taxonomy.canonical_id(None) == ""
+    assert skill_taxonomy.canonical_ids(["ReactJS", "react", None, "", "Node"]) == ("nodejs", "react")
+    assert skill_taxonomy.canonical_ids("React, python3") == ("python", "react")
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import pytest
+
+import database
+import write_queue
+
+def test_cancelled_waiter_does_not_kill_the_writer(db):
+    queue = write_queue.WriteQueue()
+    started = threading.Event()
+
+    def slow(value):
+        started.set()
+        threading.Event().wait(0.2)
+        return value
+
+    async def main():
+        waiter = asyncio.create_task(write_queue.wait(queue.submit(slow, 1)))
+        await asyncio.to_thread(started.wait, 5)
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+    assert queue.submit(lambda value: value, 2).result(timeout=5) == 2
+    assert queue._thread.is_alive()
+
+def test_a_future_cancelled_before_commit_is_skipped(db):
+    queue = write_queue.WriteQueue()
+    gate = threading.Event()
+    blocker = queue.submit(gate.wait, 5)
+    cancelled = queue.submit(lambda: "written anyway")
+    assert cancelled.cancel()
+    gate.set()
+    assert blocker.result(timeout=5) is True
+    assert queue.submit(lambda: "next").result(timeout=5) == "next"
+
+def test_writes_queued_during_a_commit_share_the_next_batch(db):
+    user_id = database.create_user("batch@example.com", "x", "Batch")
+    queue = write_queue.WriteQueue()
+    started, gate = threading.Event(), threading.Event()
+    queue.submit(lambda: (started.set(), gate.wait(5)))
+    assert started.wait(5)
+    futures = [queue.submit(database.log_user_activity, user_id, f"2024-01-{day:02d}", 1, 1) for day in range(1, 11)]
+    gate.set()
+    assert queue.flush(timeout=5)
+    assert all(future.result() is None for future in futures)
+    assert queue.stats()["batches"] == 2
+    assert len(database.get_user_activity(user_id)) == 10
+
+def test_a_failing_write_fails_alone(db):
+    user_id = database.create_user("isolated@example.com", "x", "Isolated")
+    queue = write_queue.WriteQueue()
+    gate = threading.Event()
+    queue.submit(gate.wait, 5)
+
+    def broken():
+        with database.transaction() as conn:
+            conn.execute("INSERT INTO user_activity (user_id, date, hours, level) VALUES (?, '2024-01-01', 9, 9)", (user_id,))
+            raise ValueError("bad write")
+
+    before = queue.submit(database.log_user_activity, user_id, "2024-01-02", 1, 1)
+    failed = queue.submit(broken)
+    after = queue.submit(database.log_user_activity, user_id, "2024-01-03", 1, 1)
+    gate.set()
+    assert queue.flush(timeout=5)
+    with pytest.raises(ValueError):
+        failed.result()
+    assert before.result() is None and after.result() is None
+    # The failed write's insert was rolled back to its savepoint, the others committed
+    assert sorted(row["date"] for row in database.get_user_activity(user_id)) == ["2024-01-02", "2024-01-03"]
+
+def test_coalesced_heartbeats_add_up_into_one_write(db):
+    user_id = database.create_user("heartbeat@example.com", "x", "Heartbeat")
+    queue = write_queue.WriteQueue()
+    key = ("activity", user_id, "2024-01-01")
+    futures = [queue.submit(database.log_user_activity, user_id, "2024-01-01", 0.5, level,
+                            key=key, merge=write_queue._add_activity, delay=60) for level in (1, 3, 2)]
+    assert futures[0] is futures[1] is futures[2]
+    assert queue.flush(timeout=5)
+    assert queue.stats()["writes"] == 1 and queue.stats()["coalesced"] == 2
+    assert database.get_user_activity(user_id) == [{"date": "2024-01-01", "hours": 1.5, "level": 3}]
@@ -0,0 +1,187 @@
+"""
+Group-commit queue for small, frequent writes.
+
+Chat messages, activity heartbeats, editor code syncs and community posts
+are handed to one writer thread instead of each request opening its own
+write transaction. Whatever queued up while the previous commit was running
+is applied as one transaction (one commit, one WAL sync), with a savepoint
+per write so one bad write fails alone.
+
+Writes with a coalescing key are held for a short delay and merge while they
+wait: heartbeats for the same (user, day) add their hours, and code syncs for
+the same project keep only the latest code. Every submit returns a Future
+that resolves (with the database helper's return value) once its batch has
+committed:
+
+    write_queue.update_project_code(project_id, code)            # fire and forget
+    ok = write_queue.add_community_message(...).result()         # sync handler
+    await write_queue.wait(write_queue.save_chat_message(...))   # async handler
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+
+import database
+
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "500"))
+CODE_SYNC_DELAY = float(os.getenv("CODE_SYNC_DELAY_MS", "1000")) / 1000
+ACTIVITY_DELAY = float(os.getenv("ACTIVITY_DELAY_MS", "5000")) / 1000
+
+class _Write:
+    __slots__ = ("fn", "args", "due", "future")
+
+    def __init__(self, fn, args, due):
+        self.fn = fn
+        self.args = args
+        self.due = due
+        self.future = Future()
+
+class WriteQueue:
+    def __init__(self, max_batch=WRITE_QUEUE_MAX_BATCH):
+        self.max_batch = max_batch
+        self._pending = OrderedDict() # key -> _Write (uncoalesced writes get a unique key)
+        self._cond = threading.Condition()
+        self._busy = False
+        self._flushing = 0
+        self._thread = None
+        self.batches = 0
+        self.writes = 0
+        self.coalesced = 0
+
+    def submit(self, fn, *args, key=None, merge=None, delay=0):
+        """
+        Queues `fn(*args)` to run no sooner than `delay` seconds from now. A
+        write whose `key` is already pending is folded into it -
+        `merge(old_args, new_args)` -> args, or last-wins without `merge` -
+        and both callers share one Future.
+        """
+        with self._cond:
+            if key is not None and key in self._pending:
+                write = self._pending[key]
+                write.args = merge(write.args, args) if merge else args
+                self.coalesced += 1
+                return write.future
+
+            write = _Write(fn, args, time.monotonic() + delay)
+            self._pending[key if key is not None else object()] = write
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return write.future
+
+    def flush(self, timeout=None):
+        """Blocks until everything queued so far has been committed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            # Delayed writes become due right away while someone is flushing
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._busy:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def stats(self):
+        return {"pending": len(self._pending), "batches": self.batches, "writes": self.writes, "coalesced": self.coalesced}
+
+    def _take_batch(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                due = [key for key, write in self._pending.items() if self._flushing or write.due <= now]
+                if due:
+                    break
+                next_due = min((write.due for write in self._pending.values()), default=None)
+                self._cond.wait(None if next_due is None else next_due - now)
+
+            self._busy = True
+            return [self._pending.pop(key) for key in due[:self.max_batch]]
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._commit(batch)
+            except Exception as e:
+                # Never let one batch end the thread: every later write would hang
+                print(f"Write queue: batch of {len(batch)} could not be settled: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with database.transaction() as conn:
+                # Take the write lock up front; also keeps the savepoints below
+                # from acting as their own transactions
+                conn.execute("BEGIN IMMEDIATE")
+                for write in batch:
+                    try:
+                        with database.savepoint("write"):
+                            results.append((write, write.fn(*write.args), None))
+                    except Exception as e:
+                        results.append((write, None, e))
+        except Exception as e:
+            # The commit itself failed: nothing in this batch is durable
+            print(f"Write queue: batch of {len(batch)} failed: {e}")
+            for write in batch:
+                _settle(write.future, error=e)
+            return
+
+        self.batches += 1
+        self.writes += len(batch)
+        for write, result, error in results:
+            if error is not None:
+                print(f"Write queue: {write.fn.__name__} failed: {error}")
+            _settle(write.future, result, error)
+
+def _settle(future, result=None, error=None):
+    """Resolves a write's Future unless its caller already cancelled it (the write itself still happened)."""
+    if future.done():
+        return
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass # cancelled between the check and the set
+
+queue = WriteQueue()
+
+async def wait(future):
+    """
+    Awaits a queued write's commit from async code. Cancelling the caller
+    does not cancel the write (or its Future, which other callers may share).
+    """
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+def _add_activity(old, new):
+    # Heartbeats for one (user, day) add up; the level is the highest seen
+    user_id, date_str, hours, level = old
+    return (user_id, date_str, hours + new[2], max(level, new[3]))
+
+def save_chat_message(session_id, role, content):
+    return queue.submit(database.save_chat_message, session_id, role, content)
+
+def log_user_activity(user_id, date_str, hours, level):
+    return queue.submit(database.log_user_activity, user_id, date_str, hours, level,
+                        key=("activity", user_id, date_str), merge=_add_activity, delay=ACTIVITY_DELAY)
+
+def update_project_code(project_id, code):
+    # Only the newest code of a project matters
+    return queue.submit(database.update_project_code, project_id, code, key=("code", project_id), delay=CODE_SYNC_DELAY)
+
+def add_community_message(user_id, channel_name, content, msg_type="text"):
+    return queue.submit(database.add_community_message, user_id, channel_name, content, msg_type)
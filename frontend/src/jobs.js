@@ -0,0 +1,36 @@
+import { readEvents } from "./streamChat";
+
+const API = "http://localhost:8000";
+
+// Submits a background job (POST /jobs/<path>) and waits for it through its
+// event stream. onStatus gets "queued" / "running" as the job moves along.
+// Resolves with the job's result; rejects with its error.
+export async function runJob(path, body, { token, headers = {}, onStatus } = {}) {
+    const auth = token ? { Authorization: `Bearer ${token}` } : {};
+    const isForm = body instanceof FormData;
+
+    const submit = await fetch(`${API}/jobs/${path}`, {
+        method: "POST",
+        headers: { ...auth, ...headers, ...(isForm ? {} : { "Content-Type": "application/json" }) },
+        body: isForm ? body : JSON.stringify(body),
+    });
+    if (!submit.ok) throw new Error(`HTTP ${submit.status}`);
+    const { job_id } = await submit.json();
+    onStatus?.("queued");
+
+    const res = await fetch(`${API}/jobs/${job_id}/events`, { headers: auth });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+    let outcome = null;
+    await readEvents(res, (event, payload) => {
+        if (event === "status") onStatus?.(payload.status);
+        else if (event === "done" || event === "error") {
+            outcome = { event, payload };
+            return false;
+        }
+    });
+
+    if (!outcome) throw new Error("Job stream ended early");
+    if (outcome.event === "error") throw new Error(outcome.payload.error);
+    return outcome.payload.result;
+}
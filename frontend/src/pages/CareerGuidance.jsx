@@ -6,6 +6,8 @@ import {
 } from "lucide-react";
 import axios from "axios";
 import { useProgressStore } from "../store/useProgressStore";
+import { streamChat } from "../streamChat";
+import { runJob } from "../jobs";
 
 export default function CareerGuidance() {
     const navigate = useNavigate();
@@ -32,6 +34,13 @@ export default function CareerGuidance() {
     const [chatInput, setChatInput] = useState("");
     const [isTyping, setIsTyping] = useState(false); // Define isTyping state
     const messagesEndRef = useRef(null);
+    const chatAbortRef = useRef(null);
+    // One Idempotency-Key per (file, role): a double click or retry reuses it
+    const analyzeKeyRef = useRef(null);
+    useEffect(() => { analyzeKeyRef.current = null; }, [file, targetRole]);
+
+    // Leaving the page cancels a reply that is still streaming
+    useEffect(() => () => chatAbortRef.current?.abort(), []);
 
     // --- Persistence & History State ---
     const [sessionId, setSessionId] = useState(sessionStorage.getItem("active_chat_session") || null);
@@ -171,19 +180,20 @@ export default function CareerGuidance() {
         formData.append("file", file);
         formData.append("target_role", targetRole);
 
+        analyzeKeyRef.current ??= crypto.randomUUID();
+
         try {
             // Ensure backend URL is correct
             const token = sessionStorage.getItem("authToken");
-            const response = await axios.post("http://localhost:8000/analyze", formData, {
-                headers: {
-                    "Content-Type": "multipart/form-data",
-                    Authorization: `Bearer ${token}`
-                },
+            // Runs as a background job; we follow it until the result is ready
+            const result = await runJob("analyze", formData, {
+                token,
+                headers: { "Idempotency-Key": analyzeKeyRef.current }
             });
 
-            console.log("Analysis Data:", response.data);
-            if (response.data.profile) setProfile(response.data.profile);
-            if (response.data.projects) setProjects(response.data.projects);
+            console.log("Analysis Data:", result);
+            if (result.profile) setProfile(result.profile);
+            if (result.projects) setProjects(result.projects);
 
             setUploading(false);
             setUploaded(true);
@@ -208,16 +218,24 @@ export default function CareerGuidance() {
         setChatInput("");
         setIsTyping(true);
 
+        // The bot reply is filled in token by token as it streams
+        const replyId = Date.now() + 1;
+        const setReply = (text) => setMessages(prev => prev.map(m => m.id === replyId ? { ...m, text } : m));
+        setMessages(prev => [...prev, { id: replyId, text: "", sender: "bot", timestamp: new Date() }]);
+        chatAbortRef.current = new AbortController();
+
         try {
             // Updated to send JSON with session_id
             const token = sessionStorage.getItem("authToken");
-            const res = await axios.post("http://localhost:8000/chat", {
+            let responseText = await streamChat("http://localhost:8000/chat/stream", {
                 message: userMsg.text,
                 session_id: sessionId
             }, {
-                headers: { Authorization: `Bearer ${token}` }
+                token,
+                // A project JSON block is handled once the reply is complete; don't show it half-written
+                onDelta: (text) => setReply(text.split("```")[0]),
+                signal: chatAbortRef.current.signal
             });
-            let responseText = res.data.response;
 
             // Check for JSON block (Project Generation)
             // Allow ```json or just ```
@@ -285,20 +303,11 @@ export default function CareerGuidance() {
                 }
             }
 
-            setMessages(prev => [...prev, {
-                id: Date.now() + 1,
-                text: responseText,
-                sender: "bot",
-                timestamp: new Date()
-            }]);
+            setReply(responseText);
         } catch (err) {
+            if (err.name === "AbortError") return;
             console.error("Chat error:", err);
-            setMessages(prev => [...prev, {
-                id: Date.now() + 1,
-                text: "Sorry, I'm offline right now.",
-                sender: "bot",
-                timestamp: new Date()
-            }]);
+            setReply("Sorry, I'm offline right now.");
         } finally {
             setIsTyping(false);
         }
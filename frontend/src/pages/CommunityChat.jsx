@@ -27,15 +27,19 @@ export default function CommunityChat() {
   const [channels, setChannels] = useState([]);
   const [messages, setMessages] = useState([]);
   const [newMessage, setNewMessage] = useState("");
+  const [hasOlder, setHasOlder] = useState(false);
   const messagesEndRef = useRef(null);
+  const lastIdRef = useRef(null); // Newest server message id, used as the poll cursor
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  // Only follow new messages; loading older ones shouldn't jump to the bottom
+  const lastMessageId = messages.length ? messages[messages.length - 1].id : null;
   useEffect(() => {
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessageId]);
 
   // Fetch Channels on Mount
   useEffect(() => {
@@ -58,15 +62,26 @@ export default function CommunityChat() {
   useEffect(() => {
     if (!activeChannel) return;
 
+    lastIdRef.current = null;
+    setMessages([]);
+
     const fetchMessages = async () => {
       try {
         const token = sessionStorage.getItem("authToken");
+        const after = lastIdRef.current;
         const res = await axios.get(`http://localhost:8000/community/messages/${activeChannel.name}`, {
-          headers: { Authorization: `Bearer ${token}` }
+          headers: { Authorization: `Bearer ${token}` },
+          params: after === null ? {} : { after }
         });
-        // Only update if different to avoid jitter? React diffing handles this well mostly.
-        // For now, simple replace.
-        setMessages(res.data);
+        if (after === null) {
+          // Initial fetch: newest page
+          setMessages(res.data);
+          setHasOlder(res.data.length >= 50);
+        } else if (res.data.length > 0) {
+          // Only what's new since the last poll; server copies replace our optimistic ones
+          setMessages(prev => [...prev.filter(m => !m.pending), ...res.data]);
+        }
+        if (res.data.length > 0) lastIdRef.current = res.data[res.data.length - 1].id;
       } catch (err) { }
     };
 
@@ -75,6 +90,22 @@ export default function CommunityChat() {
     return () => clearInterval(interval);
   }, [activeChannel]);
 
+  const loadOlder = async () => {
+    const oldest = messages.find(m => !m.pending);
+    if (!oldest || !activeChannel) return;
+    try {
+      const token = sessionStorage.getItem("authToken");
+      const res = await axios.get(`http://localhost:8000/community/messages/${activeChannel.name}`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { before: oldest.id }
+      });
+      setMessages(prev => [...res.data, ...prev]);
+      setHasOlder(res.data.length >= 50);
+    } catch (err) {
+      console.error("Failed to load older messages", err);
+    }
+  };
+
   const handleSendMessage = async (e) => {
     e.preventDefault();
     if (!newMessage.trim() || !activeChannel) return;
@@ -91,7 +122,8 @@ export default function CommunityChat() {
       content: newMessage,
       time: new Date().toLocaleTimeString(),
       type: "text",
-      channel: activeChannel.name
+      channel: activeChannel.name,
+      pending: true
     };
     setMessages(prev => [...prev, tempMsg]);
     const msgToSend = newMessage;
@@ -206,7 +238,13 @@ export default function CommunityChat() {
             {!activeChannel ? (
               <div className="flex items-center justify-center h-full text-gray-500">Select a channel to start chatting</div>
             ) : (
-              messages.map((msg) => (
+              <>
+              {hasOlder && (
+                <button onClick={loadOlder} className="block mx-auto text-xs text-gray-400 hover:text-cyan-400 transition-colors">
+                  Load older messages
+                </button>
+              )}
+              {messages.map((msg) => (
                 <div key={msg.id} className={`flex gap-4 group ${msg.user === 'You' ? 'flex-row-reverse' : ''}`}>
                   <img src={msg.avatar || `https://ui-avatars.com/api/?name=${msg.user}&background=random`} alt={msg.user} className="w-10 h-10 rounded-full bg-gray-700 object-cover" />
                   <div className={`max-w-[70%] ${msg.user === 'You' ? 'items-end' : 'items-start'} flex flex-col`}>
@@ -249,7 +287,9 @@ export default function CommunityChat() {
                     )}
                   </div>
                 </div>
-              )))}
+              ))}
+              </>
+            )}
             <div ref={messagesEndRef} />
           </div>
 
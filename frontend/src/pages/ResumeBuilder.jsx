@@ -1,7 +1,7 @@
 import { useState } from "react";
 import { Link } from "react-router-dom";
 import { ArrowLeft, Sparkles, FileText, Briefcase, Download, CheckCircle, PenTool } from "lucide-react";
-import axios from "axios";
+import { runJob } from "../jobs";
 
 export default function ResumeBuilder() {
     const [jobDescription, setJobDescription] = useState("");
@@ -12,10 +12,10 @@ export default function ResumeBuilder() {
         if (!jobDescription.trim()) return;
         setGenerating(true);
         try {
-            const res = await axios.post("http://localhost:8000/resume/build", {
-                job_description: jobDescription
-            });
-            setResumeData(res.data);
+            // Runs as a background job; we follow it until the result is ready
+            const token = sessionStorage.getItem("authToken");
+            const result = await runJob("resume-build", { job_description: jobDescription }, { token });
+            setResumeData(result);
         } catch (err) {
             console.error(err);
             alert("Failed to generate resume. Ensure backend is running.");
@@ -9,6 +9,7 @@ import {
 import axios from "axios";
 import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
+import { streamChat } from "../streamChat";
 
 export default function TheFoundry() {
     const { projectId } = useParams();
@@ -32,6 +33,10 @@ export default function TheFoundry() {
     const [isApproved, setIsApproved] = useState(false);
 
     const chatEndRef = useRef(null);
+    const chatAbortRef = useRef(null);
+
+    // Leaving The Foundry cancels a reply that is still streaming
+    useEffect(() => () => chatAbortRef.current?.abort(), []);
 
     // --- RESIZING STATE ---
     const [leftWidth, setLeftWidth] = useState(30); // Percentage
@@ -173,20 +178,27 @@ export default function TheFoundry() {
         setChatInput("");
         setIsChatting(true);
 
+        // The reply is filled in token by token as it streams
+        const replyId = Date.now();
+        const setReply = (content) => setMessages(prev => prev.map(m => m.id === replyId ? { ...m, content } : m));
+        setMessages(prev => [...prev, { id: replyId, role: "system", content: "" }]);
+        chatAbortRef.current = new AbortController();
+
         try {
-            const res = await axios.post("http://localhost:8000/foundry/chat", {
+            const reply = await streamChat("http://localhost:8000/foundry/chat/stream", {
                 message: userMsg.content,
                 code: code,
                 project_context: {
+                    project_id: projectId,
                     title: project.title,
                     phase_title: activePhase?.title,
                     phase_description: activePhase?.description
                 },
                 language: language // Pass language state
-            });
-            setMessages(prev => [...prev, { role: "system", content: res.data.response }]);
+            }, { token: sessionStorage.getItem("authToken"), onDelta: setReply, signal: chatAbortRef.current.signal });
+            setReply(reply);
         } catch (err) {
-            setMessages(prev => [...prev, { role: "system", content: "Connection lost." }]);
+            if (err.name !== "AbortError") setReply("Connection lost.");
         }
         setIsChatting(false);
     };
@@ -0,0 +1,57 @@
+// POSTs to one of the backend's Server-Sent Events endpoints (/chat/stream,
+// /foundry/chat/stream) and calls onDelta with the reply text so far as tokens
+// arrive. Resolves with the full reply; aborting `signal` cancels the request
+// (and the generation upstream).
+export async function streamChat(url, body, { token, onDelta, signal } = {}) {
+    const headers = { "Content-Type": "application/json" };
+    if (token) headers.Authorization = `Bearer ${token}`;
+
+    const res = await fetch(url, { method: "POST", headers, body: JSON.stringify(body), signal });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+    let text = "";
+    let reply = null;
+    await readEvents(res, (event, payload) => {
+        if (event === "delta") {
+            text += payload.text;
+            onDelta?.(text);
+        } else if (event === "done" || event === "error") {
+            reply = payload.response;
+            return false;
+        }
+    });
+    return reply ?? text;
+}
+
+// Reads a Server-Sent Events response, calling onEvent(name, parsedData) for
+// each event until the stream ends or onEvent returns false.
+export async function readEvents(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) return;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line: "event: <name>\ndata: <json>"
+        let end;
+        while ((end = buffer.indexOf("\n\n")) !== -1) {
+            const raw = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+
+            let event = "message";
+            let data = "";
+            for (const line of raw.split("\n")) {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            }
+            if (!data) continue; // keep-alive comment
+            if (onEvent(event, JSON.parse(data)) === false) {
+                reader.cancel();
+                return;
+            }
+        }
+    }
+}